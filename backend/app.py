@@ -1,17 +1,69 @@
 import os
+import re
+import logging
 import datetime
 import jwt
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
-from flask_bcrypt import Bcrypt
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import mysql.connector
-import mercadopago
+from db_pool import criar_pool_do_ambiente
+import pagination
+import exportacao
+import busca
+import hashlib
+import hmac
+import time
+from cache import TTLCache
+from hashing import criar_hashing_pool_do_ambiente, FilaHashCheiaError
+import webhook_queue
+import reservas_pendentes
+import ocorrencias_resumo
+import importacao
+from pagamentos import criar_gateway_do_ambiente, GatewayIndisponivelError
+from pagination import ParametroInvalidoError
+from json_provider import escolher_provider, registros_do_cursor
+from logging_config import configurar_logging, request_id_var, novo_request_id
+from metrics import MetricasApp, metricas_habilitadas, instalar_contexto_endpoint, endereco_permitido, redes_permitidas
+from consultas_lentas import criar_observador_do_ambiente
+from diretorio_unidades import DiretorioUnidades
 
 load_dotenv()
+log_handler = configurar_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
-bcrypt = Bcrypt(app)
-CORS(app)
+app.json = escolher_provider()(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Request-ID'])
+
+# ID de correlação: reaproveita o X-Request-ID do proxy/cliente (se for um valor
+# razoável) ou gera um novo; vai em todas as linhas de log e na resposta.
+REQUEST_ID_VALIDO = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+@app.before_request
+def definir_request_id():
+    recebido = request.headers.get('X-Request-ID', '')
+    request_id = recebido if REQUEST_ID_VALIDO.match(recebido) else novo_request_id()
+    g.request_id_token = request_id_var.set(request_id)
+
+@app.after_request
+def devolver_request_id(response):
+    request_id = request_id_var.get()
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    return response
+
+@app.teardown_request
+def limpar_request_id(exc):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+# Métricas Prometheus em /metrics (ver metrics.py). Com METRICS_ENABLED=0 os
+# hooks e o cursor instrumentado não são instalados.
+metricas = MetricasApp() if metricas_habilitadas() else None
+if metricas:
+    metricas.instalar(app)
 
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
 app.config['JWT_ALGORITHM'] = 'HS256'
@@ -19,21 +71,137 @@ TOKEN_EXPIRATION_HOURS = 1
 
 UNREGISTERED_MORADOR_PLACEHOLDER_ID = 1
 
+# bcrypt roda em um pool de processos dedicado (ver hashing.py).
+hashing_pool = criar_hashing_pool_do_ambiente()
+# Regrava o hash no login quando o custo configurado (BCRYPT_LOG_ROUNDS) mudou.
+BCRYPT_REHASH_ON_LOGIN = os.getenv('BCRYPT_REHASH_ON_LOGIN', 'true').lower() in ('1', 'true', 'sim', 'yes')
+
+def resposta_fila_hash_cheia(erro):
+    response = jsonify({"error": str(erro)})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+# Datas reservadas por espaço (só reservas 'Aprovada'). Quem grava em reservas:
+# add_reservation (cria a trava 'Pendente' e apaga a trava vencida da data),
+# liberar_trava quando o PIX falha, o VarredorDeReservas (apaga travas
+# 'Pendente' vencidas) e o webhook do Mercado Pago ('Pendente' -> 'Aprovada').
+# Só o webhook muda o conjunto de datas aprovadas, então só ele invalida este
+# cache; as travas pendentes não aparecem aqui. O TTL cobre alterações feitas
+# por outros processos ou direto no banco.
+booked_dates_cache = TTLCache(
+    maxsize=int(os.getenv('BOOKED_DATES_CACHE_SIZE', 64)),
+    ttl=int(os.getenv('BOOKED_DATES_CACHE_TTL', 60)),
+    nome='booked_dates'
+)
+
+# Seções do /api/dashboard que são iguais para todos os usuários (avisos, resumo de
+# ocorrências, resumo geral de reservas). TTL curto; as rotas de escrita invalidam.
+dashboard_cache = TTLCache(
+    maxsize=16,
+    ttl=int(os.getenv('DASHBOARD_CACHE_TTL', 15)),
+    nome='dashboard'
+)
+
+# Feed de avisos ativos já serializado (uma única entrada). Invalidado por
+# add_aviso, update_aviso e inativate_aviso; cada entrada vive no máximo até o
+# próximo data_expiracao, para que avisos vencidos saiam do feed na hora certa.
+avisos_feed_cache = TTLCache(
+    maxsize=1,
+    ttl=int(os.getenv('AVISOS_FEED_CACHE_TTL', 300)),
+    nome='avisos_feed'
+)
+
+# Unidades ordenadas, com índice por id e o JSON da listagem (ver
+# diretorio_unidades.py). Serve GET /api/unidades e as conferências de unidade
+# das rotas de moradores e encomendas; invalidado pela importação em massa.
+unidades_diretorio = DiretorioUnidades(
+    lambda dados: app.json.dumps(dados).encode('utf-8'),
+    ttl=int(os.getenv('UNIDADES_CACHE_TTL', 600))
+)
+
+db_pool = criar_pool_do_ambiente()
+
+if metricas:
+    db_pool.adicionar_observador(metricas)
+    hashing_pool.observador = metricas
+
+    def coletar_gauges():
+        pool = db_pool.stats()
+        return [
+            ('db_pool_in_use', 'Conexões emprestadas no momento.', pool['em_uso']),
+            ('db_pool_idle', 'Conexões ociosas no pool.', pool['ociosas']),
+            ('db_pool_exhausted_total', 'Vezes em que o pool esgotou.', pool['esgotado']),
+            ('bcrypt_rejected_total', 'Operações de bcrypt recusadas com a fila cheia.', hashing_pool.rejeitadas),
+            ('log_records_dropped_total', 'Registros de log descartados com a fila cheia.', log_handler.descartados),
+        ]
+    metricas.registry.adicionar_coletor(coletar_gauges)
+
+# Impressão digital, percentis e EXPLAIN das consultas lentas (ver consultas_lentas.py).
+observador_consultas = criar_observador_do_ambiente(lambda: db_pool.get_connection())
+if observador_consultas:
+    db_pool.adicionar_observador(observador_consultas)
+    if not metricas:
+        instalar_contexto_endpoint(app)
+
 def get_db_connection():
+    """
+    Empresta uma conexão do pool. O conn.close() das rotas devolve a conexão ao pool.
+    """
     try:
-        conn = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_NAME'),
-            charset='utf8mb4'
-        )
-        return conn
+        return db_pool.get_connection()
     except mysql.connector.Error as err:
-        print(f"Erro ao conectar ao MySQL: {err}")
+        logger.error("Erro ao conectar ao MySQL: %s", err)
         return None
 
-sdk = mercadopago.SDK(os.getenv("MERCADOPAGO_ACCESS_TOKEN"))
+# Cliente do Mercado Pago com keep-alive, timeout por chamada, retentativas e
+# circuit breaker (ver pagamentos.py). MERCADOPAGO_FAKE=1 usa o gateway local.
+payment_gateway = criar_gateway_do_ambiente()
+
+# Reserva em duas fases (ver reservas_pendentes.py): por quanto tempo a data fica
+# travada aguardando o PIX, quanto antes disso o PIX expira, e o prazo máximo da
+# chamada que gera o PIX dentro do add_reservation (total, com retentativas).
+RESERVA_TRAVA_SEGUNDOS = int(os.getenv('RESERVA_TRAVA_MINUTOS', 40)) * 60
+RESERVA_MARGEM_PIX_SEGUNDOS = int(os.getenv('RESERVA_MARGEM_PIX_MINUTOS', 5)) * 60
+RESERVA_PIX_TIMEOUT = float(os.getenv('RESERVA_PIX_TIMEOUT', 3))
+
+# Limite de linhas por arquivo na importação em massa (ver importacao.py).
+IMPORTACAO_MAX_LINHAS = int(os.getenv('IMPORTACAO_MAX_LINHAS', 20000))
+# Máximo de encomendas por chamada de POST /api/encomendas/lote.
+ENCOMENDAS_LOTE_MAX = int(os.getenv('ENCOMENDAS_LOTE_MAX', 200))
+
+# Claims de tokens já verificados, para não refazer o jwt.decode (HMAC + exp) a
+# cada chamada do mesmo token. A chave é um HMAC do token com a JWT_SECRET_KEY
+# atual: se a chave for trocada, as entradas antigas simplesmente deixam de ser
+# encontradas e o token volta a ser validado com a chave nova.
+token_cache = TTLCache(
+    maxsize=int(os.getenv('TOKEN_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('TOKEN_CACHE_MAX_TTL', 300)),
+    nome='tokens'
+)
+
+def _chave_token_cache(token, secret):
+    return hmac.new(secret.encode('utf-8'), token.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def verificar_token(token):
+    """
+    Retorna os claims do token, usando o token_cache quando possível.
+    Levanta as mesmas exceções do jwt.decode para tokens expirados ou inválidos.
+    """
+    secret = app.config['JWT_SECRET_KEY']
+    chave = _chave_token_cache(token, secret)
+    claims = token_cache.get(chave)
+    if claims is not None:
+        return dict(claims)
+
+    claims = jwt.decode(token, secret, algorithms=[app.config['JWT_ALGORITHM']])
+    exp = claims.get('exp')
+    if exp is not None:
+        # A entrada nunca sobrevive ao exp do token; depois dele o decode roda de novo e
+        # devolve ExpiredSignatureError como antes.
+        restante = int(exp) - time.time()
+        if restante > 0:
+            token_cache.set(chave, dict(claims), ttl=min(restante, token_cache.ttl))
+    return claims
 
 def token_required(f):
     from functools import wraps
@@ -49,14 +217,14 @@ def token_required(f):
             return jsonify({"error": "Token de autenticação não fornecido."}), 401
 
         try:
-            decoded_token = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=[app.config['JWT_ALGORITHM']])
+            decoded_token = verificar_token(token)
             request.user_identity = decoded_token
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Token expirado. Faça login novamente."}), 401
         except jwt.InvalidTokenError:
             return jsonify({"error": "Token inválido ou corrompido."}), 401
         except Exception as e:
-            print(f"Erro inesperado na validação do token: {e}")
+            logger.exception("Erro inesperado na validação do token: %s", e)
             return jsonify({"error": f"Erro na validação do token: {str(e)}"}), 500
 
         return f(*args, **kwargs)
@@ -69,11 +237,90 @@ def check_permission(allowed_roles):
     return user_role in allowed_roles
 
 
+def resposta_paginada(linhas, proximo_cursor):
+    """
+    O corpo continua sendo a lista de itens; o cursor da próxima página (se houver)
+    vai no cabeçalho X-Next-Cursor, para ser enviado de volta em ?after=.
+    """
+    response = jsonify(linhas)
+    if proximo_cursor:
+        response.headers['X-Next-Cursor'] = proximo_cursor
+    return response, 200
+
+# --- MÉTRICAS (PROMETHEUS) ---
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Métricas no formato de texto do Prometheus. Se METRICS_TOKEN estiver definido,
+    exige "Authorization: Bearer <METRICS_TOKEN>"; sem ele, só responde a
+    loopback e às redes de METRICS_REDES_PERMITIDAS (ver metrics.py).
+    """
+    if not metricas:
+        return jsonify({"error": "Métricas desabilitadas (METRICS_ENABLED=0)."}), 404
+    token_esperado = os.getenv('METRICS_TOKEN')
+    if token_esperado:
+        recebido = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(recebido, token_esperado):
+            return jsonify({"error": "Token de métricas inválido."}), 401
+    elif not endereco_permitido(request.remote_addr, redes_permitidas()):
+        return jsonify({"error": "Acesso negado. Defina METRICS_TOKEN ou METRICS_REDES_PERMITIDAS para expor as métricas."}), 403
+    return Response(metricas.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route("/api/admin/consultas", methods=["GET", "DELETE"])
+@token_required
+def get_query_report():
+    """
+    Relatório das consultas agrupadas por impressão digital: contagem, p50/p95/p99,
+    máximo e o último EXPLAIN das lentas. ?ordenar=p95|p99|total|contagem|max,
+    ?limite=N, ?problemas=1 mostra só varreduras completas e filesorts.
+    DELETE zera as estatísticas.
+    """
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem ver o relatório de consultas."}), 403
+    if not observador_consultas:
+        return jsonify({"error": "Estatísticas de consultas desabilitadas (QUERY_STATS_ENABLED=0)."}), 404
+    if request.method == "DELETE":
+        observador_consultas.limpar()
+        return jsonify({"message": "Estatísticas de consultas zeradas."}), 200
+    try:
+        limite = int(request.args.get('limite', 50))
+    except ValueError:
+        return jsonify({"error": "Parâmetro 'limite' inválido."}), 400
+    relatorio = observador_consultas.relatorio(
+        ordenar_por=request.args.get('ordenar', 'p95'),
+        limite=limite,
+        apenas_problemas=request.args.get('problemas', '').lower() in ('1', 'true', 'sim'),
+    )
+    return jsonify(relatorio), 200
+
+# --- ROTA DE DIAGNÓSTICO DO POOL DE CONEXÕES ---
+@app.route("/api/admin/pool-stats", methods=["GET"])
+@token_required
+def get_pool_stats():
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem ver as estatísticas do pool."}), 403
+    return jsonify(db_pool.stats()), 200
+
+@app.route("/api/admin/cache-stats", methods=["GET"])
+@token_required
+def get_cache_stats():
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem ver as estatísticas de cache."}), 403
+    caches = [booked_dates_cache, token_cache, dashboard_cache, avisos_feed_cache]
+    return jsonify({**{c.nome: c.stats() for c in caches}, 'unidades': unidades_diretorio.stats()}), 200
+
+@app.route("/api/admin/gateway-stats", methods=["GET"])
+@token_required
+def get_gateway_stats():
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem ver as estatísticas do gateway."}), 403
+    return jsonify(payment_gateway.stats()), 200
+
 # --- ROTA PARA GERAR O PAGAMENTO PIX DE UMA RESERVA ---
-@app.route("/api/reservas/<int:reserva_id>/create-payment", methods=["POST"])
-def create_reservation_payment(reserva_id):
+def dados_pagamento_reserva(reserva_id):
+    """Cobrança PIX pedida por create-payment (também usada pelo modo assíncrono)."""
     payment_amount = 0.10
-    payment_data = {
+    return {
         "transaction_amount": payment_amount,
         "description": f"Taxa de reserva para espaço #{reserva_id}",
         "payment_method_id": "pix",
@@ -84,8 +331,39 @@ def create_reservation_payment(reserva_id):
         "external_reference": str(reserva_id)
     }
 
+@app.route("/api/reservas/<int:reserva_id>/create-payment", methods=["POST"])
+def create_reservation_payment(reserva_id):
+    # Só gera PIX para reservas que ainda seguram a data; uma trava vencida pode
+    # ter sido liberada e a data reservada por outro morador.
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT status, (expira_em IS NULL OR expira_em > NOW()) AS trava_ativa
+            FROM reservas WHERE id = %s
+        """, (reserva_id,))
+        reserva = cursor.fetchone()
+    except mysql.connector.Error as err:
+        logger.error("Erro no banco de dados ao consultar reserva %s: %s", reserva_id, err)
+        return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
+    finally:
+        cursor.close()
+        conn.close()
+    if not reserva:
+        return jsonify({"error": "Reserva não encontrada."}), 404
+    if reserva['status'] != 'Pendente' or not reserva['trava_ativa']:
+        return jsonify({"error": "Esta reserva não está aguardando pagamento."}), 409
+
+    payment_data = dados_pagamento_reserva(reserva_id)
+
     try:
-        payment_response = sdk.payment().create(payment_data)
+        # Mesma chave de idempotência do add_reservation: pedir o PIX de novo
+        # devolve a cobrança já criada em vez de gerar outra.
+        payment_response = payment_gateway.criar_pagamento(payment_data, idempotency_key=f"reserva-{reserva_id}")
+        if payment_response["status"] not in (200, 201):
+            raise Exception((payment_response["response"] or {}).get("message", "Erro desconhecido no Mercado Pago."))
         payment = payment_response["response"]
 
         pix_data = {
@@ -95,8 +373,11 @@ def create_reservation_payment(reserva_id):
         }
         return jsonify(pix_data), 200
 
+    except GatewayIndisponivelError as e:
+        logger.warning("Mercado Pago indisponível ao criar PIX para reserva %s: %s", reserva_id, e)
+        return jsonify({"error": "Serviço de pagamento indisponível no momento. Tente novamente em instantes."}), 503
     except Exception as e:
-        print(f"Erro ao criar pagamento PIX para reserva {reserva_id}: {e}")
+        logger.exception("Erro ao criar pagamento PIX para reserva %s: %s", reserva_id, e)
         return jsonify({"error": f"Erro ao criar pagamento PIX: {e}"}), 500
 
 @app.route("/api/auth/me", methods=["GET"])
@@ -118,56 +399,125 @@ def get_logged_in_user_data():
             "role": user_role
         }), 200
     except Exception as e:
-        print(f"Erro ao obter dados do usuário logado na rota /api/auth/me: {e}")
+        logger.exception("Erro ao obter dados do usuário logado na rota /api/auth/me: %s", e)
         return jsonify({"error": f"Erro ao obter dados do usuário: {str(e)}"}), 500
 
 # --- ROTA PARA RECEBER NOTIFICAÇÕES (WEBHOOK) DO MERCADO PAGO ---
+def processar_pagamento_mercadopago(payment_id):
+    """
+    Executado pelos workers da fila de webhooks. Busca o pagamento no Mercado Pago
+    e, se aprovado, aprova a reserva. É idempotente: reprocessar o mesmo pagamento
+    não altera nada. Qualquer exceção faz o job ser reagendado com backoff.
+    """
+    logger.debug("Buscando detalhes do pagamento %s no Mercado Pago...", payment_id)
+    payment_info_response = payment_gateway.obter_pagamento(payment_id)
+    if payment_info_response.get("status") != 200:
+        raise Exception(f"Mercado Pago respondeu {payment_info_response.get('status')} ao buscar o pagamento {payment_id}.")
+    payment_info = payment_info_response["response"]
+
+    payment_status = payment_info.get("status")
+    logger.debug("Status do pagamento %s encontrado: '%s'", payment_id, payment_status)
+    if payment_status != "approved":
+        logger.debug("Pagamento não está com status 'approved'. Nada a fazer.")
+        return
+
+    reserva_id = payment_info.get("external_reference")
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("Erro de conexão com o banco de dados.")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE reservas SET status = 'Aprovada', expira_em = NULL WHERE id = %s AND status = 'Pendente'",
+            (reserva_id,)
+        )
+        alterada = cursor.rowcount > 0
+        cursor.execute("SELECT nome_espaco, status FROM reservas WHERE id = %s", (reserva_id,))
+        reserva = cursor.fetchone()
+        conn.commit()
+        if not reserva:
+            logger.warning("ATENÇÃO: pagamento %s aprovado para a reserva #%s, que não existe mais (trava expirada?).", payment_id, reserva_id)
+        if alterada:
+            logger.info("Reserva #%s atualizada para 'Aprovada' no banco de dados.", reserva_id)
+            if reserva:
+                booked_dates_cache.invalidate(reserva[0])
+            dashboard_cache.invalidate('resumo_reservas')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+webhook_workers = webhook_queue.WebhookWorkers(
+    processar=processar_pagamento_mercadopago,
+    obter_conexao=lambda: db_pool.get_connection(),
+    workers=int(os.getenv('WEBHOOK_WORKERS', 2)),
+    max_tentativas=int(os.getenv('WEBHOOK_MAX_TENTATIVAS', 8)),
+)
+
+def ao_liberar_travas(espacos):
+    dashboard_cache.invalidate('resumo_reservas')
+
+varredor_reservas = reservas_pendentes.VarredorDeReservas(
+    obter_conexao=lambda: db_pool.get_connection(),
+    intervalo=int(os.getenv('RESERVA_VARREDOR_INTERVALO', 60)),
+    ao_liberar=ao_liberar_travas,
+)
+
+@app.before_request
+def iniciar_workers_webhook():
+    # Inicia as threads da fila no primeiro request de cada processo (funciona com
+    # qualquer servidor WSGI, inclusive com vários processos). Jobs que ficaram
+    # pendentes de uma execução anterior são retomados aqui.
+    webhook_workers.garantir_iniciado()
+    varredor_reservas.garantir_iniciado()
+
 @app.route("/api/webhooks/mercadopago", methods=["POST"])
 def mercadopago_webhook():
-    data = request.json
-    print(f"\n--- Webhook do Mercado Pago Recebido ---")
-    print(f"Corpo da Notificação: {data}")
+    """
+    Apenas grava o payment_id na fila durável e responde 200 imediatamente;
+    a consulta ao Mercado Pago e a atualização da reserva ficam com os workers.
+    """
+    data = request.get_json(silent=True)
+    logger.debug("Webhook do Mercado Pago recebido.")
 
     if data and data.get("type") == "payment":
-        payment_id = data["data"]["id"]
-        print(f"Notificação é do tipo 'payment'. ID do Pagamento: {payment_id}")
+        payment_id = (data.get("data") or {}).get("id")
+        if not payment_id:
+            return jsonify({"error": "Notificação sem ID de pagamento."}), 400
+        logger.debug("Notificação é do tipo 'payment'. ID do Pagamento: %s", payment_id)
 
-        conn = None
-        cursor = None
+        conn = get_db_connection()
+        if not conn:
+            # Sem a fila não dá para garantir o processamento: pede ao Mercado Pago que reenvie.
+            return jsonify({"error": "Erro de conexão com o banco de dados."}), 503
         try:
-            print(f"Buscando detalhes do pagamento {payment_id} no Mercado Pago...")
-            payment_info_response = sdk.payment().get(payment_id)
-            payment_info = payment_info_response["response"]
-
-            print(f"Resposta do GET do pagamento: {payment_info}")
-            payment_status = payment_info.get("status")
-            print(f"Status do pagamento encontrado: '{payment_status}'")
-
-            if payment_status == "approved":
-                reserva_id = payment_info.get("external_reference")
-                print(f"PAGAMENTO APROVADO! Atualizando reserva #{reserva_id}...")
-
-                conn = get_db_connection()
-                if conn:
-                    cursor = conn.cursor()
-                    cursor.execute("UPDATE reservas SET status = 'Aprovada' WHERE id = %s", (reserva_id,))
-                    conn.commit()
-                    print(f"Reserva #{reserva_id} atualizada para 'Aprovada' no banco de dados.")
-            else:
-                print(f"Pagamento não está com status 'approved'. Nada a fazer.")
-
-        except Exception as e:
-            print(f"ERRO AO PROCESSAR WEBHOOK: {e}")
-            if conn and conn.is_connected():
-                conn.rollback()
+            webhook_queue.enfileirar(conn, payment_id)
+        except mysql.connector.Error as err:
+            logger.error("ERRO AO ENFILEIRAR WEBHOOK: %s", err)
+            return jsonify({"error": "Não foi possível registrar a notificação."}), 503
         finally:
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
+            conn.close()
+        webhook_workers.notificar()
 
     return jsonify({"status": "ok"}), 200
 
+@app.route("/api/admin/webhook-stats", methods=["GET"])
+@token_required
+def get_webhook_stats():
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem ver a fila de webhooks."}), 403
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+    try:
+        return jsonify(webhook_workers.stats(conn)), 200
+    except mysql.connector.Error as err:
+        return jsonify({"error": f"Erro ao consultar a fila: {err}"}), 500
+    finally:
+        conn.close()
+
 # --- ROTAS DE AUTENTICAÇÃO ---
 @app.route("/api/register", methods=["POST"])
 def register_admin():
@@ -184,7 +534,7 @@ def register_admin():
         cursor.execute("SELECT id FROM administradores WHERE email = %s", (data['email'],))
         if cursor.fetchone():
             return jsonify({"error": "Este e-mail já está cadastrado como administrador."}), 409
-        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        hashed_password = hashing_pool.gerar_hash(data['password'])
         sql = """
             INSERT INTO administradores
                 (nome, email, senha_hash, permissao, ativo)
@@ -194,6 +544,8 @@ def register_admin():
         cursor.execute(sql, (data['name'], data['email'], hashed_password, 'ADM'))
         conn.commit()
         return jsonify({"message": "Administrador registrado com sucesso!"}), 201
+    except FilaHashCheiaError as e:
+        return resposta_fila_hash_cheia(e)
     except mysql.connector.Error as err:
         conn.rollback()
         return jsonify({"error": f"Erro ao registrar administrador: {err}"}), 500
@@ -206,6 +558,37 @@ def register_admin():
         if conn and conn.is_connected():
             conn.close()
 
+LOGIN_LOOKUP_SQL = """
+    SELECT id, nome, email, senha_hash, role, apartamento
+    FROM (
+        SELECT id, nome, email, senha_hash, 'ADMIN' AS role, 'ADMIN' AS apartamento, 0 AS precedencia
+        FROM administradores
+        WHERE email = %s AND ativo = TRUE
+        UNION ALL
+        SELECT m.id, m.nome_completo, m.email, m.senha_hash, 'MORADOR', u.numero, 1
+        FROM moradores m
+        JOIN unidades u ON m.unidade_id = u.id
+        WHERE m.email = %s AND m.ativo = TRUE
+    ) AS identidades
+    ORDER BY precedencia
+    LIMIT 1
+"""
+
+def atualizar_hash_senha(cursor, conn, user_role, user_id, senha):
+    """
+    Regrava o hash da senha com o custo atual. Falhas aqui não impedem o login:
+    o hash antigo continua válido e a troca é tentada de novo no próximo login.
+    """
+    tabela = 'administradores' if user_role == 'ADMIN' else 'moradores'
+    try:
+        novo_hash = hashing_pool.gerar_hash(senha)
+        cursor.execute(f"UPDATE {tabela} SET senha_hash = %s WHERE id = %s", (novo_hash, user_id))
+        conn.commit()
+        logger.info("LOGIN: Password hash for %s #%s rehashed with cost %s.", tabela, user_id, hashing_pool.rounds)
+    except (FilaHashCheiaError, mysql.connector.Error) as e:
+        conn.rollback()
+        logger.warning("LOGIN: Could not rehash password for %s #%s: %s", tabela, user_id, e)
+
 @app.route("/api/login", methods=["POST"])
 def login_user():
     data = request.get_json()
@@ -214,7 +597,7 @@ def login_user():
 
     conn = get_db_connection()
     if not conn:
-        print("LOGIN ERROR: Failed to get DB connection.")
+        logger.error("LOGIN ERROR: Failed to get DB connection.")
         return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
 
     cursor = conn.cursor(dictionary=True)
@@ -224,46 +607,29 @@ def login_user():
     user_apt = None
 
     try:
-        print(f"LOGIN: Attempting to authenticate email: {data['email']} as ADMIN.")
-        cursor.execute("""
-            SELECT id, nome, email, senha_hash, 'ADMIN' as role
-            FROM administradores
-            WHERE email = %s AND ativo = TRUE
-        """, (data['email'],))
+        logger.debug("LOGIN: Attempting to authenticate email: %s.", data['email'])
+        # Uma única ida ao banco resolve administrador ou morador; cada ramo usa o
+        # índice UNIQUE de email da sua tabela. Administrador tem precedência,
+        # como na busca sequencial anterior.
+        cursor.execute(LOGIN_LOOKUP_SQL, (data['email'], data['email']))
         usuario = cursor.fetchone()
-        if usuario:
-            user_role = 'ADMIN'
-            user_name = usuario['nome']
-            user_email = usuario['email']
-            user_id = usuario['id']
-            user_apt = 'ADMIN'
-            print(f"LOGIN: User {user_email} found as ADMIN.")
 
         if not usuario:
-            print(f"LOGIN: User not ADMIN, attempting as MORADOR: {data['email']}.")
-            cursor.execute("""
-                SELECT m.id, m.nome_completo as nome, m.email, m.senha_hash,
-                       u.numero as apartamento, 'MORADOR' as role
-                FROM moradores m
-                JOIN unidades u ON m.unidade_id = u.id
-                WHERE m.email = %s AND m.ativo = TRUE
-            """, (data['email'],))
-            usuario = cursor.fetchone()
-            if usuario:
-                user_role = 'MORADOR'
-                user_name = usuario['nome']
-                user_email = usuario['email']
-                user_id = usuario['id']
-                user_apt = usuario['apartamento']
-                print(f"LOGIN: User {user_email} found as MORADOR in apartment {user_apt}.")
-
-        if not usuario:
-            print(f"LOGIN ERROR: No active user found for email: {data['email']}.")
+            logger.warning("LOGIN ERROR: No active user found for email: %s.", data['email'])
             return jsonify({"error": "Email ou senha inválidos."}), 401
 
-        print(f"LOGIN: Checking password for user {user_email}.")
-        if bcrypt.check_password_hash(usuario['senha_hash'], data['password']):
-            print(f"LOGIN: Password correct for user {user_email}. Generating token.")
+        user_role = usuario['role']
+        user_name = usuario['nome']
+        user_email = usuario['email']
+        user_id = usuario['id']
+        user_apt = usuario['apartamento']
+        logger.debug("LOGIN: User %s found as %s (apartment %s).", user_email, user_role, user_apt)
+
+        logger.debug("LOGIN: Checking password for user %s.", user_email)
+        if hashing_pool.verificar(usuario['senha_hash'], data['password']):
+            logger.debug("LOGIN: Password correct for user %s. Generating token.", user_email)
+            if BCRYPT_REHASH_ON_LOGIN and hashing_pool.precisa_rehash(usuario['senha_hash']):
+                atualizar_hash_senha(cursor, conn, user_role, user_id, data['password'])
             access_token_payload = {
                 'user_id': user_id,
                 'role': user_role,
@@ -283,13 +649,15 @@ def login_user():
             if user_role == 'MORADOR':
                 response_data['user']['apartment'] = user_apt
 
-            print(f"LOGIN SUCCESS: User {user_email} logged in. Role: {user_role}.")
+            logger.info("LOGIN SUCCESS: User %s logged in. Role: %s.", user_email, user_role)
             return jsonify(response_data), 200
         else:
-            print(f"LOGIN ERROR: Incorrect password for user {user_email}.")
+            logger.warning("LOGIN ERROR: Incorrect password for user %s.", user_email)
             return jsonify({"error": "Email ou senha inválidos."}), 401
+    except FilaHashCheiaError as e:
+        return resposta_fila_hash_cheia(e)
     except Exception as e:
-        print(f"LOGIN CRITICAL ERROR: {e}")
+        logger.exception("LOGIN CRITICAL ERROR: %s", e)
         return jsonify({"error": "Erro interno do servidor durante o login."}), 500
     finally:
         if cursor:
@@ -302,24 +670,35 @@ def login_user():
 @app.route("/api/unidades", methods=["GET"])
 @token_required
 def get_unidades():
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+    """
+    Lista as unidades a partir do diretório em memória, já ordenadas
+    (apartamentos, bloco, número) e serializadas. Só abre conexão para recarregar.
+    """
+    conn = None
+    cursor = None
 
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, tipo_unidade, bloco, numero, andar
-            FROM unidades
-            ORDER BY tipo_unidade DESC, bloco ASC, CAST(numero AS UNSIGNED) ASC
-        """)
-        unidades = cursor.fetchall()
-        return jsonify(unidades), 200
+    def abrir_cursor():
+        nonlocal conn, cursor
+        if cursor is None:
+            conn = get_db_connection()
+            if not conn:
+                raise mysql.connector.Error("Erro de conexão com o banco de dados.")
+            cursor = conn.cursor()
+        return cursor
+
+    try:
+        diretorio = unidades_diretorio.obter(abrir_cursor)
+        response = Response(diretorio.corpo, mimetype='application/json')
+        response.set_etag(diretorio.etag)
+        response.last_modified = diretorio.last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except mysql.connector.Error as err:
-        print(f"Erro no banco de dados ao buscar unidades: {err}")
+        logger.error("Erro no banco de dados ao buscar unidades: %s", err)
         return jsonify({"error": f"Erro ao buscar unidades: {err}"}), 500
     except Exception as e:
-        print(f"Erro interno do servidor ao buscar unidades: {e}")
+        logger.exception("Erro interno do servidor ao buscar unidades: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -332,28 +711,27 @@ def get_unidades():
 def get_unidade_by_id(unidade_id):
     conn = None
     cursor = None
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
 
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, tipo_unidade, bloco, numero, andar
-            FROM unidades
-            WHERE id = %s
-        """, (unidade_id,))
-        unidade = cursor.fetchone()
+    def abrir_cursor():
+        nonlocal conn, cursor
+        if cursor is None:
+            conn = get_db_connection()
+            if not conn:
+                raise mysql.connector.Error("Erro de conexão com o banco de dados.")
+            cursor = conn.cursor()
+        return cursor
 
+    try:
+        unidade = unidades_diretorio.buscar(abrir_cursor, unidade_id)
         if not unidade:
             return jsonify({"error": "Unidade não encontrada."}), 404
 
         return jsonify(unidade), 200
     except mysql.connector.Error as err:
-        print(f"Erro no banco de dados ao buscar unidade por ID: {err}")
+        logger.error("Erro no banco de dados ao buscar unidade por ID: %s", err)
         return jsonify({"error": f"Erro ao buscar unidade: {err}"}), 500
     except Exception as e:
-        print(f"Erro interno do servidor ao buscar unidade por ID: {e}")
+        logger.exception("Erro interno do servidor ao buscar unidade por ID: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -391,11 +769,10 @@ def add_morador():
             if cursor.fetchone():
                 return jsonify({"error": "Este CPF já está cadastrado como morador."}), 409
 
-        cursor.execute("SELECT id FROM unidades WHERE id = %s", (data['unidade_id'],))
-        if not cursor.fetchone():
+        if not unidades_diretorio.existe(lambda: cursor, data['unidade_id']):
             return jsonify({"error": "ID da unidade não encontrado ou inválido."}), 400
 
-        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        hashed_password = hashing_pool.gerar_hash(data['password'])
 
         sql = """
             INSERT INTO moradores
@@ -418,13 +795,15 @@ def add_morador():
 
         return jsonify({"message": "Morador cadastrado com sucesso!"}), 201
 
+    except FilaHashCheiaError as e:
+        return resposta_fila_hash_cheia(e)
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao adicionar morador: {err}")
+        logger.error("Erro no banco de dados ao adicionar morador: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao adicionar morador: {e}")
+        logger.exception("Erro interno ao adicionar morador: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -432,29 +811,102 @@ def add_morador():
         if conn and conn.is_connected():
             conn.close()
 
+@app.route("/api/moradores/importar", methods=["POST"])
+@token_required
+def importar_moradores():
+    """
+    Importa unidades e moradores de um arquivo CSV ou NDJSON (ver importacao.py),
+    enviado como multipart (campo 'arquivo') ou no corpo da requisição.
+    ?format=csv|ndjson (padrão: pela extensão do arquivo ou pelo Content-Type) e
+    ?dry_run=1 para só validar. Responde 200 com o relatório, incluindo os erros
+    por linha; as linhas válidas são gravadas mesmo que outras falhem.
+    """
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem importar moradores."}), 403
+
+    arquivo = request.files.get('arquivo')
+    nome = (arquivo.filename if arquivo else '') or ''
+    formato = request.args.get('format')
+    if not formato:
+        if nome.lower().endswith('.csv') or 'csv' in (request.mimetype or ''):
+            formato = 'csv'
+        else:
+            formato = 'ndjson'
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'sim', 'yes')
+
+    try:
+        conteudo = arquivo.read() if arquivo else request.get_data()
+        registros = importacao.ler_registros(conteudo.decode('utf-8-sig'), formato.lower())
+    except UnicodeDecodeError:
+        return jsonify({"error": "O arquivo deve estar em UTF-8."}), 400
+    except importacao.ArquivoInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
+    if not registros:
+        return jsonify({"error": "Arquivo vazio."}), 400
+    if len(registros) > IMPORTACAO_MAX_LINHAS:
+        return jsonify({"error": f"O arquivo tem {len(registros)} linhas; o máximo é {IMPORTACAO_MAX_LINHAS}."}), 413
+
+    try:
+        resultado = importacao.importar(get_db_connection, registros, hashing_pool, dry_run=dry_run,
+                                        diretorio=unidades_diretorio)
+        return jsonify(resultado), 200
+    except FilaHashCheiaError as e:
+        return resposta_fila_hash_cheia(e)
+    except mysql.connector.Error as err:
+        logger.error("Erro no banco de dados ao importar moradores: %s", err)
+        return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
+    except Exception as e:
+        logger.exception("Erro interno ao importar moradores: %s", e)
+        return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
+
+MORADORES_CAMPOS = {
+    'id': 'id',
+    'nome_completo': 'nome_completo',
+    'email': 'email',
+    'unidade_id': 'unidade_id',
+    'cpf': 'cpf',
+    'rg': 'rg',
+    'profissao': 'profissao',
+    'whatsapp': 'whatsapp',
+    'tipo_morador': 'tipo_morador',
+    'ativo': 'ativo',
+}
+
 @app.route("/api/moradores", methods=["GET"])
 @token_required
 def get_moradores():
     if not check_permission(['ADMIN']): # Somente ADMIN pode listar moradores
         return jsonify({"error": "Acesso negado. Apenas administradores podem listar moradores."}), 403
+    conn = None
+    cursor = None
     try:
+        limite = pagination.ler_limite(request.args)
+        campos = pagination.ler_campos(request.args, MORADORES_CAMPOS)
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
 
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, nome_completo, email, unidade_id, cpf, rg, profissao, whatsapp, tipo_morador, ativo
+        cursor = conn.cursor()
+        sql_base = f"""
+            SELECT
+                {pagination.montar_select(MORADORES_CAMPOS, campos, ['nome_completo', 'id'])}
             FROM moradores
-            ORDER BY nome_completo ASC
-        """)
-        moradores = cursor.fetchall()
-        return jsonify(moradores), 200
+        """
+        moradores, proximo_cursor = pagination.paginar(
+            cursor, 'moradores', sql_base,
+            ordem=[('nome_completo', 'ASC'), ('id', 'ASC')],
+            campos_ordem=['nome_completo', 'id'],
+            limite=limite, after=request.args.get('after')
+        )
+        return resposta_paginada(pagination.filtrar_campos(moradores, campos), proximo_cursor)
+    except ParametroInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
     except mysql.connector.Error as err:
-        print(f"Erro no banco de dados ao buscar moradores: {err}")
+        logger.error("Erro no banco de dados ao buscar moradores: %s", err)
         return jsonify({"error": f"Erro ao buscar moradores: {err}"}), 500
     except Exception as e:
-        print(f"Erro interno do servidor ao buscar moradores: {e}")
+        logger.exception("Erro interno do servidor ao buscar moradores: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -487,10 +939,10 @@ def get_morador_by_id(morador_id):
 
         return jsonify(morador), 200
     except mysql.connector.Error as err:
-        print(f"Erro no banco de dados ao buscar morador por ID: {err}")
+        logger.error("Erro no banco de dados ao buscar morador por ID: %s", err)
         return jsonify({"error": f"Erro ao buscar morador: {err}"}), 500
     except Exception as e:
-        print(f"Erro interno do servidor ao buscar morador por ID: {e}")
+        logger.exception("Erro interno do servidor ao buscar morador por ID: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -527,12 +979,11 @@ def update_morador(morador_id):
             set_clauses.append("email = %s")
             values.append(data['email'])
         if 'password' in data and data['password']:
-            hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+            hashed_password = hashing_pool.gerar_hash(data['password'])
             set_clauses.append("senha_hash = %s")
             values.append(hashed_password)
         if 'unidade_id' in data:
-            cursor.execute("SELECT id FROM unidades WHERE id = %s", (data['unidade_id'],))
-            if not cursor.fetchone():
+            if not unidades_diretorio.existe(lambda: cursor, data['unidade_id']):
                 return jsonify({"error": "ID da unidade não encontrado ou inválido."}), 400
             set_clauses.append("unidade_id = %s")
             values.append(data['unidade_id'])
@@ -567,13 +1018,15 @@ def update_morador(morador_id):
 
         return jsonify({"message": "Morador atualizado com sucesso!"}), 200
 
+    except FilaHashCheiaError as e:
+        return resposta_fila_hash_cheia(e)
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao atualizar morador: {err}")
+        logger.error("Erro no banco de dados ao atualizar morador: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao atualizar morador: {e}")
+        logger.exception("Erro interno ao atualizar morador: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -609,11 +1062,11 @@ def toggle_morador_status(morador_id):
 
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao alterar status do morador: {err}")
+        logger.error("Erro no banco de dados ao alterar status do morador: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao alterar status do morador: {e}")
+        logger.exception("Erro interno ao alterar status do morador: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -621,17 +1074,8 @@ def toggle_morador_status(morador_id):
         if conn and conn.is_connected():
             conn.close()
 
-@app.route("/api/reservas/resumo-geral", methods=["GET"])
-@token_required
-def get_all_reservations_summary():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-
-    cursor = conn.cursor(dictionary=True)
-
-    try:
-        sql = """
+# SELECT com joins compartilhado pelo resumo geral e pela exportação de reservas.
+RESERVAS_RESUMO_SQL = """
             SELECT
                 r.nome_espaco AS space_name,
                 r.data_reserva AS reservation_date,
@@ -642,20 +1086,23 @@ def get_all_reservations_summary():
             FROM reservas r
             LEFT JOIN moradores m ON r.morador_id = m.id
             LEFT JOIN unidades u ON m.unidade_id = u.id
-            WHERE r.status IN ('Aprovada', 'Pendente')
-            ORDER BY r.data_reserva ASC
-        """
-        cursor.execute(sql)
-        reservas = cursor.fetchall()
+"""
+
+@app.route("/api/reservas/resumo-geral", methods=["GET"])
+@token_required
+def get_all_reservations_summary():
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
 
-        for reserva in reservas:
-            if isinstance(reserva['reservation_date'], datetime.date):
-                reserva['reservation_date'] = reserva['reservation_date'].isoformat()
+    cursor = conn.cursor()
 
+    try:
+        reservas = secao_resumo_reservas(cursor, request.user_identity)
         return jsonify(reservas), 200
 
     except Exception as e:
-        print(f"Erro ao buscar resumo geral de reservas: {e}")
+        logger.exception("Erro ao buscar resumo geral de reservas: %s", e)
         return jsonify({"error": str(e)}), 500
     finally:
         cursor.close()
@@ -689,8 +1136,7 @@ def add_encomenda():
         if not morador_exists:
             return jsonify({"error": "Morador destinatário não encontrado."}), 400
 
-        cursor.execute("SELECT id FROM unidades WHERE id = %s", (data['unidade_destino_id'],))
-        if not cursor.fetchone():
+        if not unidades_diretorio.existe(lambda: cursor, data['unidade_destino_id']):
             return jsonify({"error": "Unidade de destino não encontrada ou inválida."}), 400
 
         sql = """
@@ -709,11 +1155,11 @@ def add_encomenda():
         return jsonify({"message": "Encomenda cadastrada com sucesso!"}), 201
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao adicionar encomenda: {err}")
+        logger.error("Erro no banco de dados ao adicionar encomenda: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao adicionar encomenda: {e}")
+        logger.exception("Erro interno ao adicionar encomenda: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -721,6 +1167,203 @@ def add_encomenda():
         if conn and conn.is_connected():
             conn.close()
 
+def _ids_existentes(cursor, tabela, ids):
+    """Um único SELECT ... IN para saber quais dos ids existem na tabela."""
+    if not ids:
+        return set()
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(f"SELECT id FROM {tabela} WHERE id IN ({placeholders})", tuple(ids))
+    return {linha[0] for linha in cursor.fetchall()}
+
+def _validar_item_encomenda(item):
+    """Normaliza um item do lote ou levanta ValueError com o motivo."""
+    if not isinstance(item, dict):
+        raise ValueError("Cada encomenda deve ser um objeto.")
+    required_fields = ['remetente', 'data_chegada', 'morador_id', 'unidade_destino_id']
+    missing = [k for k in required_fields if item.get(k) in (None, '')]
+    if missing:
+        raise ValueError(f"Dados incompletos. Campos obrigatórios: {', '.join(missing)}")
+    try:
+        data_chegada = datetime.datetime.strptime(str(item['data_chegada']), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError("Formato de data inválido. Use AAAA-MM-DD.")
+    try:
+        morador_id = int(item['morador_id'])
+        unidade_id = int(item['unidade_destino_id'])
+    except (TypeError, ValueError):
+        raise ValueError("morador_id e unidade_destino_id devem ser números inteiros.")
+    return (str(item['remetente']), item.get('descricao'), data_chegada, morador_id, unidade_id)
+
+@app.route("/api/encomendas/lote", methods=["POST"])
+@token_required
+def add_encomendas_lote():
+    """
+    Cadastra várias encomendas de uma vez (chegada do entregador pela manhã).
+    Corpo: {"encomendas": [{remetente, descricao, data_chegada, morador_id,
+    unidade_destino_id}, ...]}. Os moradores citados são conferidos com um
+    SELECT ... IN e as unidades pelo diretório em memória; as válidas são
+    gravadas em uma única transação, com um só commit. A resposta traz o
+    resultado de cada item, na ordem enviada; itens inválidos não impedem o
+    cadastro dos demais.
+    """
+    registrado_por_admin_id = request.user_identity.get('user_id')
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Apenas administradores podem cadastrar encomendas."}), 403
+
+    data = request.get_json(silent=True)
+    itens = data.get('encomendas') if isinstance(data, dict) else data
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"error": "Envie uma lista não vazia em 'encomendas'."}), 400
+    if len(itens) > ENCOMENDAS_LOTE_MAX:
+        return jsonify({"error": f"Máximo de {ENCOMENDAS_LOTE_MAX} encomendas por lote."}), 413
+
+    resultados = [None] * len(itens)
+    validos = []
+    for indice, item in enumerate(itens):
+        try:
+            validos.append((indice, _validar_item_encomenda(item)))
+        except ValueError as e:
+            resultados[indice] = {"indice": indice, "status": "erro", "error": str(e)}
+
+    conn = None
+    cursor = None
+    try:
+        if validos:
+            conn = get_db_connection()
+            if not conn:
+                return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+            cursor = conn.cursor()
+
+            moradores = _ids_existentes(cursor, 'moradores', {v[3] for _i, v in validos})
+            unidades = {i for i in {v[4] for _i, v in validos} if unidades_diretorio.existe(lambda: cursor, i)}
+            aceitos = []
+            for indice, valores in validos:
+                if valores[3] not in moradores:
+                    resultados[indice] = {"indice": indice, "status": "erro", "error": "Morador destinatário não encontrado."}
+                elif valores[4] not in unidades:
+                    resultados[indice] = {"indice": indice, "status": "erro", "error": "Unidade de destino não encontrada ou inválida."}
+                else:
+                    aceitos.append((indice, valores))
+
+            if aceitos:
+                # Um INSERT por linha, todos na mesma transação e com um só commit:
+                # o id de cada encomenda vem do próprio lastrowid. Os ids de um
+                # INSERT de várias linhas não são garantidamente consecutivos
+                # (auto_increment_increment > 1, innodb_autoinc_lock_mode=2).
+                criados = []
+                for indice, valores in aceitos:
+                    cursor.execute("""
+                        INSERT INTO encomendas (remetente, descricao, data_chegada, morador_id, unidade_destino_id, registrado_por_admin_id)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, valores + (registrado_por_admin_id,))
+                    criados.append((indice, cursor.lastrowid))
+                conn.commit()
+                for indice, encomenda_id in criados:
+                    resultados[indice] = {"indice": indice, "status": "criada", "id": encomenda_id}
+
+        criadas = sum(1 for r in resultados if r['status'] == 'criada')
+        logger.info("Lote de encomendas: %s de %s cadastradas.", criadas, len(itens))
+        return jsonify({
+            "criadas": criadas,
+            "erros": len(itens) - criadas,
+            "resultados": resultados,
+        }), 201 if criadas else 400
+    except mysql.connector.Error as err:
+        if conn and conn.is_connected():
+            conn.rollback()
+        logger.error("Erro no banco de dados ao cadastrar lote de encomendas: %s", err)
+        return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
+    except Exception as e:
+        if conn and conn.is_connected():
+            conn.rollback()
+        logger.exception("Erro interno ao cadastrar lote de encomendas: %s", e)
+        return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn and conn.is_connected():
+            conn.close()
+
+ENCOMENDAS_CAMPOS = {
+    'id': 'e.id',
+    'remetente': 'e.remetente',
+    'descricao': 'e.descricao',
+    'data_chegada': 'e.data_chegada',
+    'status': 'e.status',
+    'data_retirada': 'e.data_retirada',
+    'morador_id': 'e.morador_id',
+    'unidade_destino_id': 'e.unidade_destino_id',
+    'registrado_por_admin_id': 'e.registrado_por_admin_id',
+    'criado_em': 'e.criado_em',
+    'morador_nome': 'm.nome_completo',
+    'morador_unidade_numero': 'u.numero',
+    'morador_unidade_bloco': 'u.bloco',
+    'morador_unidade_tipo': 'u.tipo_unidade',
+}
+
+# Joins compartilhados pela listagem e pela exportação de encomendas.
+ENCOMENDAS_FROM_SQL = """
+            FROM encomendas e
+            LEFT JOIN moradores m ON e.morador_id = m.id
+            LEFT JOIN unidades u ON e.unidade_destino_id = u.id
+"""
+
+def montar_busca_encomendas(select_campos, termo):
+    """
+    Monta a busca de encomendas usando os índices FULLTEXT em vez de LIKE '%termo%'
+    nas colunas de texto (ver busca.py para as diferenças de comportamento).
+    Os candidatos vêm de uma UNION de buscas indexadas (remetente/descrição,
+    nome do morador e campos da unidade) em uma tabela derivada, ligada às
+    encomendas pela chave primária: um IN (... UNION ...) viraria uma
+    subconsulta dependente, executada para cada encomenda. A relevância do
+    MATCH é devolvida para ordenar o resultado.
+    A ordenação e o cursor usam relevancia_chave (a relevância arredondada a 6
+    casas, como inteiro): comparar o float do MATCH com "=" depois de ida e
+    volta pelo JSON do cursor não é confiável.
+    """
+    consulta = busca.consulta_booleana(busca.tokenizar(termo))
+    candidatos = []
+    params_relevancia = []
+    params_candidatos = []
+
+    if consulta:
+        relevancia = """(MATCH(e.remetente, e.descricao) AGAINST (%s IN BOOLEAN MODE)
+                    + COALESCE(MATCH(m.nome_completo) AGAINST (%s IN BOOLEAN MODE), 0))"""
+        params_relevancia = [consulta, consulta]
+        candidatos.append("""
+                    SELECT id FROM encomendas
+                    WHERE MATCH(remetente, descricao) AGAINST (%s IN BOOLEAN MODE)""")
+        candidatos.append("""
+                    SELECT eb.id FROM moradores mb
+                    JOIN encomendas eb ON eb.morador_id = mb.id
+                    WHERE MATCH(mb.nome_completo) AGAINST (%s IN BOOLEAN MODE)""")
+        params_candidatos.extend([consulta, consulta])
+    else:
+        relevancia = "0"
+
+    candidatos.append("""
+                    SELECT eu.id FROM unidades ub
+                    JOIN encomendas eu ON eu.unidade_destino_id = ub.id
+                    WHERE ub.numero LIKE %s OR ub.bloco LIKE %s OR ub.tipo_unidade LIKE %s""")
+    params_candidatos.extend([f"%{termo}%"] * 3)
+
+    sql = f"""
+            SELECT * FROM (
+                SELECT busca.*, CAST(ROUND(busca.relevancia * 1000000) AS SIGNED) AS relevancia_chave
+                FROM (
+                    SELECT
+                        {select_campos},
+                        {relevancia} AS relevancia
+                    FROM ({" UNION ".join(candidatos)}
+                    ) AS candidatos
+                    JOIN encomendas e ON e.id = candidatos.id
+                    LEFT JOIN moradores m ON e.morador_id = m.id
+                    LEFT JOIN unidades u ON e.unidade_destino_id = u.id
+                ) AS busca
+            ) AS busca_ordenada
+    """
+    return sql, params_relevancia + params_candidatos
+
 @app.route("/api/encomendas", methods=["GET"])
 @token_required
 def get_encomendas():
@@ -730,55 +1373,55 @@ def get_encomendas():
     if not check_permission(['ADMIN']): # Somente ADMIN pode listar todas as encomendas
         return jsonify({"error": "Apenas administradores podem listar todas as encomendas."}), 403
 
+    try:
+        limite = pagination.ler_limite(request.args)
+        campos = pagination.ler_campos(request.args, ENCOMENDAS_CAMPOS)
+    except ParametroInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
+
     conn = get_db_connection()
     if not conn:
         return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
 
     try:
         search_term = request.args.get('search_term')
-
-        sql_query = """
-            SELECT
-                e.id, e.remetente, e.descricao, e.data_chegada, e.status, e.data_retirada,
-                e.morador_id, e.unidade_destino_id, e.registrado_por_admin_id, e.criado_em,
-                m.nome_completo as morador_nome,
-                u.numero as morador_unidade_numero,
-                u.bloco as morador_unidade_bloco,
-                u.tipo_unidade as morador_unidade_tipo
-            FROM encomendas e
-            LEFT JOIN moradores m ON e.morador_id = m.id
-            LEFT JOIN unidades u ON e.unidade_destino_id = u.id
-        """
-        where_clauses = []
-        query_params = []
+        select_campos = pagination.montar_select(ENCOMENDAS_CAMPOS, campos, ['data_chegada', 'status', 'id'])
 
         if search_term:
-            search_pattern = f"%{search_term}%"
-            where_clauses.append("""
-                (e.remetente LIKE %s OR
-                 e.descricao LIKE %s OR
-                 m.nome_completo LIKE %s OR
-                 u.numero LIKE %s OR
-                 u.bloco LIKE %s OR
-                 u.tipo_unidade LIKE %s)
-            """)
-            query_params.extend([search_pattern, search_pattern, search_pattern, search_pattern, search_pattern, search_pattern])
-
-        if where_clauses:
-            sql_query += " WHERE " + " AND ".join(where_clauses)
-
-        sql_query += " ORDER BY e.data_chegada DESC, e.status ASC"
-
-        cursor.execute(sql_query, tuple(query_params))
-        encomendas = cursor.fetchall()
-
-        return jsonify(encomendas), 200
+            if not busca.tokenizar(search_term):
+                return resposta_paginada([], None)
+            sql_query, params_base = montar_busca_encomendas(select_campos, search_term)
+            encomendas, proximo_cursor = pagination.paginar(
+                cursor, 'encomendas-busca', sql_query,
+                ordem=[('relevancia_chave', 'DESC'), ('data_chegada', 'DESC'), ('id', 'DESC')],
+                campos_ordem=['relevancia_chave', 'data_chegada', 'id'],
+                params_base=params_base,
+                limite=limite, after=request.args.get('after')
+            )
+            for encomenda in encomendas:
+                encomenda.pop('relevancia_chave', None)
+        else:
+            sql_query = f"""
+                SELECT
+                    {select_campos}
+                {ENCOMENDAS_FROM_SQL}
+            """
+            encomendas, proximo_cursor = pagination.paginar(
+                cursor, 'encomendas', sql_query,
+                ordem=[('e.data_chegada', 'DESC'), ('e.status', 'ASC'), ('e.id', 'DESC')],
+                campos_ordem=['data_chegada', 'status', 'id'],
+                limite=limite, after=request.args.get('after')
+            )
+
+        return resposta_paginada(pagination.filtrar_campos(encomendas, campos), proximo_cursor)
+    except ParametroInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
     except mysql.connector.Error as err:
-        print(f"Erro no banco de dados ao buscar encomendas: {err}")
+        logger.error("Erro no banco de dados ao buscar encomendas: %s", err)
         return jsonify({"error": f"Erro ao buscar encomendas: {str(err)}"}), 500
     except Exception as e:
-        print(f"Erro interno do servidor ao buscar encomendas: {e}")
+        logger.exception("Erro interno do servidor ao buscar encomendas: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -824,15 +1467,15 @@ def register_encomenda_retirada(encomenda_id):
         """, (data['cpf'],))
         morador_auth_data = cursor.fetchone()
 
-        if not morador_auth_data or not bcrypt.check_password_hash(morador_auth_data['senha_hash'], data['password']):
+        if not morador_auth_data or not hashing_pool.verificar(morador_auth_data['senha_hash'], data['password']):
             return jsonify({"error": "CPF ou senha do morador inválidos."}), 401
 
         if encomenda_info['morador_id'] != UNREGISTERED_MORADOR_PLACEHOLDER_ID:
             if morador_auth_data['unidade_id'] != data['unidade_destino_id']:
-                print(f"ERRO RETIRADA: Unidade do morador autenticado ({morador_auth_data['unidade_id']}) NÃO corresponde à unidade de destino da encomenda ({data['unidade_destino_id']}).")
+                logger.warning("RETIRADA NEGADA: Unidade do morador autenticado (%s) NÃO corresponde à unidade de destino da encomenda (%s).", morador_auth_data['unidade_id'], data['unidade_destino_id'])
                 return jsonify({"error": "O morador autenticado não pertence à unidade de destino desta encomenda."}), 403
         else:
-            print(f"DEBUG RETIRADA: Encomenda para morador placeholder ({UNREGISTERED_MORADOR_PLACEHOLDER_ID}). Validação de unidade IGNORADA.")
+            logger.debug("RETIRADA: Encomenda para morador placeholder (%s). Validação de unidade IGNORADA.", UNREGISTERED_MORADOR_PLACEHOLDER_ID)
             pass
 
         sql_update = """
@@ -845,13 +1488,15 @@ def register_encomenda_retirada(encomenda_id):
 
         return jsonify({"message": "Retirada da encomenda registrada com sucesso!"}), 200
 
+    except FilaHashCheiaError as e:
+        return resposta_fila_hash_cheia(e)
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao registrar retirada: {err}")
+        logger.error("Erro no banco de dados ao registrar retirada: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao registrar retirada: {e}")
+        logger.exception("Erro interno ao registrar retirada: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -860,6 +1505,112 @@ def register_encomenda_retirada(encomenda_id):
             conn.close()
 
 
+@app.route("/api/encomendas/lote/retirada", methods=["PUT"])
+@token_required
+def register_encomendas_retirada_lote():
+    """
+    Registra a retirada de várias encomendas com uma única autenticação do
+    morador (um bcrypt, não um por pacote). Corpo: {"cpf", "password",
+    "encomenda_ids": [...]}. As encomendas são lidas e travadas com um SELECT
+    ... IN ... FOR UPDATE, a unidade de cada uma é conferida com a do morador e
+    as liberadas são marcadas 'Retirada' num único UPDATE. Cada id recebe seu
+    status: retirada, nao_encontrada, ja_retirada ou unidade_divergente.
+    """
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Apenas administradores podem registrar a retirada de encomendas."}), 403
+
+    data = request.get_json(silent=True) or {}
+    if not all(k in data for k in ['cpf', 'password', 'encomenda_ids']):
+        return jsonify({"error": "CPF, senha do morador e encomenda_ids são obrigatórios para retirada."}), 400
+    ids = data['encomenda_ids']
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "encomenda_ids deve ser uma lista não vazia."}), 400
+    if len(ids) > ENCOMENDAS_LOTE_MAX:
+        return jsonify({"error": f"Máximo de {ENCOMENDAS_LOTE_MAX} encomendas por lote."}), 413
+    try:
+        ids = list(dict.fromkeys(int(i) for i in ids))
+    except (TypeError, ValueError):
+        return jsonify({"error": "encomenda_ids deve conter apenas números inteiros."}), 400
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+        cursor = conn.cursor(dictionary=True)
+
+        # Autentica antes de travar as encomendas, para não segurar locks durante o bcrypt.
+        cursor.execute("""
+            SELECT id, senha_hash, unidade_id
+            FROM moradores
+            WHERE cpf = %s AND ativo = TRUE
+        """, (data['cpf'],))
+        morador_auth_data = cursor.fetchone()
+        if not morador_auth_data or not hashing_pool.verificar(morador_auth_data['senha_hash'], data['password']):
+            return jsonify({"error": "CPF ou senha do morador inválidos."}), 401
+
+        # autocommit desligado: o FOR UPDATE trava as linhas até o commit abaixo.
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"""
+            SELECT id, morador_id, unidade_destino_id, status
+            FROM encomendas
+            WHERE id IN ({placeholders})
+            FOR UPDATE
+        """, tuple(ids))
+        encontradas = {e['id']: e for e in cursor.fetchall()}
+
+        resultados = []
+        liberadas = []
+        for encomenda_id in ids:
+            encomenda_info = encontradas.get(encomenda_id)
+            if not encomenda_info:
+                status = 'nao_encontrada'
+            elif encomenda_info['status'] == 'Retirada':
+                status = 'ja_retirada'
+            elif (encomenda_info['morador_id'] != UNREGISTERED_MORADOR_PLACEHOLDER_ID
+                  and encomenda_info['unidade_destino_id'] != morador_auth_data['unidade_id']):
+                # Encomendas do morador placeholder podem ser retiradas por qualquer morador autenticado.
+                status = 'unidade_divergente'
+            else:
+                status = 'retirada'
+                liberadas.append(encomenda_id)
+            resultados.append({"id": encomenda_id, "status": status})
+
+        if liberadas:
+            placeholders = ", ".join(["%s"] * len(liberadas))
+            cursor.execute(f"""
+                UPDATE encomendas
+                SET status = 'Retirada', data_retirada = CURDATE()
+                WHERE id IN ({placeholders})
+            """, tuple(liberadas))
+        conn.commit()
+
+        logger.info("Retirada em lote pelo morador #%s: %s de %s encomendas.",
+                    morador_auth_data['id'], len(liberadas), len(ids))
+        return jsonify({
+            "retiradas": len(liberadas),
+            "resultados": resultados,
+        }), 200 if liberadas else 409
+
+    except FilaHashCheiaError as e:
+        return resposta_fila_hash_cheia(e)
+    except mysql.connector.Error as err:
+        if conn and conn.is_connected():
+            conn.rollback()
+        logger.error("Erro no banco de dados ao registrar retirada em lote: %s", err)
+        return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
+    except Exception as e:
+        if conn and conn.is_connected():
+            conn.rollback()
+        logger.exception("Erro interno ao registrar retirada em lote: %s", e)
+        return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn and conn.is_connected():
+            conn.close()
+
 # --- ROTAS DE CRIAÇÃO (POST) (Já existentes, mantidas como estão ou ajustadas) ---
 @app.route("/api/visitantes", methods=["POST"])
 @token_required
@@ -922,11 +1673,11 @@ def add_visitor():
         return jsonify({"message": "Visitante registrado com sucesso!"}), 201
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao adicionar visitante: {err}")
+        logger.error("Erro no banco de dados ao adicionar visitante: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro ao registrar visitante: {e}")
+        logger.exception("Erro ao registrar visitante: %s", e)
         return jsonify({"error": f"Erro ao registrar visitante: {str(e)}"}), 500
     finally:
         if cursor:
@@ -937,6 +1688,8 @@ def add_visitor():
 @app.route("/api/ocorrencias", methods=["POST"])
 @token_required
 def add_occurrence():
+    conn = None
+    cursor = None
     try:
         current_user_identity = request.user_identity
         user_id = current_user_identity.get('user_id')
@@ -964,11 +1717,14 @@ def add_occurrence():
             data['occurrence_date'],
             user_id
         ))
+        ocorrencias_resumo.registrar_nova(cursor, occurrence_type)
         conn.commit()
+        dashboard_cache.invalidate('resumo_ocorrencias')
         return jsonify({"message": "Ocorrência registrada com sucesso!"}), 201
     except Exception as e:
-        conn.rollback();
-        print(f"Erro ao registrar ocorrência: {e}")
+        if conn and conn.is_connected():
+            conn.rollback()
+        logger.exception("Erro ao registrar ocorrência: %s", e)
         return jsonify({"error": str(e)}), 500
     finally:
         if cursor:
@@ -994,72 +1750,87 @@ def add_reservation():
             return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
         cursor = conn.cursor(dictionary=True)
 
-        check_sql = """
-            SELECT status
-            FROM reservas
-            WHERE nome_espaco = %s AND data_reserva = %s
-        """
-        cursor.execute(check_sql, (data['space_name'], data['reservation_date']))
-        existing_reservation = cursor.fetchone()
-
-        if existing_reservation:
-            if existing_reservation['status'] == 'Aprovada':
-                return jsonify({"error": "Espaço já reservado para esta data e status 'Aprovada'."}), 409
-            else:
-                return jsonify({"error": "Já existe uma reserva pendente para esta data."}), 409
-
         cursor.execute("SELECT email FROM moradores WHERE id = %s", (user_id,))
         morador_record = cursor.fetchone()
         if not morador_record:
             raise Exception("Morador não encontrado para o ID fornecido no token.")
         user_email = morador_record['email']
 
-        sql_insert = """
-            INSERT INTO reservas
-                (nome_espaco, data_reserva, status, morador_id)
-            VALUES
-                (%s, %s, 'Pendente', %s)
-        """
-        cursor.execute(sql_insert, (data['space_name'], data['reservation_date'], user_id))
-        reserva_id = cursor.lastrowid
-        conn.commit()
-        print(f"Reserva #{reserva_id} criada como 'Pendente'.")
-
-        if reserva_id:
-            payment_amount = 0.10
-            payment_data = {
-                "transaction_amount": payment_amount,
-                "description": f"Taxa de reserva para {data['space_name']} em {data['reservation_date']}",
-                "payment_method_id": "pix",
-                "payer": { "email": user_email },
-                "notification_url": f"https://67ff-2804-1128-bd48-a100-84f0-612c-d46b-f966.ngrok-free.app/api/webhooks/mercadopago",
-                "external_reference": str(reserva_id)
+        # Fase 1: trava a data. A UNIQUE (nome_espaco, data_reserva) resolve a
+        # disputa entre moradores; travas vencidas da mesma data são reaproveitadas.
+        try:
+            reserva_id = reservas_pendentes.criar_trava(
+                conn, data['space_name'], data['reservation_date'], user_id, RESERVA_TRAVA_SEGUNDOS
+            )
+        except reservas_pendentes.DataIndisponivelError as e:
+            if e.status_atual == 'Aprovada':
+                return jsonify({"error": "Espaço já reservado para esta data e status 'Aprovada'."}), 409
+            return jsonify({"error": "Já existe uma reserva pendente para esta data."}), 409
+        dashboard_cache.invalidate('resumo_reservas')
+        logger.info("Reserva #%s criada como 'Pendente' (trava de %ss).", reserva_id, RESERVA_TRAVA_SEGUNDOS)
+
+        # Devolve a conexão ao pool antes de chamar o Mercado Pago: a geração do
+        # PIX pode demorar e não precisa do banco.
+        cursor.close()
+        cursor = None
+        conn.close()
+        conn = None
+
+        # Fase 2: gera o PIX com prazo curto. O PIX expira antes da trava, então
+        # um pagamento nunca é aprovado depois que a data foi liberada.
+        expiracao_pix = (datetime.datetime.now(datetime.timezone.utc)
+                         + datetime.timedelta(seconds=RESERVA_TRAVA_SEGUNDOS - RESERVA_MARGEM_PIX_SEGUNDOS))
+        payment_data = {
+            "transaction_amount": 0.10,
+            "description": f"Taxa de reserva para {data['space_name']} em {data['reservation_date']}",
+            "payment_method_id": "pix",
+            "payer": { "email": user_email },
+            "notification_url": f"https://67ff-2804-1128-bd48-a100-84f0-612c-d46b-f966.ngrok-free.app/api/webhooks/mercadopago",
+            "external_reference": str(reserva_id),
+            "date_of_expiration": expiracao_pix.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'),
+        }
+        try:
+            payment_response = payment_gateway.criar_pagamento(
+                payment_data, idempotency_key=f"reserva-{reserva_id}",
+                timeout=RESERVA_PIX_TIMEOUT, prazo_total=RESERVA_PIX_TIMEOUT
+            )
+        except GatewayIndisponivelError as e:
+            # Resultado incerto (a cobrança pode ter sido criada): a trava é mantida
+            # até expirar e o morador pode pedir o PIX de novo pelo create-payment,
+            # que reaproveita a mesma chave de idempotência.
+            logger.warning("Mercado Pago indisponível ao gerar PIX da reserva #%s: %s", reserva_id, e)
+            return jsonify({
+                "error": "Reserva registrada, mas o serviço de pagamento está indisponível. Tente gerar o PIX novamente em instantes.",
+                "reserva_id": reserva_id
+            }), 503
+
+        if payment_response["status"] in (200, 201):
+            payment = payment_response["response"]
+            pix_data = {
+                "reserva_id": reserva_id,
+                "payment_id": payment["id"],
+                "qr_code_image": payment["point_of_interaction"]["transaction_data"]["qr_code_base64"],
+                "qr_code_text": payment["point_of_interaction"]["transaction_data"]["qr_code"]
             }
-            payment_response = sdk.payment().create(payment_data)
-
-            if payment_response["status"] == 201:
-                payment = payment_response["response"]
-                pix_data = {
-                    "payment_id": payment["id"],
-                    "qr_code_image": payment["point_of_interaction"]["transaction_data"]["qr_code_base64"],
-                    "qr_code_text": payment["point_of_interaction"]["transaction_data"]["qr_code"]
-                }
-                return jsonify(pix_data), 201
-            else:
-                conn.rollback()
-                raise Exception(payment_response["response"].get("message", "Erro desconhecido no Mercado Pago."))
-        else:
-             return jsonify({"error": "Erro inesperado ao criar reserva."}), 500
+            return jsonify(pix_data), 201
+
+        # O Mercado Pago recusou a cobrança: libera a data na hora.
+        mensagem = (payment_response["response"] or {}).get("message", "Erro desconhecido no Mercado Pago.")
+        conn = get_db_connection()
+        if conn:
+            reservas_pendentes.liberar_trava(conn, reserva_id)
+            dashboard_cache.invalidate('resumo_reservas')
+        return jsonify({"error": f"Falha ao gerar pagamento: {mensagem}"}), 502
 
     except mysql.connector.Error as err:
         if conn and conn.is_connected():
             conn.rollback()
-        print(f"Erro no banco de dados ao criar reserva: {err}")
+        logger.error("Erro no banco de dados ao criar reserva: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         if conn and conn.is_connected():
             conn.rollback()
-        print(f"Erro geral ao adicionar reserva: {e}")
+        logger.exception("Erro geral ao adicionar reserva: %s", e)
         return jsonify({"error": f"Falha ao criar reserva ou gerar pagamento: {e}"}), 500
     finally:
         if cursor:
@@ -1067,28 +1838,241 @@ def add_reservation():
         if conn and conn.is_connected():
             conn.close()
 
+# --- SEÇÕES DO DASHBOARD ---
+# Cada seção recebe um cursor e a identidade do token e devolve os dados prontos
+# para o JSON (as linhas em tupla viram dicionários em json_provider.registros). São usadas tanto pelas rotas individuais quanto
+# pelo /api/dashboard, que monta todas em uma única requisição.
+
+# SQL das seções, compartilhado com o modo assíncrono (asgi.py).
+MINHAS_RESERVAS_SQL = """
+        SELECT id, nome_espaco as space_name, data_reserva as reservation_date, status
+        FROM reservas
+        WHERE morador_id = %s
+        ORDER BY data_reserva DESC
+"""
+
+MEUS_VISITANTES_SQL = """
+        SELECT id, nome_completo as name, cpf, data_liberacao as release_date
+        FROM visitantes
+        WHERE morador_id = %s
+        ORDER BY data_liberacao DESC
+"""
+
+MINHAS_ENCOMENDAS_SQL = f"""
+        SELECT
+            {pagination.montar_select(ENCOMENDAS_CAMPOS, None, [])}
+        {ENCOMENDAS_FROM_SQL}
+        WHERE e.morador_id = %s AND e.morador_id != %s
+        ORDER BY e.data_chegada DESC, e.status ASC
+"""
+
+# Lê os contadores mantidos por add_occurrence (ver ocorrencias_resumo.py).
+RESUMO_OCORRENCIAS_SQL = """
+        SELECT tipo_ocorrencia as occurrence_type, total as count
+        FROM ocorrencias_resumo
+        WHERE status = 'Aberto' AND total > 0
+        ORDER BY count DESC
+"""
+
+RESUMO_RESERVAS_SQL = RESERVAS_RESUMO_SQL + """
+        WHERE r.status IN ('Aprovada', 'Pendente')
+        ORDER BY r.data_reserva ASC
+"""
+
+def secao_minhas_reservas(cursor, identidade):
+    cursor.execute(MINHAS_RESERVAS_SQL, (identidade.get('user_id'),))
+    return registros_do_cursor(cursor)
+
+def secao_meus_visitantes(cursor, identidade):
+    cursor.execute(MEUS_VISITANTES_SQL, (identidade.get('user_id'),))
+    return registros_do_cursor(cursor)
+
+def secao_minhas_encomendas(cursor, identidade):
+    if identidade.get('role') == 'ADMIN':
+        return []
+    cursor.execute(MINHAS_ENCOMENDAS_SQL, (identidade.get('user_id'), UNREGISTERED_MORADOR_PLACEHOLDER_ID))
+    return registros_do_cursor(cursor)
+
+def secao_resumo_ocorrencias(cursor, identidade):
+    cursor.execute(RESUMO_OCORRENCIAS_SQL)
+    return registros_do_cursor(cursor)
+
+AVISOS_CAMPOS = {
+    'id': 'id',
+    'titulo': 'titulo',
+    'conteudo': 'conteudo',
+    'imagem_url': 'imagem_url',
+    'prioridade': 'prioridade',
+    'data_publicacao': 'data_publicacao',
+    'data_expiracao': 'data_expiracao',
+    'registrado_por_user_id': 'registrado_por_user_id',
+    'registrado_por_user_role': 'registrado_por_user_role',
+    'ativo': 'ativo',
+}
+
+AVISOS_VIGENTES_SQL = "ativo = TRUE AND (data_expiracao IS NULL OR data_expiracao > NOW())"
+
+AVISOS_FEED_SQL = f"""
+        SELECT
+            {pagination.montar_select(AVISOS_CAMPOS, None, [])}
+        FROM avisos
+        WHERE {AVISOS_VIGENTES_SQL}
+        ORDER BY prioridade DESC, data_publicacao DESC, id DESC
+"""
+
+# Usa o relógio do banco, o mesmo do filtro acima.
+AVISOS_PROXIMA_EXPIRACAO_SQL = f"""
+        SELECT TIMESTAMPDIFF(SECOND, NOW(), MIN(data_expiracao)) AS segundos
+        FROM avisos
+        WHERE {AVISOS_VIGENTES_SQL} AND data_expiracao IS NOT NULL
+"""
+
+def montar_entrada_feed(avisos, proxima):
+    """
+    Entrada do avisos_feed_cache: os dados, o corpo JSON já serializado, ETag,
+    Last-Modified, os segundos até o próximo aviso expirar (None se nenhum
+    tiver data_expiracao futura) e esse mesmo instante em time.monotonic().
+    """
+    corpo = app.json.dumps(avisos).encode('utf-8')
+    return {
+        'dados': avisos,
+        'corpo': corpo,
+        'etag': hashlib.sha1(corpo).hexdigest(),
+        'last_modified': datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0),
+        'expira_em_segundos': proxima,
+        # +1 s para recarregar já depois do vencimento (o filtro usa "> NOW()").
+        'vence_em': time.monotonic() + max(1, proxima + 1) if proxima is not None else None,
+    }
+
+def carregar_feed_avisos(cursor):
+    """Lê os avisos vigentes e devolve a entrada do avisos_feed_cache."""
+    cursor.execute(AVISOS_FEED_SQL)
+    avisos = registros_do_cursor(cursor)
+    cursor.execute(AVISOS_PROXIMA_EXPIRACAO_SQL)
+    return montar_entrada_feed(avisos, registros_do_cursor(cursor)[0]['segundos'])
+
+def _ttl_ate_vencimento(ttl, entrada):
+    """ttl limitado ao vencimento do próximo aviso do feed (entrada de montar_entrada_feed)."""
+    if entrada is None or entrada['vence_em'] is None:
+        return ttl
+    return min(ttl, max(0, entrada['vence_em'] - time.monotonic()))
+
+def guardar_feed_avisos(entrada, geracao):
+    avisos_feed_cache.set('feed', entrada, ttl=_ttl_ate_vencimento(avisos_feed_cache.ttl, entrada), geracao=geracao)
+
+def obter_feed_avisos(cursor_factory):
+    """
+    Devolve o feed do cache ou o recalcula. cursor_factory() só é chamado em
+    caso de miss, para que um hit não precise de conexão com o banco.
+    """
+    entrada = avisos_feed_cache.get('feed')
+    if entrada is None:
+        geracao = avisos_feed_cache.geracao()
+        entrada = carregar_feed_avisos(cursor_factory())
+        guardar_feed_avisos(entrada, geracao)
+    return entrada
+
+def invalidar_avisos():
+    avisos_feed_cache.invalidate('feed')
+    dashboard_cache.invalidate('avisos')
+
+def secao_avisos(cursor, identidade):
+    return obter_feed_avisos(lambda: cursor)['dados']
+
+def ttl_secao_compartilhada(nome):
+    """
+    TTL de uma seção compartilhada no dashboard_cache. A de avisos não passa do
+    vencimento do próximo aviso, como o próprio feed: senão um aviso vencido
+    continuaria no dashboard até o fim do DASHBOARD_CACHE_TTL.
+    """
+    if nome == 'avisos':
+        return _ttl_ate_vencimento(dashboard_cache.ttl, avisos_feed_cache.get('feed'))
+    return dashboard_cache.ttl
+
+def secao_resumo_reservas(cursor, identidade):
+    cursor.execute(RESUMO_RESERVAS_SQL)
+    return registros_do_cursor(cursor)
+
+# (função, compartilhada entre usuários). As seções compartilhadas ficam no
+# dashboard_cache; as do próprio usuário são sempre lidas do banco.
+SECOES_DASHBOARD = {
+    'minhas_reservas': (secao_minhas_reservas, False),
+    'meus_visitantes': (secao_meus_visitantes, False),
+    'resumo_ocorrencias': (secao_resumo_ocorrencias, True),
+    'minhas_encomendas': (secao_minhas_encomendas, False),
+    'avisos': (secao_avisos, True),
+    'resumo_reservas': (secao_resumo_reservas, True),
+}
+
+@app.route("/api/dashboard", methods=["GET"])
+@token_required
+def get_dashboard():
+    """
+    Reúne em uma resposta as seis consultas da tela inicial do dashboard, com uma
+    única validação de token e uma única conexão. ?sections=a,b limita as seções
+    (útil para atualizar só uma). Cada seção vem com sua ETag em "etags", e a
+    resposta inteira tem ETag própria para requisições condicionais (304).
+    """
+    identidade = request.user_identity
+    pedidas = request.args.get('sections')
+    if pedidas:
+        nomes = [n.strip() for n in pedidas.split(',') if n.strip()]
+        desconhecidas = [n for n in nomes if n not in SECOES_DASHBOARD]
+        if desconhecidas:
+            return jsonify({"error": f"Seções desconhecidas: {', '.join(desconhecidas)}"}), 400
+    else:
+        nomes = list(SECOES_DASHBOARD)
+
+    resultado = {}
+    etags = {}
+    conn = None
+    cursor = None
+    try:
+        for nome in nomes:
+            funcao, compartilhada = SECOES_DASHBOARD[nome]
+            entrada = dashboard_cache.get(nome) if compartilhada else None
+            if entrada is None:
+                geracao = dashboard_cache.geracao()
+                if conn is None:
+                    conn = get_db_connection()
+                    if not conn:
+                        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+                    cursor = conn.cursor()
+                dados = funcao(cursor, identidade)
+                entrada = (dados, hashlib.sha1(app.json.dumps(dados).encode('utf-8')).hexdigest())
+                if compartilhada:
+                    dashboard_cache.set(nome, entrada, ttl=ttl_secao_compartilhada(nome), geracao=geracao)
+            resultado[nome], etags[nome] = entrada
+
+        response = jsonify({**resultado, "etags": etags})
+        response.set_etag(hashlib.sha1("|".join(f"{n}:{etags[n]}" for n in nomes).encode('utf-8')).hexdigest())
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.exception("Erro ao montar o dashboard: %s", e)
+        return jsonify({"error": f"Erro ao buscar dados do dashboard: {e}"}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn and conn.is_connected():
+            conn.close()
+
 # --- ROTAS DE LEITURA (GET) ---
 @app.route("/api/minhas-reservas", methods=["GET"])
 @token_required
 def get_my_reservations():
     try:
         current_user_identity = request.user_identity
-        user_id = current_user_identity.get('user_id')
 
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, nome_espaco as space_name, data_reserva as reservation_date, status
-            FROM reservas
-            WHERE morador_id = %s
-            ORDER BY data_reserva DESC
-        """, (user_id,))
-        reservas = cursor.fetchall()
+        cursor = conn.cursor()
+        reservas = secao_minhas_reservas(cursor, current_user_identity)
         return jsonify(reservas), 200
     except Exception as e:
-        print(f"Erro ao buscar minhas reservas: {e}")
+        logger.exception("Erro ao buscar minhas reservas: %s", e)
         return jsonify({"error": f"Erro ao buscar reservas: {e}"}), 500
     finally:
         if cursor:
@@ -1101,22 +2085,15 @@ def get_my_reservations():
 def get_my_visitors():
     try:
         current_user_identity = request.user_identity
-        user_id = current_user_identity.get('user_id')
 
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, nome_completo as name, cpf, data_liberacao as release_date
-            FROM visitantes
-            WHERE morador_id = %s
-            ORDER BY data_liberacao DESC
-        """, (user_id,))
-        visitantes = cursor.fetchall()
+        cursor = conn.cursor()
+        visitantes = secao_meus_visitantes(cursor, current_user_identity)
         return jsonify(visitantes), 200
     except Exception as e:
-        print(f"Erro ao buscar meus visitantes: {e}")
+        logger.exception("Erro ao buscar meus visitantes: %s", e)
         return jsonify({"error": f"Erro ao buscar visitantes: {e}"}), 500
     finally:
         if cursor:
@@ -1129,38 +2106,17 @@ def get_my_visitors():
 @token_required
 def get_my_encomendas():
     current_user_identity = request.user_identity
-    user_id = current_user_identity.get('user_id')
-    user_role = current_user_identity.get('role')
 
     conn = get_db_connection()
     if not conn:
         return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
 
     try:
-        if user_role == 'ADMIN':
-            return jsonify([]), 200
-
-        sql = """
-            SELECT
-                e.id, e.remetente, e.descricao, e.data_chegada, e.status, e.data_retirada,
-                e.morador_id, e.unidade_destino_id, e.registrado_por_admin_id, e.criado_em,
-                m.nome_completo as morador_nome,
-                u.numero as morador_unidade_numero,
-                u.bloco as morador_unidade_bloco,
-                u.tipo_unidade as morador_unidade_tipo
-            FROM encomendas e
-            LEFT JOIN moradores m ON e.morador_id = m.id
-            LEFT JOIN unidades u ON e.unidade_destino_id = u.id
-            WHERE e.morador_id = %s AND e.morador_id != %s
-            ORDER BY e.data_chegada DESC, e.status ASC
-        """
-        cursor.execute(sql, (user_id, UNREGISTERED_MORADOR_PLACEHOLDER_ID))
-        encomendas = cursor.fetchall()
-
+        encomendas = secao_minhas_encomendas(cursor, current_user_identity)
         return jsonify(encomendas), 200
     except Exception as e:
-        print(f"Erro ao buscar minhas encomendas: {e}")
+        logger.exception("Erro ao buscar minhas encomendas: %s", e)
         return jsonify({"error": f"Erro ao buscar minhas encomendas: {e}"}), 500
     finally:
         if cursor:
@@ -1179,20 +2135,11 @@ def get_occurrences_summary():
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-        cursor = conn.cursor(dictionary=True)
-
-        sql = """
-            SELECT tipo_ocorrencia as occurrence_type, COUNT(*) as count
-            FROM ocorrencias
-            WHERE status = 'Aberto'
-            GROUP BY tipo_ocorrencia
-            ORDER BY count DESC
-        """
-        cursor.execute(sql)
-        resumo = cursor.fetchall()
+        cursor = conn.cursor()
+        resumo = secao_resumo_ocorrencias(cursor, request.user_identity)
         return jsonify(resumo), 200
     except Exception as e:
-        print(f"Erro ao buscar resumo de ocorrências: {e}")
+        logger.exception("Erro ao buscar resumo de ocorrências: %s", e)
         return jsonify({"error": f"Erro ao buscar resumo de ocorrências: {e}"}), 500
     finally:
         if cursor:
@@ -1200,27 +2147,72 @@ def get_occurrences_summary():
         if conn and conn.is_connected():
             conn.close()
 
+@app.route("/api/admin/ocorrencias/reconciliar", methods=["POST"])
+@token_required
+def reconcile_occurrence_counters():
+    """
+    Confere os contadores de ocorrências com a tabela base. Por padrão corrige as
+    divergências; com ?dry_run=1 apenas as lista.
+    """
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem reconciliar os contadores."}), 403
+    corrigir = request.args.get('dry_run', '').lower() not in ('1', 'true', 'sim')
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+    try:
+        divergencias = ocorrencias_resumo.reconciliar(conn, corrigir=corrigir)
+        if divergencias and corrigir:
+            dashboard_cache.invalidate('resumo_ocorrencias')
+        return jsonify({"corrigido": corrigir, "divergencias": divergencias}), 200
+    except mysql.connector.Error as err:
+        logger.error("Erro ao reconciliar contadores de ocorrências: %s", err)
+        return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
+    finally:
+        conn.close()
+
 @app.route("/api/reservations/booked-dates", methods=["GET"])
 @token_required
 def get_booked_dates():
+    """
+    Datas com reserva aprovada para um espaço, servidas do booked_dates_cache.
+    A resposta leva ETag e Last-Modified; com If-None-Match/If-Modified-Since
+    o navegador recebe 304 quando nada mudou.
+    """
+    conn = None
+    cursor = None
     try:
-        request.user_identity
-
         space_name = request.args.get('space')
         if not space_name:
             return jsonify({"error": "Nome do espaço não fornecido."}), 400
 
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-        cursor = conn.cursor()
-
-        sql = "SELECT data_reserva FROM reservas WHERE nome_espaco = %s AND status = 'Aprovada'"
-        cursor.execute(sql, (space_name,))
-        datas_reservadas = [item[0].strftime('%Y-%m-%d') for item in cursor.fetchall()]
-        return jsonify(datas_reservadas), 200
+        entrada = booked_dates_cache.get(space_name)
+        if entrada is None:
+            geracao = booked_dates_cache.geracao()
+            conn = get_db_connection()
+            if not conn:
+                return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+            cursor = conn.cursor()
+
+            sql = "SELECT data_reserva FROM reservas WHERE nome_espaco = %s AND status = 'Aprovada'"
+            cursor.execute(sql, (space_name,))
+            corpo = app.json.dumps([item[0] for item in cursor.fetchall()]).encode('utf-8')
+            entrada = {
+                'corpo': corpo,
+                'etag': hashlib.sha1(corpo).hexdigest(),
+                'last_modified': datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0),
+            }
+            booked_dates_cache.set(space_name, entrada, geracao=geracao)
+
+        response = Response(entrada['corpo'], mimetype='application/json')
+        response.set_etag(entrada['etag'])
+        response.last_modified = entrada['last_modified']
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
-        print(f"Erro ao buscar datas reservadas: {e}")
+        logger.exception("Erro ao buscar datas reservadas: %s", e)
         return jsonify({"error": f"Erro ao buscar datas reservadas: {e}"}), 500
     finally:
         if cursor:
@@ -1228,6 +2220,76 @@ def get_booked_dates():
         if conn and conn.is_connected():
             conn.close()
 
+# --- ROTAS DE EXPORTAÇÃO (STREAMING NDJSON/CSV) ---
+EXPORTACOES_SQL = {
+    'encomendas': f"""
+            SELECT
+                {pagination.montar_select(ENCOMENDAS_CAMPOS, None, [])}
+            {ENCOMENDAS_FROM_SQL}
+            ORDER BY e.data_chegada DESC, e.status ASC, e.id DESC
+    """,
+    'visitantes': """
+            SELECT
+                v.id, v.nome_completo, v.cpf, v.data_liberacao, v.possui_veiculo,
+                v.placa_veiculo, v.modelo_veiculo, v.cor_veiculo, v.unidade_visitada,
+                v.observacoes, v.morador_id, m.nome_completo AS morador_nome, v.registrado_em
+            FROM visitantes v
+            LEFT JOIN moradores m ON v.morador_id = m.id
+            ORDER BY v.data_liberacao DESC, v.id DESC
+    """,
+    'reservas': RESERVAS_RESUMO_SQL + """
+            ORDER BY r.data_reserva DESC
+    """,
+}
+
+@app.route("/api/exportar/<recurso>", methods=["GET"])
+@token_required
+def exportar_historico(recurso):
+    """
+    Exporta todo o histórico de encomendas, visitantes ou reservas.
+    ?format=ndjson (padrão) ou ?format=csv. As linhas são lidas de um cursor
+    não bufferizado e enviadas em uma resposta chunked, sem montar a lista em memória.
+    """
+    if not check_permission(['ADMIN']):
+        return jsonify({"error": "Acesso negado. Apenas administradores podem exportar dados."}), 403
+    if recurso not in EXPORTACOES_SQL:
+        return jsonify({"error": "Exportação não encontrada. Use encomendas, visitantes ou reservas."}), 404
+
+    formato = request.args.get('format', 'ndjson').lower()
+    if formato not in exportacao.FORMATOS:
+        return jsonify({"error": "Formato inválido. Use 'ndjson' ou 'csv'."}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+
+    cursor = None
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(EXPORTACOES_SQL[recurso])
+    except mysql.connector.Error as err:
+        logger.error("Erro no banco de dados ao exportar %s: %s", recurso, err)
+        if cursor:
+            cursor.close()
+        conn.close()
+        return jsonify({"error": f"Erro ao exportar {recurso}: {str(err)}"}), 500
+
+    def liberar_conexao():
+        # Chamado pelo servidor ao fim do envio (ou se o cliente desconectar).
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    response = Response(
+        stream_with_context(exportacao.gerar_exportacao(cursor, formato)),
+        mimetype=exportacao.FORMATOS[formato]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{recurso}.{formato}"'
+    response.call_on_close(liberar_conexao)
+    return response
+
 # --- ROTAS CRUD PARA AVISOS ---
 @app.route("/api/avisos", methods=["POST"])
 @token_required
@@ -1262,7 +2324,7 @@ def add_aviso():
             data['titulo'],
             data['conteudo'],
             data.get('imagem_url'),
-            data.get('prioridade', 0),
+            data['prioridade'] if data.get('prioridade') is not None else 0,
             data_expiracao_obj,
             datetime.datetime.utcnow(),  # ESTE É O PARÂMETRO QUE FALTAVA
             registrado_por_user_id,
@@ -1271,14 +2333,15 @@ def add_aviso():
             # O número de %s e de parâmetros agora casa.
         ))
         conn.commit()
+        invalidar_avisos()
         return jsonify({"message": "Aviso postado com sucesso!"}), 201
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao adicionar aviso: {err}")
+        logger.error("Erro no banco de dados ao adicionar aviso: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao adicionar aviso: {e}")
+        logger.exception("Erro interno ao adicionar aviso: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -1294,34 +2357,61 @@ def get_all_avisos():
     Avisos inativos não serão retornados por esta rota, independentemente do papel do usuário.
     Se precisar de uma rota para ADMIN/PORTARIA ver TODOS os avisos (ativos e inativos),
     crie uma rota separada como /api/avisos/todos.
+    Aceita ?limit=, ?after= (paginação por cursor) e ?fields= (projeção de campos).
+    Sem esses parâmetros, o feed completo sai do avisos_feed_cache já serializado,
+    com ETag/Last-Modified (304 quando nada mudou).
+    Avisos com data_expiracao no passado não são retornados.
     """
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
-    cursor = conn.cursor(dictionary=True)
+    try:
+        limite = pagination.ler_limite(request.args)
+        campos = pagination.ler_campos(request.args, AVISOS_CAMPOS)
+    except ParametroInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
 
+    conn = None
+    cursor = None
     try:
-        sql = """
+        if limite is None and campos is None:
+            def abrir_cursor():
+                nonlocal conn, cursor
+                conn = db_pool.get_connection()
+                cursor = conn.cursor()
+                return cursor
+
+            entrada = obter_feed_avisos(abrir_cursor)
+            response = Response(entrada['corpo'], mimetype='application/json')
+            response.set_etag(entrada['etag'])
+            response.last_modified = entrada['last_modified']
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Erro de conexão com o banco de dados."}), 500
+        cursor = conn.cursor()
+
+        sql = f"""
             SELECT
-                id, titulo, conteudo, imagem_url, prioridade,
-                data_publicacao, data_expiracao, registrado_por_user_id,
-                registrado_por_user_role, ativo
+                {pagination.montar_select(AVISOS_CAMPOS, campos, ['prioridade', 'data_publicacao', 'id'])}
             FROM avisos
-            WHERE ativo = TRUE -- Adicionado o filtro para avisos ativos
-            ORDER BY prioridade DESC, data_publicacao DESC
         """
-        cursor.execute(sql)
-        avisos = cursor.fetchall()
-
-        # Converte objetos datetime para string ISO format
-        for aviso in avisos:
-            if isinstance(aviso['data_publicacao'], datetime.datetime):
-                aviso['data_publicacao'] = aviso['data_publicacao'].isoformat()
-            if isinstance(aviso['data_expiracao'], datetime.datetime):
-                aviso['data_expiracao'] = aviso['data_expiracao'].isoformat()
-        return jsonify(avisos), 200
+        avisos, proximo_cursor = pagination.paginar(
+            cursor, 'avisos', sql,
+            ordem=[('prioridade', 'DESC'), ('data_publicacao', 'DESC'), ('id', 'DESC')],
+            campos_ordem=['prioridade', 'data_publicacao', 'id'],
+            where_clauses=[AVISOS_VIGENTES_SQL],
+            limite=limite, after=request.args.get('after')
+        )
+        avisos = pagination.filtrar_campos(avisos, campos)
+        return resposta_paginada(avisos, proximo_cursor)
+    except mysql.connector.Error as err:
+        logger.error("Erro no banco de dados ao buscar avisos: %s", err)
+        return jsonify({"error": f"Erro ao buscar avisos: {err}"}), 500
+    except ParametroInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"Erro ao buscar avisos: {e}")
+        logger.exception("Erro ao buscar avisos: %s", e)
         return jsonify({"error": f"Erro ao buscar avisos: {e}"}), 500
     finally:
         if cursor:
@@ -1355,14 +2445,9 @@ def get_aviso_by_id(aviso_id):
         if not aviso:
             return jsonify({"error": "Aviso não encontrado."}), 404
 
-        if isinstance(aviso['data_publicacao'], datetime.datetime):
-            aviso['data_publicacao'] = aviso['data_publicacao'].isoformat()
-        if isinstance(aviso['data_expiracao'], datetime.datetime):
-            aviso['data_expiracao'] = aviso['data_expiracao'].isoformat()
-
         return jsonify(aviso), 200
     except Exception as e:
-        print(f"Erro ao buscar aviso por ID: {e}")
+        logger.exception("Erro ao buscar aviso por ID: %s", e)
         return jsonify({"error": f"Erro ao buscar aviso: {e}"}), 500
     finally:
         if cursor:
@@ -1405,7 +2490,8 @@ def update_aviso(aviso_id):
             values.append(data['imagem_url'])
         if 'prioridade' in data:
             set_clauses.append("prioridade = %s")
-            values.append(data['prioridade'])
+            # A coluna é NOT NULL (chave da paginação); null volta ao padrão.
+            values.append(data['prioridade'] if data['prioridade'] is not None else 0)
         if 'data_expiracao' in data: # Permite que seja None
             data_expiracao_obj = datetime.datetime.strptime(data['data_expiracao'], '%Y-%m-%d') if data['data_expiracao'] else None
             set_clauses.append("data_expiracao = %s")
@@ -1422,15 +2508,16 @@ def update_aviso(aviso_id):
 
         cursor.execute(sql, tuple(values))
         conn.commit()
+        invalidar_avisos()
 
         return jsonify({"message": "Aviso atualizado com sucesso!"}), 200
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao atualizar aviso: {err}")
+        logger.error("Erro no banco de dados ao atualizar aviso: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao atualizar aviso: {e}")
+        logger.exception("Erro interno ao atualizar aviso: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -1466,14 +2553,15 @@ def inativate_aviso(aviso_id):
 
         cursor.execute("UPDATE avisos SET ativo = FALSE WHERE id = %s", (aviso_id,))
         conn.commit()
+        invalidar_avisos()
         return jsonify({"message": "Aviso inativado com sucesso!"}), 200
     except mysql.connector.Error as err:
         conn.rollback()
-        print(f"Erro no banco de dados ao inativar aviso: {err}")
+        logger.error("Erro no banco de dados ao inativar aviso: %s", err)
         return jsonify({"error": f"Erro no banco de dados: {str(err)}"}), 500
     except Exception as e:
         conn.rollback()
-        print(f"Erro interno ao inativar aviso: {e}")
+        logger.exception("Erro interno ao inativar aviso: %s", e)
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
     finally:
         if cursor:
@@ -0,0 +1,543 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from urllib.parse import parse_qsl
+from email.utils import format_datetime, parsedate_to_datetime
+import jwt
+import pymysql
+import aiomysql
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+import app as backend
+from diretorio_unidades import SQL_UNIDADES
+from logging_config import request_id_var, novo_request_id
+from metrics import endpoint_atual, totais_requisicao
+from pagamentos import criar_gateway_async_do_ambiente, GatewayIndisponivelError
+
+# Modo de execução ASGI (opcional): uvicorn asgi:app --workers N
+#
+# No modo WSGI cada requisição ocupa uma thread do servidor enquanto espera o
+# MySQL ou o Mercado Pago, e o teto de concorrência é o número de threads. Aqui
+# as rotas mais chamadas (dashboard, feed de avisos, unidades e a geração do PIX)
+# rodam no event loop, com aiomysql e httpx: a espera por I/O não prende thread.
+# Elas usam o mesmo SQL, os mesmos caches (dashboard_cache, avisos_feed_cache,
+# unidades_diretorio, token_cache) e as mesmas mensagens de erro do app.py.
+# Todas as outras rotas, e as variações dessas que o modo assíncrono não cobre
+# (?limit=, ?fields=, HEAD, OPTIONS), são servidas pelo próprio Flask via
+# WsgiToAsgi, em threads limitadas por ASGI_WSGI_THREADS. As URLs, o token e
+# os cabeçalhos de resposta são os mesmos nos dois modos.
+#
+# Dependências: pip install -r requirements-opcionais.txt (aiomysql, httpx,
+# asgiref, uvicorn).
+
+logger = logging.getLogger(__name__)
+
+EXPOE_CABECALHOS = b'X-Next-Cursor, X-Request-ID'
+
+
+class ConexaoIndisponivelError(pymysql.err.OperationalError):
+    """Nenhuma conexão do pool assíncrono dentro de DB_POOL_TIMEOUT."""
+    pass
+
+
+def _env_int(nome, padrao):
+    try:
+        return int(os.getenv(nome, padrao))
+    except (TypeError, ValueError):
+        return padrao
+
+
+class Resposta:
+    def __init__(self, corpo, status=200, tipo=b'application/json', cabecalhos=None):
+        self.corpo = corpo
+        self.status = status
+        self.cabecalhos = [(b'content-type', tipo)] + list(cabecalhos or [])
+
+
+def resposta_json(dados, status=200):
+    return Resposta(backend.app.json.dumps(dados).encode('utf-8') + b'\n', status)
+
+
+def _etag_citada(etag):
+    return f'"{etag}"'
+
+
+def _nao_modificado(cabecalhos, etag, last_modified):
+    """Mesma regra do make_conditional do Flask: If-None-Match tem prioridade sobre If-Modified-Since."""
+    if_none_match = cabecalhos.get(b'if-none-match')
+    if if_none_match is not None:
+        pedidas = {t.strip().removeprefix('W/') for t in if_none_match.decode('latin-1').split(',')}
+        return '*' in pedidas or _etag_citada(etag) in pedidas
+    if_modified_since = cabecalhos.get(b'if-modified-since')
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since.decode('latin-1'))
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def resposta_condicional(requisicao, corpo, etag, last_modified=None):
+    """Corpo JSON já serializado com ETag/Last-Modified, ou 304 se o cliente já o tem."""
+    cabecalhos = [(b'etag', _etag_citada(etag).encode('latin-1')),
+                  (b'cache-control', b'private, no-cache')]
+    if last_modified is not None:
+        cabecalhos.append((b'last-modified', format_datetime(last_modified, usegmt=True).encode('latin-1')))
+    if _nao_modificado(requisicao.cabecalhos, etag, last_modified):
+        return Resposta(b'', 304, cabecalhos=cabecalhos)
+    return Resposta(corpo, 200, cabecalhos=cabecalhos)
+
+
+class Requisicao:
+    def __init__(self, scope):
+        self.scope = scope
+        self.metodo = scope['method']
+        self.caminho = scope['path']
+        self.cabecalhos = {}
+        for nome, valor in scope.get('headers', []):
+            self.cabecalhos.setdefault(nome.lower(), valor)
+        self.args = {}
+        for nome, valor in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(nome, valor)
+        self.user_identity = None
+
+
+class CursorAssincronoObservado:
+    """
+    Versão assíncrona do db_pool.CursorObservado: avisa os mesmos observadores
+    (métricas e consultas_lentas) sobre cada execute e sobre as linhas lidas.
+    """
+
+    def __init__(self, cursor, observadores):
+        self._cursor = cursor
+        self._observadores = observadores
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    async def execute(self, operation, params=None):
+        inicio = time.perf_counter()
+        try:
+            return await self._cursor.execute(operation, params)
+        finally:
+            duracao = time.perf_counter() - inicio
+            for obs in self._observadores:
+                obs.consulta_executada(operation, params, duracao)
+
+    def _contar(self, quantidade):
+        if quantidade:
+            for obs in self._observadores:
+                obs.linhas_lidas(quantidade)
+
+    async def fetchone(self):
+        linha = await self._cursor.fetchone()
+        self._contar(1 if linha is not None else 0)
+        return linha
+
+    async def fetchall(self):
+        linhas = await self._cursor.fetchall()
+        self._contar(len(linhas))
+        return linhas
+
+
+class CursorSobDemanda:
+    """
+    Empresta uma conexão do pool assíncrono só na primeira chamada, como os
+    abrir_cursor() das rotas síncronas; fechar() devolve a conexão ao pool.
+    Com observadores no pool síncrono (backend.db_pool), a espera pela conexão
+    e as consultas são reportadas a eles, como no modo WSGI.
+    """
+
+    def __init__(self, pool, timeout, observadores=()):
+        self.pool = pool
+        self.timeout = timeout
+        self.observadores = observadores
+        self.conn = None
+        self.cursor = None
+
+    async def __call__(self):
+        if self.cursor is None:
+            if self.pool is None:
+                raise ConexaoIndisponivelError("Erro de conexão com o banco de dados.")
+            inicio = time.perf_counter()
+            try:
+                self.conn = await asyncio.wait_for(self.pool.acquire(), self.timeout)
+            except (asyncio.TimeoutError, OSError, pymysql.err.MySQLError) as e:
+                logger.error("Erro ao conectar ao MySQL: %s", e)
+                raise ConexaoIndisponivelError("Erro de conexão com o banco de dados.") from e
+            espera = time.perf_counter() - inicio
+            for obs in self.observadores:
+                obs.conexao_adquirida(espera)
+            cursor = await self.conn.cursor()
+            self.cursor = CursorAssincronoObservado(cursor, self.observadores) if self.observadores else cursor
+        return self.cursor
+
+    async def fechar(self):
+        if self.cursor is not None:
+            await self.cursor.close()
+        if self.conn is not None:
+            self.pool.release(self.conn)
+
+
+async def _consultar(cursor, sql, params=None):
+    await cursor.execute(sql, params)
+    return list(await cursor.fetchall())
+
+
+# --- FEED DE AVISOS E DIRETÓRIO DE UNIDADES (mesmos caches do app.py) ---
+
+async def obter_feed_avisos(abrir_cursor):
+    entrada = backend.avisos_feed_cache.get('feed')
+    if entrada is None:
+        geracao = backend.avisos_feed_cache.geracao()
+        cursor = await abrir_cursor()
+        avisos = await _consultar(cursor, backend.AVISOS_FEED_SQL)
+        await cursor.execute(backend.AVISOS_PROXIMA_EXPIRACAO_SQL)
+        entrada = backend.montar_entrada_feed(avisos, (await cursor.fetchone())['segundos'])
+        backend.guardar_feed_avisos(entrada, geracao)
+    return entrada
+
+
+async def obter_diretorio_unidades(abrir_cursor):
+    diretorio = backend.unidades_diretorio.atual()
+    if diretorio is None:
+        geracao = backend.unidades_diretorio.geracao()
+        unidades = await _consultar(await abrir_cursor(), SQL_UNIDADES)
+        diretorio = backend.unidades_diretorio.guardar(unidades, geracao)
+    return diretorio
+
+
+# --- SEÇÕES DO DASHBOARD (equivalentes às secao_* do app.py) ---
+
+async def secao_minhas_reservas(abrir_cursor, identidade):
+    return await _consultar(await abrir_cursor(), backend.MINHAS_RESERVAS_SQL, (identidade.get('user_id'),))
+
+async def secao_meus_visitantes(abrir_cursor, identidade):
+    return await _consultar(await abrir_cursor(), backend.MEUS_VISITANTES_SQL, (identidade.get('user_id'),))
+
+async def secao_minhas_encomendas(abrir_cursor, identidade):
+    if identidade.get('role') == 'ADMIN':
+        return []
+    return await _consultar(await abrir_cursor(), backend.MINHAS_ENCOMENDAS_SQL,
+                            (identidade.get('user_id'), backend.UNREGISTERED_MORADOR_PLACEHOLDER_ID))
+
+async def secao_resumo_ocorrencias(abrir_cursor, identidade):
+    return await _consultar(await abrir_cursor(), backend.RESUMO_OCORRENCIAS_SQL)
+
+async def secao_avisos(abrir_cursor, identidade):
+    return (await obter_feed_avisos(abrir_cursor))['dados']
+
+async def secao_resumo_reservas(abrir_cursor, identidade):
+    return await _consultar(await abrir_cursor(), backend.RESUMO_RESERVAS_SQL)
+
+# Uma seção nova em backend.SECOES_DASHBOARD sem versão aqui faz o dashboard que
+# a pedir ser servido pelo Flask, em vez de ficar de fora da resposta.
+SECOES_DASHBOARD = {
+    'minhas_reservas': secao_minhas_reservas,
+    'meus_visitantes': secao_meus_visitantes,
+    'resumo_ocorrencias': secao_resumo_ocorrencias,
+    'minhas_encomendas': secao_minhas_encomendas,
+    'avisos': secao_avisos,
+    'resumo_reservas': secao_resumo_reservas,
+}
+
+
+# --- ROTAS ---
+
+def autenticar(requisicao):
+    """Mesma validação e mesmas mensagens do token_required; devolve uma Resposta de erro ou None."""
+    token = None
+    auth_header = requisicao.cabecalhos.get(b'authorization')
+    if auth_header is not None:
+        auth_header = auth_header.decode('latin-1')
+        if auth_header.startswith('Bearer '):
+            token = auth_header.split(" ")[1]
+
+    if not token:
+        return resposta_json({"error": "Token de autenticação não fornecido."}, 401)
+
+    try:
+        requisicao.user_identity = backend.verificar_token(token)
+    except jwt.ExpiredSignatureError:
+        return resposta_json({"error": "Token expirado. Faça login novamente."}, 401)
+    except jwt.InvalidTokenError:
+        return resposta_json({"error": "Token inválido ou corrompido."}, 401)
+    except Exception as e:
+        logger.exception("Erro inesperado na validação do token: %s", e)
+        return resposta_json({"error": f"Erro na validação do token: {str(e)}"}, 500)
+    return None
+
+
+async def get_dashboard(servidor, requisicao):
+    erro = autenticar(requisicao)
+    if erro:
+        return erro
+    identidade = requisicao.user_identity
+    pedidas = requisicao.args.get('sections')
+    if pedidas:
+        nomes = [n.strip() for n in pedidas.split(',') if n.strip()]
+        desconhecidas = [n for n in nomes if n not in backend.SECOES_DASHBOARD]
+        if desconhecidas:
+            return resposta_json({"error": f"Seções desconhecidas: {', '.join(desconhecidas)}"}, 400)
+    else:
+        nomes = list(backend.SECOES_DASHBOARD)
+
+    resultado = {}
+    etags = {}
+    abrir_cursor = servidor.cursor_sob_demanda()
+    try:
+        for nome in nomes:
+            compartilhada = backend.SECOES_DASHBOARD[nome][1]
+            entrada = backend.dashboard_cache.get(nome) if compartilhada else None
+            if entrada is None:
+                geracao = backend.dashboard_cache.geracao()
+                dados = await SECOES_DASHBOARD[nome](abrir_cursor, identidade)
+                entrada = (dados, hashlib.sha1(backend.app.json.dumps(dados).encode('utf-8')).hexdigest())
+                if compartilhada:
+                    backend.dashboard_cache.set(nome, entrada, ttl=backend.ttl_secao_compartilhada(nome),
+                                                geracao=geracao)
+            resultado[nome], etags[nome] = entrada
+
+        corpo = backend.app.json.dumps({**resultado, "etags": etags}).encode('utf-8') + b'\n'
+        etag = hashlib.sha1("|".join(f"{n}:{etags[n]}" for n in nomes).encode('utf-8')).hexdigest()
+        return resposta_condicional(requisicao, corpo, etag)
+    except ConexaoIndisponivelError:
+        return resposta_json({"error": "Erro de conexão com o banco de dados."}, 500)
+    except Exception as e:
+        logger.exception("Erro ao montar o dashboard: %s", e)
+        return resposta_json({"error": f"Erro ao buscar dados do dashboard: {e}"}, 500)
+    finally:
+        await abrir_cursor.fechar()
+
+
+async def get_all_avisos(servidor, requisicao):
+    erro = autenticar(requisicao)
+    if erro:
+        return erro
+    abrir_cursor = servidor.cursor_sob_demanda()
+    try:
+        entrada = await obter_feed_avisos(abrir_cursor)
+        return resposta_condicional(requisicao, entrada['corpo'], entrada['etag'], entrada['last_modified'])
+    except pymysql.err.MySQLError as err:
+        logger.error("Erro no banco de dados ao buscar avisos: %s", err)
+        return resposta_json({"error": f"Erro ao buscar avisos: {err}"}, 500)
+    except Exception as e:
+        logger.exception("Erro ao buscar avisos: %s", e)
+        return resposta_json({"error": f"Erro ao buscar avisos: {e}"}, 500)
+    finally:
+        await abrir_cursor.fechar()
+
+
+async def get_unidades(servidor, requisicao):
+    erro = autenticar(requisicao)
+    if erro:
+        return erro
+    abrir_cursor = servidor.cursor_sob_demanda()
+    try:
+        diretorio = await obter_diretorio_unidades(abrir_cursor)
+        return resposta_condicional(requisicao, diretorio.corpo, diretorio.etag, diretorio.last_modified)
+    except pymysql.err.MySQLError as err:
+        logger.error("Erro no banco de dados ao buscar unidades: %s", err)
+        return resposta_json({"error": f"Erro ao buscar unidades: {err}"}, 500)
+    except Exception as e:
+        logger.exception("Erro interno do servidor ao buscar unidades: %s", e)
+        return resposta_json({"error": f"Erro interno do servidor: {str(e)}"}, 500)
+    finally:
+        await abrir_cursor.fechar()
+
+
+async def create_reservation_payment(servidor, requisicao, reserva_id):
+    abrir_cursor = servidor.cursor_sob_demanda()
+    try:
+        cursor = await abrir_cursor()
+        await cursor.execute("""
+            SELECT status, (expira_em IS NULL OR expira_em > NOW()) AS trava_ativa
+            FROM reservas WHERE id = %s
+        """, (reserva_id,))
+        reserva = await cursor.fetchone()
+    except ConexaoIndisponivelError:
+        return resposta_json({"error": "Erro de conexão com o banco de dados."}, 500)
+    except pymysql.err.MySQLError as err:
+        logger.error("Erro no banco de dados ao consultar reserva %s: %s", reserva_id, err)
+        return resposta_json({"error": f"Erro no banco de dados: {str(err)}"}, 500)
+    finally:
+        await abrir_cursor.fechar()
+    if not reserva:
+        return resposta_json({"error": "Reserva não encontrada."}, 404)
+    if reserva['status'] != 'Pendente' or not reserva['trava_ativa']:
+        return resposta_json({"error": "Esta reserva não está aguardando pagamento."}, 409)
+
+    payment_data = backend.dados_pagamento_reserva(reserva_id)
+
+    try:
+        payment_response = await servidor.gateway.criar_pagamento(payment_data, idempotency_key=f"reserva-{reserva_id}")
+        if payment_response["status"] not in (200, 201):
+            raise Exception((payment_response["response"] or {}).get("message", "Erro desconhecido no Mercado Pago."))
+        payment = payment_response["response"]
+
+        pix_data = {
+            "payment_id": payment["id"],
+            "qr_code_image": payment["point_of_interaction"]["transaction_data"]["qr_code_base64"],
+            "qr_code_text": payment["point_of_interaction"]["transaction_data"]["qr_code"]
+        }
+        return resposta_json(pix_data, 200)
+
+    except GatewayIndisponivelError as e:
+        logger.warning("Mercado Pago indisponível ao criar PIX para reserva %s: %s", reserva_id, e)
+        return resposta_json({"error": "Serviço de pagamento indisponível no momento. Tente novamente em instantes."}, 503)
+    except Exception as e:
+        logger.exception("Erro ao criar pagamento PIX para reserva %s: %s", reserva_id, e)
+        return resposta_json({"error": f"Erro ao criar pagamento PIX: {e}"}, 500)
+
+
+def rota_assincrona(requisicao):
+    """
+    (handler, argumentos, endpoint) das rotas atendidas no event loop, ou None
+    para encaminhar ao Flask. O endpoint é a regra da rota no app.py, o mesmo
+    rótulo que instalar_contexto_endpoint() usa nas métricas do modo WSGI.
+    """
+    metodo, caminho = requisicao.metodo, requisicao.caminho
+    if metodo == 'GET':
+        if caminho == '/api/dashboard':
+            nomes = [n.strip() for n in requisicao.args.get('sections', '').split(',') if n.strip()]
+            if all(n in SECOES_DASHBOARD for n in nomes or backend.SECOES_DASHBOARD):
+                return get_dashboard, (), '/api/dashboard'
+        elif caminho == '/api/avisos':
+            # Paginação e projeção de campos continuam no Flask.
+            if 'limit' not in requisicao.args and not requisicao.args.get('after') and not requisicao.args.get('fields'):
+                return get_all_avisos, (), '/api/avisos'
+        elif caminho == '/api/unidades':
+            return get_unidades, (), '/api/unidades'
+    elif metodo == 'POST':
+        partes = caminho.split('/')
+        # /api/reservas/<int:reserva_id>/create-payment
+        if len(partes) == 5 and partes[1:3] == ['api', 'reservas'] and partes[4] == 'create-payment' \
+                and partes[3].isdigit() and partes[3].isascii():
+            return create_reservation_payment, (int(partes[3]),), '/api/reservas/<int:reserva_id>/create-payment'
+    return None
+
+
+# --- APLICAÇÃO ASGI ---
+
+class ServidorAsgi:
+    """
+    Aplicação ASGI: rotas assíncronas acima, o restante pelo Flask. O pool do
+    aiomysql, o gateway assíncrono e as threads de fundo do app.py (fila de
+    webhooks e varredor de reservas) são iniciados no lifespan.
+    """
+
+    def __init__(self, flask_app):
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.pool = None
+        self.gateway = None
+        self.db_timeout = _env_int('DB_POOL_TIMEOUT', 10)
+        # Teto de requisições simultâneas no Flask, como as threads de um servidor
+        # WSGI. Criado já dentro do event loop (no Python 3.9 o semáforo se prende
+        # ao loop em que foi criado).
+        self._vagas_wsgi = None
+
+    def cursor_sob_demanda(self):
+        observadores = backend.db_pool.observadores if backend.db_pool else ()
+        return CursorSobDemanda(self.pool, self.db_timeout, observadores)
+
+    async def iniciar(self):
+        self.pool = await aiomysql.create_pool(
+            minsize=0,
+            maxsize=_env_int('ASGI_DB_POOL_SIZE', _env_int('DB_POOL_SIZE', 5) + _env_int('DB_POOL_MAX_OVERFLOW', 10)),
+            pool_recycle=_env_int('DB_POOL_RECYCLE_SECONDS', 1800),
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD') or '',
+            db=os.getenv('DB_NAME'),
+            charset='utf8mb4',
+            # As rotas assíncronas só leem; sem transação aberta, cada SELECT vê
+            # os dados atuais e a conexão volta limpa ao pool.
+            autocommit=True,
+            cursorclass=aiomysql.DictCursor,
+        )
+        self.gateway = criar_gateway_async_do_ambiente(backend.payment_gateway)
+        backend.webhook_workers.garantir_iniciado()
+        backend.varredor_reservas.garantir_iniciado()
+        logger.info("Modo ASGI iniciado (pool assíncrono com até %s conexões).", self.pool.maxsize)
+
+    async def encerrar(self):
+        backend.webhook_workers.parar()
+        backend.varredor_reservas.parar()
+        if self.gateway is not None:
+            await self.gateway.fechar()
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                try:
+                    await self.iniciar()
+                except Exception as e:
+                    logger.exception("Falha ao iniciar o modo ASGI: %s", e)
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                await self.encerrar()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _encaminhar_ao_flask(self, scope, receive, send):
+        # O WsgiToAsgi executa todas as chamadas em uma única thread compartilhada;
+        # o contexto próprio dá a cada requisição a sua thread.
+        if self._vagas_wsgi is None:
+            self._vagas_wsgi = asyncio.Semaphore(_env_int('ASGI_WSGI_THREADS', 32))
+        async with self._vagas_wsgi:
+            async with ThreadSensitiveContext():
+                await self.wsgi(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        requisicao = Requisicao(scope)
+        rota = rota_assincrona(requisicao)
+        if rota is None:
+            return await self._encaminhar_ao_flask(scope, receive, send)
+
+        handler, argumentos, endpoint = rota
+        recebido = requisicao.cabecalhos.get(b'x-request-id', b'').decode('latin-1')
+        request_id = recebido if backend.REQUEST_ID_VALIDO.match(recebido) else novo_request_id()
+        token = request_id_var.set(request_id)
+        token_endpoint = endpoint_atual.set(endpoint)
+        token_totais = totais_requisicao.set([0, 0.0])
+        inicio = time.perf_counter()
+        try:
+            resposta = await handler(self, requisicao, *argumentos)
+            cabecalhos = resposta.cabecalhos + [
+                (b'content-length', str(len(resposta.corpo)).encode('latin-1')),
+                (b'x-request-id', request_id.encode('latin-1')),
+                (b'access-control-expose-headers', EXPOE_CABECALHOS),
+            ]
+            # Mesmos cabeçalhos que o flask_cors envia com origins='*'.
+            origem = requisicao.cabecalhos.get(b'origin')
+            if origem:
+                cabecalhos += [(b'access-control-allow-origin', origem), (b'vary', b'Origin')]
+            else:
+                cabecalhos.append((b'access-control-allow-origin', b'*'))
+            await send({'type': 'http.response.start', 'status': resposta.status, 'headers': cabecalhos})
+            await send({'type': 'http.response.body', 'body': resposta.corpo})
+            if backend.metricas:
+                backend.metricas.http_latencia.observe(time.perf_counter() - inicio, endpoint,
+                                                       requisicao.metodo, resposta.status)
+                totais = totais_requisicao.get()
+                backend.metricas.db_consultas_por_requisicao.observe(totais[0], endpoint)
+                backend.metricas.db_tempo_por_requisicao.observe(totais[1], endpoint)
+        finally:
+            totais_requisicao.reset(token_totais)
+            endpoint_atual.reset(token_endpoint)
+            request_id_var.reset(token)
+
+
+app = ServidorAsgi(backend.app)
@@ -0,0 +1,113 @@
+"""
+Compara a serialização de uma resposta de 10 mil linhas:
+
+  flask_padrao  - cursor dictionary=True + laço de isoformat + provedor padrão do Flask
+  stdlib        - linhas em tupla + json_provider.registros + StdlibJSONProvider
+  orjson        - linhas em tupla + json_provider.registros + OrjsonProvider
+
+As variantes stdlib e orjson reproduzem o caminho das rotas de listagem
+(pagination.paginar, seções do dashboard, feed de avisos e resumo geral de
+reservas), que leem com cursor comum e convertem com json_provider.registros.
+
+Uso (a partir de backend/):  python benchmarks/bench_json.py [--linhas 10000] [--repeticoes 20]
+Imprime um JSON com a mediana e o p95 (ms) de cada variante.
+"""
+import os
+import sys
+import json
+import time
+import decimal
+import argparse
+import datetime
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import json_provider
+
+COLUNAS = ('id', 'remetente', 'descricao', 'data_chegada', 'status', 'data_retirada',
+           'registrado_em', 'valor', 'morador_nome', 'unidade')
+
+
+def gerar_linhas(quantidade):
+    base = datetime.datetime(2025, 1, 1, 8, 30)
+    linhas = []
+    for i in range(quantidade):
+        chegada = base + datetime.timedelta(hours=i)
+        linhas.append((
+            i, f"Loja {i % 97}", f"Pacote número {i} — frágil", chegada.date(),
+            'Retirada' if i % 3 else 'Na Administração',
+            (chegada + datetime.timedelta(days=1)).date() if i % 3 else None,
+            chegada, decimal.Decimal(i) / 100, f"Morador {i % 500}", f"{i % 20}-{i % 300}",
+        ))
+    return linhas
+
+
+def variante_flask_padrao(app, linhas):
+    # Reproduz o caminho antigo: dicionários vindos do cursor, conversão manual
+    # das datas para ISO e o provedor padrão do Flask.
+    registros = [dict(zip(COLUNAS, linha)) for linha in linhas]
+    for r in registros:
+        for campo in ('data_chegada', 'data_retirada', 'registrado_em'):
+            if isinstance(r[campo], (datetime.date, datetime.datetime)):
+                r[campo] = r[campo].isoformat()
+    with app.app_context():
+        return app.json.response(registros).get_data()
+
+
+def variante_provider(app, linhas):
+    with app.app_context():
+        return app.json.response(json_provider.registros(COLUNAS, linhas)).get_data()
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'mediana_ms': round(statistics.median(tempos), 2),
+        'p95_ms': round(tempos[max(0, int(len(tempos) * 0.95) - 1)], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=10000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+
+    app_padrao = Flask('bench_padrao')
+    app_padrao.json = DefaultJSONProvider(app_padrao)
+    app_stdlib = Flask('bench_stdlib')
+    app_stdlib.json = json_provider.StdlibJSONProvider(app_stdlib)
+
+    variantes = {
+        'flask_padrao': lambda: variante_flask_padrao(app_padrao, linhas),
+        'stdlib': lambda: variante_provider(app_stdlib, linhas),
+    }
+    if json_provider.orjson is not None:
+        app_orjson = Flask('bench_orjson')
+        app_orjson.json = json_provider.OrjsonProvider(app_orjson)
+        variantes['orjson'] = lambda: variante_provider(app_orjson, linhas)
+
+    resultado = {'linhas': args.linhas, 'repeticoes': args.repeticoes, 'variantes': {}}
+    for nome, funcao in variantes.items():
+        funcao()  # aquecimento
+        resultado['variantes'][nome] = medir(funcao, args.repeticoes)
+
+    base = resultado['variantes']['flask_padrao']['mediana_ms']
+    for dados in resultado['variantes'].values():
+        dados['ganho_vs_flask_padrao'] = round(base / dados['mediana_ms'], 2) if dados['mediana_ms'] else None
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
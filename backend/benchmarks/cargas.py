@@ -0,0 +1,317 @@
+"""
+Cargas roteirizadas contra a API em execução, sobre a massa de gerar_dados.py.
+
+  login      - rajada de POST /api/login com moradores aleatórios (bcrypt)
+  dashboard  - GET /api/dashboard com tokens de vários moradores
+  busca      - GET /api/encomendas?search_term=... como administrador
+  listagem   - GET /api/encomendas paginado por cursor (5 páginas por sessão)
+  reservas   - disputa: muitos moradores pedem as mesmas poucas datas ao mesmo
+               tempo; confere que cada data foi concedida no máximo uma vez
+
+Para cada carga o relatório traz requisições, vazão (req/s), contagem por
+status HTTP e percentis de latência (p50/p90/p95/p99/máx, em ms), além do
+commit atual. Com --saida o relatório é gravado em JSON; com --comparar ele é
+confrontado com um relatório anterior e o processo sai com código 1 se alguma
+carga piorou além de --tolerancia (p95 maior ou vazão menor).
+
+O servidor deve apontar para o banco de benchmark (DB_NAME=totalville_bench)
+e, para a carga de reservas, usar o gateway local (MERCADOPAGO_FAKE=1).
+
+Uso (a partir de backend/):
+  python benchmarks/cargas.py --url http://localhost:5000 --saida bench.json
+  python benchmarks/cargas.py --cargas login,busca --concorrencia 32 --comparar bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DOMINIO_EMAIL = 'bench.totalville'
+TERMOS_BUSCA = ['amazon', 'mercado livre', 'correios', 'notebook', 'frágil', 'silva', 'oliveira', 'BL03',
+                'remédio urgente', 'shopee caixa', 'perfume', 'joao']
+ESPACO_DISPUTA = 'Salão de Festas'
+
+
+class Cliente:
+    """Uma requests.Session por thread, com pool de conexões do tamanho da concorrência."""
+
+    def __init__(self, url, concorrencia, timeout):
+        self.url = url.rstrip('/')
+        self.concorrencia = concorrencia
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _sessao(self):
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.concorrencia, max_retries=0)
+            sessao.mount('http://', adaptador)
+            sessao.mount('https://', adaptador)
+            self._local.sessao = sessao
+        return sessao
+
+    def requisitar(self, metodo, caminho, token=None, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        return self._sessao().request(metodo, self.url + caminho, headers=headers, timeout=self.timeout, **kwargs)
+
+    def login(self, email, senha):
+        resposta = self.requisitar('POST', '/api/login', json={'email': email, 'password': senha})
+        if resposta.status_code != 200:
+            raise RuntimeError(f"Login de {email} falhou ({resposta.status_code}): {resposta.text[:200]}")
+        return resposta.json()['access_token']
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def executar(nome, tarefas, concorrencia):
+    """
+    Roda as tarefas (funções sem argumento que devolvem o status HTTP, ou uma
+    lista de status) com 'concorrencia' threads e mede cada uma.
+    """
+    latencias = []
+    status = Counter()
+    erros = Counter()
+    lock = threading.Lock()
+
+    def rodar(tarefa):
+        inicio = time.perf_counter()
+        try:
+            resultado = tarefa()
+            codigos = resultado if isinstance(resultado, list) else [resultado]
+            erro = None
+        except Exception as e:
+            codigos, erro = [], type(e).__name__
+        duracao = time.perf_counter() - inicio
+        with lock:
+            latencias.append(duracao)
+            status.update(str(c) for c in codigos)
+            if erro:
+                erros[erro] += 1
+
+    print(f"   {nome}: {len(tarefas)} tarefas com {concorrencia} threads...", flush=True)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(rodar, tarefas))
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    ms = lambda s: round(s * 1000, 2) if s is not None else None
+    return {
+        'requisicoes': len(latencias),
+        'concorrencia': concorrencia,
+        'duracao_s': round(duracao, 3),
+        'vazao_rps': round(len(latencias) / duracao, 2) if duracao else None,
+        'status': dict(sorted(status.items())),
+        'erros': dict(erros),
+        'p50_ms': ms(percentil(latencias, 50)),
+        'p90_ms': ms(percentil(latencias, 90)),
+        'p95_ms': ms(percentil(latencias, 95)),
+        'p99_ms': ms(percentil(latencias, 99)),
+        'max_ms': ms(latencias[-1] if latencias else None),
+    }
+
+
+# --- CARGAS ---
+
+def carga_login(cliente, args, rnd):
+    def tarefa(email):
+        return lambda: cliente.requisitar('POST', '/api/login', json={'email': email, 'password': args.senha}).status_code
+    emails = [f"morador{rnd.randint(1, args.moradores)}@{DOMINIO_EMAIL}" for _ in range(args.requisicoes)]
+    return executar('login', [tarefa(e) for e in emails], args.concorrencia)
+
+
+def carga_dashboard(cliente, args, rnd, tokens_moradores):
+    def tarefa(token):
+        return lambda: cliente.requisitar('GET', '/api/dashboard', token=token).status_code
+    return executar('dashboard', [tarefa(rnd.choice(tokens_moradores)) for _ in range(args.requisicoes)],
+                    args.concorrencia)
+
+
+def carga_busca(cliente, args, rnd, token_admin):
+    def tarefa(termo):
+        return lambda: cliente.requisitar('GET', '/api/encomendas', token=token_admin,
+                                          params={'search_term': termo, 'limit': 20}).status_code
+    return executar('busca', [tarefa(rnd.choice(TERMOS_BUSCA)) for _ in range(args.requisicoes)],
+                    args.concorrencia)
+
+
+def carga_listagem(cliente, args, rnd, token_admin):
+    def sessao():
+        codigos = []
+        after = None
+        for _ in range(5):
+            params = {'limit': 50}
+            if after:
+                params['after'] = after
+            resposta = cliente.requisitar('GET', '/api/encomendas', token=token_admin, params=params)
+            codigos.append(resposta.status_code)
+            if resposta.status_code != 200:
+                break
+            after = resposta.headers.get('X-Next-Cursor')
+            if not after:
+                break
+        return codigos
+    return executar('listagem', [sessao for _ in range(max(1, args.requisicoes // 5))], args.concorrencia)
+
+
+def carga_reservas(cliente, args, rnd, tokens_moradores):
+    # Datas bem no futuro e diferentes a cada execução, para não colidir com
+    # travas de rodadas anteriores.
+    base = datetime.date(2100, 1, 1) + datetime.timedelta(days=rnd.randrange(300 * 365))
+    datas = [(base + datetime.timedelta(days=i)).isoformat() for i in range(args.datas_disputadas)]
+    concedidas = Counter()
+    lock = threading.Lock()
+
+    def tarefa(token, data):
+        def pedir():
+            resposta = cliente.requisitar('POST', '/api/reservas', token=token,
+                                          json={'space_name': ESPACO_DISPUTA, 'reservation_date': data})
+            if resposta.status_code == 201:
+                with lock:
+                    concedidas[data] += 1
+            return resposta.status_code
+        return pedir
+
+    tarefas = [tarefa(rnd.choice(tokens_moradores), rnd.choice(datas)) for _ in range(args.requisicoes)]
+    resultado = executar('reservas', tarefas, args.concorrencia)
+    resultado['datas_disputadas'] = len(datas)
+    resultado['datas_concedidas'] = len(concedidas)
+    resultado['reservas_duplicadas'] = sum(n - 1 for n in concedidas.values() if n > 1)
+    return resultado
+
+
+CARGAS = ('login', 'dashboard', 'busca', 'listagem', 'reservas')
+
+
+# --- RELATÓRIO ---
+
+def commit_atual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, anterior, tolerancia):
+    """Devolve as linhas do comparativo e se houve regressão além da tolerância."""
+    linhas = []
+    regressao = False
+    for nome, dados in atual['cargas'].items():
+        base = anterior.get('cargas', {}).get(nome)
+        if not base or not base.get('p95_ms') or not base.get('vazao_rps'):
+            continue
+        delta_p95 = (dados['p95_ms'] - base['p95_ms']) / base['p95_ms']
+        delta_vazao = (dados['vazao_rps'] - base['vazao_rps']) / base['vazao_rps']
+        piorou = delta_p95 > tolerancia or delta_vazao < -tolerancia
+        regressao = regressao or piorou
+        linhas.append(f"   {nome:<10} p95 {base['p95_ms']:>9.1f} -> {dados['p95_ms']:>9.1f} ms ({delta_p95:+.0%})"
+                      f"   vazão {base['vazao_rps']:>8.1f} -> {dados['vazao_rps']:>8.1f} req/s ({delta_vazao:+.0%})"
+                      f"{'   <-- REGRESSÃO' if piorou else ''}")
+    return linhas, regressao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--cargas', default=','.join(CARGAS), help=f"Lista separada por vírgulas ({', '.join(CARGAS)}).")
+    parser.add_argument('--requisicoes', type=int, default=500, help="Requisições por carga.")
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--moradores', type=int, default=20000, help="Quantos moradores a massa tem (gerar_dados.py).")
+    parser.add_argument('--usuarios', type=int, default=50, help="Moradores logados para dashboard e reservas.")
+    parser.add_argument('--datas-disputadas', type=int, default=5)
+    parser.add_argument('--senha', default='bench123')
+    parser.add_argument('--admin-email', default='admin@condominio.com')
+    parser.add_argument('--admin-senha', default='123')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--semente', type=int, default=None, help="Semente do sorteio (padrão: aleatória).")
+    parser.add_argument('--saida', help="Grava o relatório JSON neste arquivo.")
+    parser.add_argument('--comparar', help="Relatório JSON anterior para comparação.")
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="Piora aceita antes de acusar regressão (0.10 = 10%%).")
+    args = parser.parse_args()
+
+    pedidas = [c.strip() for c in args.cargas.split(',') if c.strip()]
+    desconhecidas = [c for c in pedidas if c not in CARGAS]
+    if desconhecidas:
+        parser.error(f"Cargas desconhecidas: {', '.join(desconhecidas)}")
+
+    rnd = random.Random(args.semente)
+    cliente = Cliente(args.url, args.concorrencia, args.timeout)
+
+    # Tokens obtidos antes das medições, para que o bcrypt do login não entre
+    # nas cargas que não são de login.
+    token_admin = None
+    tokens_moradores = []
+    if {'busca', 'listagem'} & set(pedidas):
+        token_admin = cliente.login(args.admin_email, args.admin_senha)
+    if {'dashboard', 'reservas'} & set(pedidas):
+        print(f"Autenticando {args.usuarios} moradores...", flush=True)
+        escolhidos = rnd.sample(range(1, args.moradores + 1), min(args.usuarios, args.moradores))
+        with ThreadPoolExecutor(max_workers=min(args.concorrencia, 8)) as executor:
+            tokens_moradores = list(executor.map(
+                lambda n: cliente.login(f"morador{n}@{DOMINIO_EMAIL}", args.senha), escolhidos))
+
+    relatorio = {
+        'commit': commit_atual(),
+        'url': args.url,
+        'executado_em': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'requisicoes': args.requisicoes,
+        'concorrencia': args.concorrencia,
+        'cargas': {},
+    }
+    for nome in pedidas:
+        if nome == 'login':
+            resultado = carga_login(cliente, args, rnd)
+        elif nome == 'dashboard':
+            resultado = carga_dashboard(cliente, args, rnd, tokens_moradores)
+        elif nome == 'busca':
+            resultado = carga_busca(cliente, args, rnd, token_admin)
+        elif nome == 'listagem':
+            resultado = carga_listagem(cliente, args, rnd, token_admin)
+        else:
+            resultado = carga_reservas(cliente, args, rnd, tokens_moradores)
+        relatorio['cargas'][nome] = resultado
+
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+        print(f"-> Relatório gravado em {args.saida}.")
+
+    codigo = 0
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        linhas, regressao = comparar(relatorio, anterior, args.tolerancia)
+        print(f"\nComparação com {args.comparar} (commit {anterior.get('commit')}):")
+        print("\n".join(linhas) or "   Nenhuma carga em comum.")
+        if regressao:
+            codigo = 1
+
+    reservas = relatorio['cargas'].get('reservas')
+    if reservas and reservas['reservas_duplicadas']:
+        print(f"❌ {reservas['reservas_duplicadas']} data(s) concedida(s) a mais de um morador.")
+        codigo = 1
+    sys.exit(codigo)
+
+
+if __name__ == '__main__':
+    main()
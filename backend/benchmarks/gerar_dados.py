@@ -0,0 +1,285 @@
+"""
+Gera uma massa de dados sintética para os benchmarks (ver cargas.py).
+
+Cria o banco com init_db.configurar_banco_de_dados (tabelas + migrações) e
+carrega, em lotes com executemany, unidades, moradores, encomendas,
+visitantes, ocorrências, reservas e avisos. A geração é determinística para a
+mesma --semente, então duas execuções produzem o mesmo banco e os resultados
+podem ser comparados entre commits.
+
+Por padrão usa um banco separado (--banco totalville_bench), nunca o DB_NAME
+do .env; host, usuário e senha vêm do .env. Funciona com MySQL 8 ou MariaDB.
+
+Uso (a partir de backend/):
+  python benchmarks/gerar_dados.py                      # 2 mil unidades, 20 mil moradores, 2 mi encomendas, 1 mi visitantes
+  python benchmarks/gerar_dados.py --escala 0.01        # 1% do volume (rodada rápida)
+  python benchmarks/gerar_dados.py --recriar            # apaga e recria o banco de benchmark
+
+Todos os moradores gerados usam o e-mail moradorN@bench.totalville (N a partir
+de 1) e a senha --senha (padrão "bench123"), hasheada uma única vez com o custo
+BCRYPT_LOG_ROUNDS.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import bcrypt as bcrypt_lib
+import mysql.connector
+from dotenv import load_dotenv
+
+DOMINIO_EMAIL = 'bench.totalville'
+ESPACOS = ['Salão de Festas', 'Churrasqueira', 'Quadra', 'Espaço Gourmet']
+TIPOS_OCORRENCIA = ['Barulho', 'Vazamento', 'Garagem', 'Animais', 'Lixo', 'Segurança', 'Elevador', 'Outros']
+STATUS_OCORRENCIA = ['Aberto', 'Aberto', 'Em Andamento', 'Resolvido', 'Resolvido', 'Resolvido']
+REMETENTES = ['Mercado Livre', 'Amazon', 'Shopee', 'Magazine Luiza', 'Correios', 'AliExpress', 'Americanas',
+              'Netshoes', 'Kabum', 'Casas Bahia', 'Drogasil', 'iFood', 'Natura', 'Renner', 'Centauro']
+PRODUTOS = ['livro', 'celular', 'fone', 'roupa', 'tênis', 'remédio', 'cosméticos', 'ração', 'notebook',
+            'brinquedo', 'panela', 'cadeira', 'documentos', 'caixa', 'envelope', 'perfume', 'cabo', 'lâmpada']
+ADJETIVOS = ['frágil', 'pequeno', 'grande', 'urgente', 'pesado', 'refrigerado', 'leve']
+NOMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela', 'João',
+         'Karina', 'Lucas', 'Mariana', 'Nicolas', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vitória']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima',
+              'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Araújo', 'Melo', 'Barbosa', 'Rocha']
+
+
+def cpf_sintetico(n, prefixo):
+    """CPF formatado e único por (prefixo, n); não passa na validação de dígitos, de propósito."""
+    digitos = f"{prefixo}{n:010d}"[-11:]
+    return f"{digitos[0:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:11]}"
+
+
+def data_aleatoria(rnd, inicio, dias):
+    return inicio + datetime.timedelta(days=rnd.randrange(dias))
+
+
+def inserir_em_lotes(conn, sql, linhas, lote, rotulo, total):
+    """executemany em lotes de 'lote' linhas, com commit por lote e progresso no terminal."""
+    cursor = conn.cursor()
+    inicio = time.perf_counter()
+    feitas = 0
+    buffer = []
+    try:
+        for linha in linhas:
+            buffer.append(linha)
+            if len(buffer) >= lote:
+                cursor.executemany(sql, buffer)
+                conn.commit()
+                feitas += len(buffer)
+                buffer = []
+                print(f"\r   {rotulo}: {feitas}/{total}", end='', flush=True)
+        if buffer:
+            cursor.executemany(sql, buffer)
+            conn.commit()
+            feitas += len(buffer)
+    finally:
+        cursor.close()
+    segundos = time.perf_counter() - inicio
+    print(f"\r-> {rotulo}: {feitas} linhas em {segundos:.1f} s ({feitas / segundos if segundos else 0:.0f} linhas/s).")
+    return feitas
+
+
+def gerar_unidades(n):
+    # 80% apartamentos em blocos de 10 andares x 8 apartamentos, o resto casas.
+    apartamentos = int(n * 0.8)
+    for i in range(apartamentos):
+        bloco, resto = divmod(i, 80)
+        andar, apto = divmod(resto, 8)
+        yield ('apartamento', f"BL{bloco + 1:02d}", f"{andar + 1}{apto + 1:02d}", andar + 1, True)
+    for i in range(n - apartamentos):
+        yield ('casa', None, f"C{i + 1:04d}", None, True)
+
+
+def gerar_moradores(rnd, n, unidades, senha_hash):
+    for i in range(1, n + 1):
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+        yield (nome, f"morador{i}@{DOMINIO_EMAIL}", senha_hash, unidades[(i - 1) % len(unidades)],
+               cpf_sintetico(i, '9'), rnd.choice(['proprietario', 'inquilino', 'outro']), True)
+
+
+def gerar_encomendas(rnd, n, moradores, admin_id, hoje):
+    inicio = hoje - datetime.timedelta(days=3 * 365)
+    for _ in range(n):
+        morador_id, unidade_id = rnd.choice(moradores)
+        chegada = data_aleatoria(rnd, inicio, 3 * 365)
+        retirada = rnd.random() < 0.85 and chegada < hoje - datetime.timedelta(days=2)
+        yield (rnd.choice(REMETENTES), f"{rnd.choice(PRODUTOS)} {rnd.choice(ADJETIVOS)}", chegada,
+               'Retirada' if retirada else 'Na Administração',
+               chegada + datetime.timedelta(days=rnd.randrange(1, 5)) if retirada else None,
+               morador_id, unidade_id, admin_id)
+
+
+def gerar_visitantes(rnd, n, moradores, rotulos_unidades, hoje):
+    inicio = hoje - datetime.timedelta(days=2 * 365)
+    for i in range(1, n + 1):
+        morador_id, unidade_id = rnd.choice(moradores)
+        veiculo = rnd.random() < 0.3
+        yield (f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)}", cpf_sintetico(i, '8'),
+               data_aleatoria(rnd, inicio, 2 * 365 + 30), veiculo,
+               f"BEN{i % 10000:04d}" if veiculo else None, 'Sedan' if veiculo else None,
+               'Prata' if veiculo else None, rotulos_unidades[unidade_id], None, morador_id)
+
+
+def gerar_ocorrencias(rnd, n, moradores, hoje):
+    inicio = datetime.datetime.combine(hoje - datetime.timedelta(days=365), datetime.time(8))
+    for _ in range(n):
+        morador_id, _unidade = rnd.choice(moradores)
+        tipo = rnd.choice(TIPOS_OCORRENCIA)
+        quando = inicio + datetime.timedelta(minutes=rnd.randrange(365 * 24 * 60))
+        yield (tipo, f"Ocorrência de {tipo.lower()} gerada para benchmark.", 'Área comum',
+               quando, rnd.choice(STATUS_OCORRENCIA), morador_id)
+
+
+def gerar_reservas(rnd, por_espaco, moradores, hoje):
+    # Datas distintas por espaço (UNIQUE nome_espaco, data_reserva), metade no futuro.
+    for espaco in ESPACOS:
+        for dia in rnd.sample(range(-365, 365), min(por_espaco, 730)):
+            morador_id, _unidade = rnd.choice(moradores)
+            yield (espaco, hoje + datetime.timedelta(days=dia), 'Aprovada', morador_id)
+
+
+def gerar_avisos(rnd, n, admin_id, hoje):
+    agora = datetime.datetime.combine(hoje, datetime.time(9))
+    for i in range(n):
+        publicacao = agora - datetime.timedelta(days=rnd.randrange(60))
+        expira = publicacao + datetime.timedelta(days=rnd.randrange(10, 120)) if i % 3 else None
+        yield (f"Aviso {i + 1}", f"Conteúdo do aviso {i + 1} gerado para benchmark.", rnd.randrange(3),
+               publicacao, expira, admin_id, 'ADMIN', True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--banco', default='totalville_bench', help="Banco de destino (padrão: totalville_bench).")
+    parser.add_argument('--recriar', action='store_true', help="Apaga o banco de benchmark antes de gerar.")
+    parser.add_argument('--escala', type=float, default=1.0, help="Multiplica todos os volumes.")
+    parser.add_argument('--unidades', type=int, default=2000)
+    parser.add_argument('--moradores', type=int, default=20000)
+    parser.add_argument('--encomendas', type=int, default=2000000)
+    parser.add_argument('--visitantes', type=int, default=1000000)
+    parser.add_argument('--ocorrencias', type=int, default=20000)
+    parser.add_argument('--reservas-por-espaco', type=int, default=300)
+    parser.add_argument('--avisos', type=int, default=60)
+    parser.add_argument('--lote', type=int, default=5000, help="Linhas por executemany/commit.")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--senha', default='bench123', help="Senha de todos os moradores gerados.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.banco == os.getenv('DB_NAME'):
+        parser.error(f"--banco '{args.banco}' é o banco da aplicação (DB_NAME); use um banco separado para benchmark.")
+    # init_db lê DB_NAME do ambiente; o load_dotenv dele não sobrescreve variáveis já definidas.
+    os.environ['DB_NAME'] = args.banco
+
+    def escalar(valor):
+        return max(1, int(valor * args.escala))
+
+    n_unidades = escalar(args.unidades)
+    n_moradores = escalar(args.moradores)
+    n_encomendas = escalar(args.encomendas)
+    n_visitantes = escalar(args.visitantes)
+    n_ocorrencias = escalar(args.ocorrencias)
+
+    if args.recriar:
+        conn = mysql.connector.connect(host=os.getenv('DB_HOST'), user=os.getenv('DB_USER'),
+                                       password=os.getenv('DB_PASSWORD'), charset='utf8mb4')
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{args.banco}`")
+        cursor.close()
+        conn.close()
+        print(f"-> Banco '{args.banco}' apagado.")
+
+    import init_db
+    init_db.configurar_banco_de_dados()
+
+    conn = init_db.get_db_connection_for_config()
+    if not conn:
+        sys.exit(1)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM moradores WHERE email LIKE %s", (f"%@{DOMINIO_EMAIL}",))
+    if cursor.fetchone()[0]:
+        print(f"❌ O banco '{args.banco}' já tem dados de benchmark. Use --recriar para gerar de novo.")
+        sys.exit(1)
+
+    rnd = random.Random(args.semente)
+    hoje = datetime.date.today()
+    rounds = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    senha_hash = bcrypt_lib.hashpw(args.senha.encode('utf-8'), bcrypt_lib.gensalt(rounds)).decode('utf-8')
+
+    # Carga em massa: as chaves estrangeiras apontam para ids lidos do próprio
+    # banco, então as verificações podem ser suspensas nesta sessão.
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    cursor.execute("SET SESSION unique_checks = 0")
+    cursor.execute("SELECT id FROM administradores ORDER BY id LIMIT 1")
+    admin_id = cursor.fetchone()[0]
+    inicio_total = time.perf_counter()
+
+    inserir_em_lotes(conn, """
+        INSERT INTO unidades (tipo_unidade, bloco, numero, andar, ocupada) VALUES (%s, %s, %s, %s, %s)
+    """, gerar_unidades(n_unidades), args.lote, 'unidades', n_unidades)
+    cursor.execute("""
+        SELECT id, tipo_unidade, bloco, numero FROM unidades
+        WHERE bloco LIKE 'BL%' OR (tipo_unidade = 'casa' AND numero LIKE 'C%')
+        ORDER BY id
+    """)
+    rotulos_unidades = {}
+    for id_unidade, tipo, bloco, numero in cursor.fetchall():
+        rotulos_unidades[id_unidade] = f"{bloco}-{numero}" if bloco else f"Casa {numero}"
+    ids_unidades = list(rotulos_unidades)
+
+    inserir_em_lotes(conn, """
+        INSERT INTO moradores (nome_completo, email, senha_hash, unidade_id, cpf, tipo_morador, ativo)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, gerar_moradores(rnd, n_moradores, ids_unidades, senha_hash), args.lote, 'moradores', n_moradores)
+    cursor.execute("SELECT id, unidade_id FROM moradores WHERE email LIKE %s ORDER BY id", (f"%@{DOMINIO_EMAIL}",))
+    moradores = cursor.fetchall()
+
+    inserir_em_lotes(conn, """
+        INSERT INTO encomendas (remetente, descricao, data_chegada, status, data_retirada,
+                                morador_id, unidade_destino_id, registrado_por_admin_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, gerar_encomendas(rnd, n_encomendas, moradores, admin_id, hoje), args.lote, 'encomendas', n_encomendas)
+
+    inserir_em_lotes(conn, """
+        INSERT INTO visitantes (nome_completo, cpf, data_liberacao, possui_veiculo, placa_veiculo,
+                                modelo_veiculo, cor_veiculo, unidade_visitada, observacoes, morador_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, gerar_visitantes(rnd, n_visitantes, moradores, rotulos_unidades, hoje), args.lote, 'visitantes', n_visitantes)
+
+    inserir_em_lotes(conn, """
+        INSERT INTO ocorrencias (tipo_ocorrencia, descricao, localizacao, data_ocorrencia, status, morador_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, gerar_ocorrencias(rnd, n_ocorrencias, moradores, hoje), args.lote, 'ocorrencias', n_ocorrencias)
+
+    n_reservas = len(ESPACOS) * min(args.reservas_por_espaco, 730)
+    inserir_em_lotes(conn, """
+        INSERT INTO reservas (nome_espaco, data_reserva, status, morador_id) VALUES (%s, %s, %s, %s)
+    """, gerar_reservas(rnd, args.reservas_por_espaco, moradores, hoje), args.lote, 'reservas', n_reservas)
+
+    inserir_em_lotes(conn, """
+        INSERT INTO avisos (titulo, conteudo, prioridade, data_publicacao, data_expiracao,
+                            registrado_por_user_id, registrado_por_user_role, ativo)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, gerar_avisos(rnd, args.avisos, admin_id, hoje), args.lote, 'avisos', args.avisos)
+
+    cursor.execute("SET SESSION foreign_key_checks = 1")
+    cursor.execute("SET SESSION unique_checks = 1")
+
+    # Os contadores de ocorrências são mantidos pelas rotas; aqui a carga foi direta.
+    from ocorrencias_resumo import reconciliar
+    reconciliar(conn)
+
+    print("Atualizando estatísticas dos índices (ANALYZE TABLE)...")
+    cursor.execute("ANALYZE TABLE unidades, moradores, encomendas, visitantes, ocorrencias, reservas, avisos")
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+    print(f"\n✅ Massa de benchmark gerada em '{args.banco}' em {time.perf_counter() - inicio_total:.0f} s.")
+    print(f"   Moradores: morador1..morador{n_moradores}@{DOMINIO_EMAIL} / senha '{args.senha}'.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Teto de concorrência: modo WSGI (threads) x modo ASGI (asgi.py), sobre a massa
+de gerar_dados.py.
+
+Sobe a concorrência em degraus (--niveis) contra os dois servidores, com a
+mesma carga, e registra em cada degrau vazão, p95 e taxa de erro. O teto de um
+modo é o maior degrau em que o p95 ficou abaixo de --p95-max-ms e os erros
+abaixo de --erros-max; a subida daquele modo para no primeiro degrau que falha.
+
+  dashboard - GET /api/dashboard com tokens de vários moradores (MySQL)
+  pix       - POST /api/reservas/<id>/create-payment em uma reserva pendente
+              (--reserva-id). Rode os dois servidores com MERCADOPAGO_FAKE=1 e
+              MERCADOPAGO_FAKE_LATENCIA=0.2 para simular a espera pelo gateway.
+
+Os dois servidores devem usar o mesmo banco e limites comparáveis, por exemplo
+(a partir de backend/, DB_NAME=totalville_bench):
+  gunicorn -w 2 --threads 16 -b :5000 app:app
+  ASGI_WSGI_THREADS=16 uvicorn asgi:app --workers 2 --port 8000
+
+Uso:
+  python benchmarks/teto_concorrencia.py --niveis 8,16,32,64,128,256 --saida teto.json
+  python benchmarks/teto_concorrencia.py --cargas pix --reserva-id 123
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cargas import Cliente, executar, commit_atual, DOMINIO_EMAIL
+
+CARGAS = ('dashboard', 'pix')
+OK = ('200', '201', '304')
+
+
+def tarefas_dashboard(cliente, args, rnd, tokens, quantidade):
+    def tarefa(token):
+        return lambda: cliente.requisitar('GET', '/api/dashboard', token=token).status_code
+    return [tarefa(rnd.choice(tokens)) for _ in range(quantidade)]
+
+
+def tarefas_pix(cliente, args, rnd, tokens, quantidade):
+    caminho = f"/api/reservas/{args.reserva_id}/create-payment"
+    return [lambda: cliente.requisitar('POST', caminho).status_code for _ in range(quantidade)]
+
+
+def taxa_de_erros(resultado):
+    falhas = sum(n for codigo, n in resultado['status'].items() if codigo not in OK)
+    falhas += sum(resultado['erros'].values())
+    return falhas / resultado['requisicoes'] if resultado['requisicoes'] else 1.0
+
+
+def subir_degraus(nome_modo, url, carga, args, rnd, tokens):
+    """Roda os degraus de concorrência em um servidor; devolve os degraus medidos e o teto."""
+    cliente = Cliente(url, max(args.niveis), args.timeout)
+    montar = tarefas_dashboard if carga == 'dashboard' else tarefas_pix
+    degraus = []
+    teto = None
+    for nivel in args.niveis:
+        quantidade = max(args.requisicoes_minimas, nivel * args.requisicoes_por_thread)
+        resultado = executar(f"{nome_modo}/{carga}@{nivel}", montar(cliente, args, rnd, tokens, quantidade), nivel)
+        resultado['taxa_erros'] = round(taxa_de_erros(resultado), 4)
+        resultado['dentro_do_limite'] = (resultado['taxa_erros'] <= args.erros_max
+                                         and resultado['p95_ms'] is not None
+                                         and resultado['p95_ms'] <= args.p95_max_ms)
+        degraus.append(resultado)
+        if not resultado['dentro_do_limite']:
+            break
+        teto = nivel
+    return {'url': url, 'teto_concorrencia': teto, 'degraus': degraus}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url-wsgi', default='http://localhost:5000')
+    parser.add_argument('--url-asgi', default='http://localhost:8000')
+    parser.add_argument('--cargas', default='dashboard', help=f"Lista separada por vírgulas ({', '.join(CARGAS)}).")
+    parser.add_argument('--niveis', default='8,16,32,64,128,256', help="Degraus de concorrência.")
+    parser.add_argument('--requisicoes-por-thread', type=int, default=10)
+    parser.add_argument('--requisicoes-minimas', type=int, default=200)
+    parser.add_argument('--p95-max-ms', type=float, default=500)
+    parser.add_argument('--erros-max', type=float, default=0.01, help="Fração de respostas com erro aceita (0.01 = 1%%).")
+    parser.add_argument('--reserva-id', type=int, help="Reserva pendente usada pela carga pix.")
+    parser.add_argument('--moradores', type=int, default=20000, help="Quantos moradores a massa tem (gerar_dados.py).")
+    parser.add_argument('--usuarios', type=int, default=50, help="Moradores logados para o dashboard.")
+    parser.add_argument('--senha', default='bench123')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--semente', type=int, default=None, help="Semente do sorteio (padrão: aleatória).")
+    parser.add_argument('--saida', help="Grava o relatório JSON neste arquivo.")
+    args = parser.parse_args()
+
+    try:
+        args.niveis = sorted({int(n) for n in args.niveis.split(',') if n.strip()})
+    except ValueError:
+        parser.error("--niveis deve ser uma lista de inteiros separados por vírgula.")
+    if not args.niveis or args.niveis[0] < 1:
+        parser.error("--niveis deve ter ao menos um degrau maior que zero.")
+    pedidas = [c.strip() for c in args.cargas.split(',') if c.strip()]
+    desconhecidas = [c for c in pedidas if c not in CARGAS]
+    if desconhecidas:
+        parser.error(f"Cargas desconhecidas: {', '.join(desconhecidas)}")
+    if 'pix' in pedidas and not args.reserva_id:
+        parser.error("A carga pix precisa de --reserva-id (uma reserva com status Pendente).")
+
+    rnd = random.Random(args.semente)
+    tokens = []
+    if 'dashboard' in pedidas:
+        # O token vale nos dois modos (mesma JWT_SECRET_KEY); o login sai das medições.
+        print(f"Autenticando {args.usuarios} moradores...", flush=True)
+        cliente = Cliente(args.url_wsgi, 8, args.timeout)
+        escolhidos = rnd.sample(range(1, args.moradores + 1), min(args.usuarios, args.moradores))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            tokens = list(executor.map(lambda n: cliente.login(f"morador{n}@{DOMINIO_EMAIL}", args.senha), escolhidos))
+
+    relatorio = {
+        'commit': commit_atual(),
+        'executado_em': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'criterio': {'p95_max_ms': args.p95_max_ms, 'erros_max': args.erros_max},
+        'cargas': {},
+    }
+    for carga in pedidas:
+        relatorio['cargas'][carga] = {
+            'wsgi': subir_degraus('wsgi', args.url_wsgi, carga, args, rnd, tokens),
+            'asgi': subir_degraus('asgi', args.url_asgi, carga, args, rnd, tokens),
+        }
+
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    print("\nTeto de concorrência (maior degrau dentro do critério):")
+    for carga, modos in relatorio['cargas'].items():
+        linha = []
+        for modo, dados in modos.items():
+            ultimo_ok = [d for d in dados['degraus'] if d['dentro_do_limite']]
+            vazao = ultimo_ok[-1]['vazao_rps'] if ultimo_ok else None
+            linha.append(f"{modo} {dados['teto_concorrencia'] or '-':>5} ({vazao or '-'} req/s)")
+        print(f"   {carga:<10} " + "   ".join(linha))
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+        print(f"-> Relatório gravado em {args.saida}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import re
+
+# Auxiliares da busca textual de encomendas sobre os índices FULLTEXT
+# (ft_encomendas_busca em encomendas(remetente, descricao) e
+# ft_moradores_nome em moradores(nome_completo)).
+#
+# - Prefixo: cada termo vira "+termo*" no modo BOOLEAN do MATCH ... AGAINST;
+#   todos os termos são obrigatórios, como o LIKE '%termo%' antigo exigia o
+#   texto inteiro.
+# - Acentos/maiúsculas: a comparação usa a collation utf8mb4_unicode_ci das
+#   colunas, então "joao" encontra "João".
+# - Ranking: a relevância devolvida pelo MATCH é usada na ordenação.
+#
+# Diferenças em relação ao LIKE '%termo%' antigo, nos campos com FULLTEXT
+# (remetente, descrição e nome do morador): o termo casa por início de palavra
+# ("silva" encontra "Silvana", mas "ilva" não encontra nada), as palavras não
+# precisam estar juntas nem na mesma ordem, e palavras com menos de
+# FT_MIN_TOKEN_SIZE letras são ignoradas. Número, bloco e tipo da unidade
+# continuam com LIKE '%termo%' (a tabela de unidades é pequena).
+
+# Tamanho mínimo de token indexado pelo InnoDB (innodb_ft_min_token_size).
+FT_MIN_TOKEN_SIZE = 3
+
+_PADRAO_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenizar(termo):
+    """Quebra o termo em palavras, descartando operadores do modo BOOLEAN (+ - * " etc.)."""
+    if not termo:
+        return []
+    return [t.lower() for t in _PADRAO_TOKEN.findall(termo)]
+
+
+def consulta_booleana(tokens):
+    """
+    Monta a expressão para AGAINST (... IN BOOLEAN MODE) com busca por prefixo.
+    Tokens menores que o mínimo do índice não são indexados e ficam de fora;
+    retorna None quando nenhum token pode ser buscado no índice.
+    """
+    validos = [f"+{t}*" for t in tokens if len(t) >= FT_MIN_TOKEN_SIZE]
+    if not validos:
+        return None
+    return " ".join(validos)
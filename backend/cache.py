@@ -0,0 +1,87 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Cache em memória do processo, com expiração (TTL) e descarte LRU.
+# Usado para respostas que mudam pouco e cujas rotas de escrita conhecidas
+# invalidam as entradas explicitamente.
+
+
+class TTLCache:
+    """
+    Cache thread-safe com limite de itens (LRU) e tempo de vida por entrada.
+
+    Para evitar que uma leitura lenta grave um valor antigo logo depois de uma
+    invalidação, quem vai calcular um valor pega antes geracao() e passa para
+    set(); se houve invalidação no meio tempo, o valor é descartado.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, nome=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.nome = nome
+        self._dados = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def geracao(self):
+        with self._lock:
+            return self._geracao
+
+    def get(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+            expira_em, valor = item
+            if expira_em <= agora:
+                del self._dados[chave]
+                self.misses += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def set(self, chave, valor, ttl=None, geracao=None):
+        """Grava o valor. ttl (segundos) sobrepõe o padrão do cache para esta entrada."""
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                return False
+            self._dados[chave] = (expira_em, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, chave):
+        with self._lock:
+            self._geracao += 1
+            self.invalidations += 1
+            self._dados.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._geracao += 1
+            self.invalidations += 1
+            self._dados.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'nome': self.nome,
+                'itens': len(self._dados),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
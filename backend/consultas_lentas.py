@@ -0,0 +1,262 @@
+import os
+import re
+import time
+import queue
+import hashlib
+import logging
+import threading
+import functools
+from collections import deque
+from metrics import endpoint_atual
+
+# Observabilidade das consultas SQL.
+#
+# Cada comando executado por um cursor do pool é reduzido a uma "impressão
+# digital" (literais, números e parâmetros viram ?, listas IN viram (...)), de
+# modo que o mesmo SQL com valores diferentes, ou com WHERE/SET montados
+# dinamicamente na mesma forma, caia no mesmo grupo. Por grupo guardamos
+# contagem, tempo total, máximo e uma janela das últimas durações (p50/p95/p99).
+#
+# Consultas acima de SLOW_QUERY_MS são registradas no log e, no máximo uma vez
+# por QUERY_EXPLAIN_INTERVAL segundos por grupo, uma thread em segundo plano roda
+# EXPLAIN com os mesmos parâmetros e marca varreduras completas (type=ALL),
+# filesort e tabelas temporárias.
+
+logger = logging.getLogger(__name__)
+
+_COMENTARIOS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETROS = re.compile(r'%s|%\(\w+\)s')
+_LISTAS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ESPACOS = re.compile(r'\s+')
+_LINHAS_VALUES = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.I)
+# Só comandos DML comuns recebem EXPLAIN; funções com efeito colateral ficam de fora.
+_EXPLICAVEL = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT|REPLACE)\b', re.I)
+_NAO_EXPLICAR = re.compile(r'\b(GET_LOCK|RELEASE_LOCK|SLEEP)\s*\(', re.I)
+
+
+def normalizar(sql):
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', errors='replace')
+    sql = _COMENTARIOS.sub(' ', sql)
+    sql = _STRINGS.sub('?', sql)
+    sql = _PARAMETROS.sub('?', sql)
+    sql = _NUMEROS.sub('?', sql)
+    sql = _LISTAS.sub('(...)', sql)
+    sql = _LINHAS_VALUES.sub(r'\1', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+def impressao_digital(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode('utf-8')).hexdigest()[:12]
+
+
+@functools.lru_cache(maxsize=4096)
+def _classificar(sql):
+    # As rotas repetem os mesmos textos SQL; o cache evita refazer as regex.
+    normalizado = normalizar(sql)
+    return normalizado, impressao_digital(normalizado)
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def resumir_explain(linhas):
+    """Extrai de um EXPLAIN (linhas como dicionários) os sinais de plano ruim."""
+    varreduras = []
+    filesort = False
+    temporaria = False
+    for linha in linhas:
+        extra = linha.get('Extra') or ''
+        if linha.get('type') == 'ALL':
+            varreduras.append(linha.get('table'))
+        if 'Using filesort' in extra:
+            filesort = True
+        if 'Using temporary' in extra:
+            temporaria = True
+    return {
+        'varredura_completa': varreduras,
+        'filesort': filesort,
+        'tabela_temporaria': temporaria,
+        'plano': linhas,
+    }
+
+
+class _Grupo:
+    __slots__ = ('sql', 'endpoints', 'contagem', 'total', 'maximo', 'duracoes',
+                 'lentas', 'explain', 'explain_em', 'explain_erro')
+
+    def __init__(self, sql, janela):
+        self.sql = sql
+        self.endpoints = set()
+        self.contagem = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.duracoes = deque(maxlen=janela)
+        self.lentas = 0
+        self.explain = None
+        self.explain_em = None
+        self.explain_erro = None
+
+
+class ObservadorConsultas:
+    """
+    Observador do db_pool.ConnectionPool.
+
+    obter_conexao:     função que devolve uma conexão para rodar os EXPLAINs.
+    limite_lento:      segundos a partir dos quais a consulta é considerada lenta.
+    intervalo_explain: segundos mínimos entre dois EXPLAINs do mesmo grupo.
+    janela:            últimas durações guardadas por grupo (base dos percentis).
+    max_grupos:        limite de grupos distintos (os excedentes vão para 'outros').
+    """
+
+    def __init__(self, obter_conexao, limite_lento=0.2, intervalo_explain=600,
+                 janela=512, max_grupos=1000):
+        self.obter_conexao = obter_conexao
+        self.limite_lento = limite_lento
+        self.intervalo_explain = intervalo_explain
+        self.janela = janela
+        self.max_grupos = max_grupos
+        self._grupos = {}
+        self._lock = threading.Lock()
+        self._fila_explain = queue.Queue(maxsize=32)
+        self._thread = None
+        self.iniciado_em = time.time()
+
+    # --- interface de observador do pool ---
+    def conexao_adquirida(self, segundos):
+        pass
+
+    def linhas_lidas(self, quantidade):
+        pass
+
+    def consulta_executada(self, sql, params, segundos):
+        normalizado, chave = _classificar(sql)
+        if normalizado[:7].upper() == 'EXPLAIN':
+            return
+        pedir_explain = False
+        with self._lock:
+            grupo = self._grupos.get(chave)
+            if grupo is None:
+                if len(self._grupos) >= self.max_grupos:
+                    chave, normalizado = 'outros', '(outros)'
+                    grupo = self._grupos.get(chave)
+                if grupo is None:
+                    grupo = self._grupos[chave] = _Grupo(normalizado, self.janela)
+            grupo.contagem += 1
+            grupo.total += segundos
+            grupo.maximo = max(grupo.maximo, segundos)
+            grupo.duracoes.append(segundos)
+            grupo.endpoints.add(endpoint_atual.get())
+            if segundos >= self.limite_lento:
+                grupo.lentas += 1
+                agora = time.monotonic()
+                explicavel = chave != 'outros' and _EXPLICAVEL.match(normalizado) and not _NAO_EXPLICAR.search(normalizado)
+                if explicavel and (grupo.explain_em is None or agora - grupo.explain_em >= self.intervalo_explain):
+                    grupo.explain_em = agora
+                    pedir_explain = True
+
+        if segundos >= self.limite_lento:
+            logger.warning("Consulta lenta (%.0f ms) [%s]: %s", segundos * 1000, chave, normalizado[:500],
+                           extra={'fingerprint': chave, 'duracao_ms': round(segundos * 1000, 1)})
+        if pedir_explain:
+            self._agendar_explain(chave, sql, params)
+
+    # --- EXPLAIN em segundo plano ---
+    def _agendar_explain(self, chave, sql, params):
+        # executemany recebe uma sequência de parâmetros; o EXPLAIN usa a primeira.
+        if isinstance(params, (list, tuple)) and params and isinstance(params[0], (list, tuple, dict)):
+            params = params[0]
+        try:
+            self._fila_explain.put_nowait((chave, sql, params))
+        except queue.Full:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop_explain, name="explain-consultas", daemon=True)
+                    self._thread.start()
+
+    def _loop_explain(self):
+        while True:
+            chave, sql, params = self._fila_explain.get()
+            try:
+                resumo, erro = self._rodar_explain(sql, params), None
+            except Exception as e:
+                resumo, erro = None, str(e)
+            with self._lock:
+                grupo = self._grupos.get(chave)
+                if grupo is not None:
+                    grupo.explain = resumo
+                    grupo.explain_erro = erro
+            if resumo and (resumo['varredura_completa'] or resumo['filesort']):
+                logger.warning("Plano ruim [%s]: varredura completa em %s, filesort=%s",
+                               chave, resumo['varredura_completa'], resumo['filesort'],
+                               extra={'fingerprint': chave})
+
+    def _rodar_explain(self, sql, params):
+        conn = self.obter_conexao()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(f"EXPLAIN {sql}", params)
+                return resumir_explain(cursor.fetchall())
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    # --- relatório ---
+    def relatorio(self, ordenar_por='p95', limite=50, apenas_problemas=False):
+        with self._lock:
+            copia = [(chave, g.sql, set(g.endpoints), g.contagem, g.total, g.maximo, sorted(g.duracoes),
+                      g.lentas, g.explain, g.explain_erro) for chave, g in self._grupos.items()]
+        itens = []
+        for chave, sql, endpoints, contagem, total, maximo, duracoes, lentas, explain, erro in copia:
+            item = {
+                'fingerprint': chave,
+                'sql': sql,
+                'endpoints': sorted(endpoints),
+                'contagem': contagem,
+                'total_ms': round(total * 1000, 2),
+                'p50_ms': round(_percentil(duracoes, 50) * 1000, 2),
+                'p95_ms': round(_percentil(duracoes, 95) * 1000, 2),
+                'p99_ms': round(_percentil(duracoes, 99) * 1000, 2),
+                'max_ms': round(maximo * 1000, 2),
+                'lentas': lentas,
+                'explain': explain,
+                'explain_erro': erro,
+            }
+            if apenas_problemas and not (explain and (explain['varredura_completa'] or explain['filesort'])):
+                continue
+            itens.append(item)
+        campo = {'p95': 'p95_ms', 'p99': 'p99_ms', 'total': 'total_ms', 'contagem': 'contagem', 'max': 'max_ms'}.get(ordenar_por, 'p95_ms')
+        itens.sort(key=lambda i: i[campo], reverse=True)
+        return {
+            'desde': self.iniciado_em,
+            'limite_lento_ms': self.limite_lento * 1000,
+            'grupos': len(copia),
+            'consultas': itens[:limite],
+        }
+
+    def limpar(self):
+        with self._lock:
+            self._grupos.clear()
+            self.iniciado_em = time.time()
+
+
+def criar_observador_do_ambiente(obter_conexao):
+    if os.getenv('QUERY_STATS_ENABLED', '1').strip().lower() not in ('1', 'true', 'sim', 'yes', 'on'):
+        return None
+    return ObservadorConsultas(
+        obter_conexao,
+        limite_lento=float(os.getenv('SLOW_QUERY_MS', 200)) / 1000,
+        intervalo_explain=int(os.getenv('QUERY_EXPLAIN_INTERVAL', 600)),
+        janela=int(os.getenv('QUERY_STATS_WINDOW', 512)),
+        max_grupos=int(os.getenv('QUERY_STATS_MAX_FINGERPRINTS', 1000)),
+    )
@@ -0,0 +1,311 @@
+import os
+import time
+import queue
+import threading
+import mysql.connector
+
+# Pool de conexões MySQL compartilhado por todas as rotas do app.
+# Cada rota continua chamando get_db_connection() e conn.close() no finally;
+# a diferença é que close() devolve a conexão ao pool em vez de encerrá-la.
+
+
+class PoolEsgotadoError(mysql.connector.Error):
+    """Nenhuma conexão livre dentro do tempo de espera configurado."""
+    pass
+
+
+def _env_int(nome, padrao):
+    try:
+        return int(os.getenv(nome, padrao))
+    except (TypeError, ValueError):
+        return padrao
+
+
+def _env_bool(nome, padrao):
+    valor = os.getenv(nome)
+    if valor is None:
+        return padrao
+    return valor.strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+
+class CursorObservado:
+    """
+    Envolve um cursor e avisa os observadores do pool sobre cada execute/executemany
+    (SQL, parâmetros e duração) e sobre as linhas lidas. Só é usado quando o pool
+    tem observadores; sem eles, as rotas recebem o cursor original.
+    """
+
+    def __init__(self, cursor, observadores):
+        self._cursor = cursor
+        self._observadores = observadores
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _medir(self, metodo, sql, params, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, params, *args, **kwargs)
+        finally:
+            duracao = time.perf_counter() - inicio
+            for obs in self._observadores:
+                obs.consulta_executada(sql, params, duracao)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._medir(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._medir(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def _contar(self, quantidade):
+        if quantidade:
+            for obs in self._observadores:
+                obs.linhas_lidas(quantidade)
+
+    def fetchone(self):
+        linha = self._cursor.fetchone()
+        self._contar(1 if linha is not None else 0)
+        return linha
+
+    def fetchmany(self, *args, **kwargs):
+        linhas = self._cursor.fetchmany(*args, **kwargs)
+        self._contar(len(linhas))
+        return linhas
+
+    def fetchall(self):
+        linhas = self._cursor.fetchall()
+        self._contar(len(linhas))
+        return linhas
+
+
+class PooledConnection:
+    """
+    Envolve uma conexão do mysql.connector emprestada do pool.
+    Todos os atributos são repassados para a conexão real, exceto close(),
+    que devolve a conexão ao pool, is_connected(), que não faz ping, e
+    rollback(), que marca a conexão perdida para descarte em vez de levantar.
+    """
+
+    def __init__(self, pool, raw_conn, criada_em):
+        self._pool = pool
+        self._conn = raw_conn
+        self._criada_em = criada_em
+        self._devolvida = False
+        self._quebrada = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if self._pool.observadores:
+            return CursorObservado(cursor, self._pool.observadores)
+        return cursor
+
+    def is_connected(self):
+        # Sem ping: as rotas chamam isto em todo finally, e o mysql.connector
+        # faria uma ida ao servidor a cada chamada. Conexões ociosas são
+        # validadas pelo pre_ping do pool; uma que caiu no meio da requisição
+        # falha no próximo comando e é descartada na devolução.
+        return not self._devolvida and not self._quebrada
+
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        except mysql.connector.Error:
+            # Conexão perdida: não há transação a desfazer no servidor.
+            self._quebrada = True
+
+    def close(self):
+        if self._devolvida:
+            return
+        self._devolvida = True
+        self._pool._devolver(self._conn, self._criada_em, descartar=self._quebrada)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Pool de conexões thread-safe.
+
+    - pool_size: conexões mantidas abertas e reutilizadas.
+    - max_overflow: conexões extras criadas sob pico; são fechadas ao serem devolvidas.
+    - timeout: segundos que uma requisição espera por uma conexão livre.
+    - recycle: conexões mais antigas que isso (segundos) são recriadas.
+    - pre_ping: valida a conexão (ping) antes de entregá-la, após ficar ociosa.
+
+    Observadores (adicionar_observador) recebem conexao_adquirida(segundos),
+    consulta_executada(sql, params, segundos) e linhas_lidas(quantidade).
+    """
+
+    def __init__(self, connect_kwargs, pool_size=5, max_overflow=10, timeout=10,
+                 recycle=1800, pre_ping=True, ping_idle_seconds=30):
+        self._connect_kwargs = connect_kwargs
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.ping_idle_seconds = ping_idle_seconds
+
+        # Cada item da fila: (conexao, criada_em, devolvida_em)
+        self._ociosas = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(pool_size + max_overflow)
+        self._stats = {
+            'criadas': 0,
+            'fechadas': 0,
+            'emprestimos': 0,
+            'reusos': 0,
+            'recicladas': 0,
+            'ping_falhou': 0,
+            'esgotado': 0,
+            'em_uso': 0,
+        }
+        self.observadores = []
+
+    def adicionar_observador(self, observador):
+        self.observadores.append(observador)
+
+    def _incrementar(self, chave, valor=1):
+        with self._lock:
+            self._stats[chave] += valor
+
+    def _nova_conexao(self):
+        conn = mysql.connector.connect(**self._connect_kwargs)
+        self._incrementar('criadas')
+        return conn
+
+    def _fechar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._incrementar('fechadas')
+
+    def get_connection(self):
+        inicio = time.perf_counter()
+        if not self._vagas.acquire(timeout=self.timeout):
+            self._incrementar('esgotado')
+            raise PoolEsgotadoError(msg=f"Pool de conexões esgotado após {self.timeout}s de espera.")
+
+        try:
+            conn, criada_em = self._obter_ociosa()
+            if conn is None:
+                conn = self._nova_conexao()
+                criada_em = time.monotonic()
+        except Exception:
+            self._vagas.release()
+            raise
+
+        with self._lock:
+            self._stats['emprestimos'] += 1
+            self._stats['em_uso'] += 1
+        if self.observadores:
+            espera = time.perf_counter() - inicio
+            for obs in self.observadores:
+                obs.conexao_adquirida(espera)
+        return PooledConnection(self, conn, criada_em)
+
+    def _obter_ociosa(self):
+        agora = time.monotonic()
+        while True:
+            try:
+                conn, criada_em, devolvida_em = self._ociosas.get_nowait()
+            except queue.Empty:
+                return None, None
+
+            if self.recycle and agora - criada_em > self.recycle:
+                self._incrementar('recicladas')
+                self._fechar(conn)
+                continue
+
+            if self.pre_ping and agora - devolvida_em > self.ping_idle_seconds:
+                try:
+                    conn.ping(reconnect=False)
+                except mysql.connector.Error:
+                    self._incrementar('ping_falhou')
+                    self._fechar(conn)
+                    continue
+
+            self._incrementar('reusos')
+            return conn, criada_em
+
+    def _devolver(self, conn, criada_em, descartar=False):
+        with self._lock:
+            self._stats['em_uso'] -= 1
+        try:
+            reutilizavel = False
+            if not descartar:
+                # Descarta resultados pendentes e encerra transações abertas para que
+                # o próximo usuário receba a conexão limpa. Sem ping aqui: o
+                # rollback só vai ao servidor se há transação aberta, e uma
+                # conexão que caiu é descartada pelo erro.
+                try:
+                    if conn.unread_result:
+                        conn.consume_results()
+                    if conn.in_transaction:
+                        conn.rollback()
+                    reutilizavel = True
+                except mysql.connector.Error:
+                    reutilizavel = False
+
+            if reutilizavel:
+                try:
+                    self._ociosas.put_nowait((conn, criada_em, time.monotonic()))
+                except queue.Full:
+                    # Conexão de overflow: fecha em vez de manter ociosa.
+                    self._fechar(conn)
+            else:
+                self._fechar(conn)
+        finally:
+            self._vagas.release()
+
+    def stats(self):
+        with self._lock:
+            dados = dict(self._stats)
+        dados.update({
+            'ociosas': self._ociosas.qsize(),
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow,
+            'timeout': self.timeout,
+            'recycle': self.recycle,
+            'pre_ping': self.pre_ping,
+        })
+        return dados
+
+    def dispose(self):
+        """Fecha todas as conexões ociosas (ex.: após um fork do processo)."""
+        while True:
+            try:
+                conn, _, _ = self._ociosas.get_nowait()
+            except queue.Empty:
+                break
+            self._fechar(conn)
+
+
+def criar_pool_do_ambiente():
+    connect_kwargs = {
+        'host': os.getenv('DB_HOST'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME'),
+        'charset': 'utf8mb4',
+    }
+    return ConnectionPool(
+        connect_kwargs,
+        pool_size=_env_int('DB_POOL_SIZE', 5),
+        max_overflow=_env_int('DB_POOL_MAX_OVERFLOW', 10),
+        timeout=_env_int('DB_POOL_TIMEOUT', 10),
+        recycle=_env_int('DB_POOL_RECYCLE_SECONDS', 1800),
+        pre_ping=_env_bool('DB_POOL_PRE_PING', True),
+        ping_idle_seconds=_env_int('DB_POOL_PING_IDLE_SECONDS', 30),
+    )
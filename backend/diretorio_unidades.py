@@ -0,0 +1,124 @@
+import re
+import hashlib
+import datetime
+from cache import TTLCache
+
+# Diretório de unidades em memória do processo.
+#
+# A tabela unidades é pequena e quase não muda, mas GET /api/unidades é chamado
+# por várias telas e ordenava com CAST(numero AS UNSIGNED) (filesort a cada
+# chamada), e as rotas de moradores/encomendas conferiam a unidade com um SELECT
+# por requisição. Aqui a tabela inteira é carregada uma vez, já na ordem da
+# listagem e com um índice id -> unidade; a resposta JSON também fica pronta.
+# Quem grava em unidades chama invalidar(); o TTL cobre alterações feitas por
+# outros processos ou direto no banco.
+
+SQL_UNIDADES = "SELECT id, tipo_unidade, bloco, numero, andar FROM unidades"
+
+# Posição dos valores no ENUM('casa', 'apartamento'): o MySQL ordena ENUM pelo índice.
+_ORDEM_TIPO = {'casa': 1, 'apartamento': 2}
+_PREFIXO_NUMERICO = re.compile(r'\s*(\d*)')
+
+
+def _numero_como_unsigned(numero):
+    """Equivalente a CAST(numero AS UNSIGNED): prefixo numérico, ou 0 se não houver."""
+    digitos = _PREFIXO_NUMERICO.match(numero or '').group(1)
+    return int(digitos) if digitos else 0
+
+
+def chave_ordenacao(unidade):
+    """
+    Mesma ordem de ORDER BY tipo_unidade DESC, bloco ASC, CAST(numero AS
+    UNSIGNED) ASC: apartamentos antes de casas, bloco NULL primeiro e sem
+    diferenciar maiúsculas (collation _ci). O id desempata, para a ordem ser estável.
+    """
+    bloco = unidade['bloco']
+    return (
+        -_ORDEM_TIPO.get(unidade['tipo_unidade'], 0),
+        bloco is not None,
+        (bloco or '').casefold(),
+        _numero_como_unsigned(unidade['numero']),
+        unidade['id'],
+    )
+
+
+class Diretorio:
+    """Retrato imutável da tabela: lista ordenada, índice por id e o JSON da listagem."""
+
+    __slots__ = ('lista', 'por_id', 'corpo', 'etag', 'last_modified')
+
+    def __init__(self, unidades, serializar):
+        self.lista = sorted(unidades, key=chave_ordenacao)
+        self.por_id = {u['id']: u for u in self.lista}
+        self.corpo = serializar(self.lista)
+        self.etag = hashlib.sha1(self.corpo).hexdigest()
+        self.last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+
+class DiretorioUnidades:
+    """
+    serializar: função lista -> bytes (o JSON da resposta de GET /api/unidades).
+    ttl:        segundos até recarregar mesmo sem invalidação.
+    """
+
+    def __init__(self, serializar, ttl=300):
+        self.serializar = serializar
+        self._cache = TTLCache(maxsize=1, ttl=ttl, nome='unidades')
+
+    def obter(self, cursor_factory):
+        """Devolve o Diretorio atual. cursor_factory() só é chamado se for preciso recarregar."""
+        diretorio = self.atual()
+        if diretorio is None:
+            geracao = self.geracao()
+            cursor = cursor_factory()
+            cursor.execute(SQL_UNIDADES)
+            colunas = cursor.column_names
+            unidades = [linha if isinstance(linha, dict) else dict(zip(colunas, linha))
+                        for linha in cursor.fetchall()]
+            diretorio = self.guardar(unidades, geracao)
+        return diretorio
+
+    # atual/geracao/guardar permitem recarregar com outro driver (asgi.py usa
+    # aiomysql): guarde geracao() antes do SELECT e passe-a a guardar(), para que
+    # uma invalidação feita durante a leitura descarte o resultado antigo.
+
+    def atual(self):
+        """Diretorio em cache, ou None se precisar ser recarregado."""
+        return self._cache.get('diretorio')
+
+    def geracao(self):
+        return self._cache.geracao()
+
+    def guardar(self, unidades, geracao):
+        """Monta o Diretorio a partir das linhas (dicts) de SQL_UNIDADES e o coloca em cache."""
+        diretorio = Diretorio(unidades, self.serializar)
+        self._cache.set('diretorio', diretorio, geracao=geracao)
+        return diretorio
+
+    def buscar(self, cursor_factory, unidade_id):
+        """
+        Unidade pelo id, ou None. Um id ausente do diretório é conferido no banco
+        antes de ser dado como inexistente: se a unidade foi criada por outro
+        processo, o diretório é invalidado e recarregado.
+        """
+        try:
+            unidade_id = int(unidade_id)
+        except (TypeError, ValueError):
+            return None
+        unidade = self.obter(cursor_factory).por_id.get(unidade_id)
+        if unidade is None:
+            cursor = cursor_factory()
+            cursor.execute("SELECT id FROM unidades WHERE id = %s", (unidade_id,))
+            if cursor.fetchone():
+                self.invalidar()
+                unidade = self.obter(cursor_factory).por_id.get(unidade_id)
+        return unidade
+
+    def existe(self, cursor_factory, unidade_id):
+        return self.buscar(cursor_factory, unidade_id) is not None
+
+    def invalidar(self):
+        self._cache.invalidate('diretorio')
+
+    def stats(self):
+        return self._cache.stats()
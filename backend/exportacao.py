@@ -0,0 +1,67 @@
+import io
+import csv
+import json
+import decimal
+import datetime
+
+# Geração de exportações em streaming (NDJSON ou CSV) a partir de um cursor
+# não bufferizado: as linhas são lidas do MySQL em lotes e escritas na resposta
+# conforme chegam, então o uso de memória não depende do tamanho do histórico.
+
+TAMANHO_LOTE = 500
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def _valor_exportavel(valor):
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    if isinstance(valor, (bytes, bytearray)):
+        return valor.decode('utf-8', errors='replace')
+    return valor
+
+
+def _lotes(cursor):
+    while True:
+        linhas = cursor.fetchmany(TAMANHO_LOTE)
+        if not linhas:
+            break
+        yield linhas
+
+
+def gerar_ndjson(cursor):
+    colunas = cursor.column_names
+    for linhas in _lotes(cursor):
+        partes = []
+        for linha in linhas:
+            registro = {c: _valor_exportavel(v) for c, v in zip(colunas, linha)}
+            partes.append(json.dumps(registro, ensure_ascii=False))
+        yield "\n".join(partes) + "\n"
+
+
+def gerar_csv(cursor):
+    colunas = cursor.column_names
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    escritor.writerow(colunas)
+    for linhas in _lotes(cursor):
+        for linha in linhas:
+            escritor.writerow([_valor_exportavel(v) for v in linha])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gerar_exportacao(cursor, formato):
+    if formato == 'csv':
+        return gerar_csv(cursor)
+    return gerar_ndjson(cursor)
@@ -0,0 +1,183 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturoTimeoutError
+import bcrypt as bcrypt_lib
+
+# Pool de processos dedicado ao bcrypt.
+#
+# Com custo 12, cada hash/verificação leva ~250 ms de CPU. Executar isso na
+# thread da requisição prende o worker do servidor (e o GIL) durante um pico de
+# logins. Aqui o trabalho vai para processos separados, com um limite de tarefas
+# pendentes: quando a fila enche, FilaHashCheiaError é levantada e a rota
+# responde 429 em vez de acumular requisições indefinidamente.
+
+
+class FilaHashCheiaError(Exception):
+    """Fila de hashing cheia; a rota deve responder 429 (Too Many Requests)."""
+    pass
+
+
+def _gerar_hash(senha, rounds):
+    return bcrypt_lib.hashpw(senha.encode('utf-8'), bcrypt_lib.gensalt(rounds)).decode('utf-8')
+
+
+def _verificar(senha_hash, senha):
+    return bcrypt_lib.checkpw(senha.encode('utf-8'), senha_hash.encode('utf-8'))
+
+
+def custo_do_hash(senha_hash):
+    """Extrai o custo de um hash no formato $2b$12$..."""
+    try:
+        return int(senha_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class HashingPool:
+    """
+    workers:       processos do pool (0 = executa na própria thread, sem pool).
+    max_pendentes: tarefas aceitas ao mesmo tempo (executando + na fila).
+    rounds:        custo usado para gerar hashes novos.
+    timeout:       segundos que a requisição espera pelo resultado.
+    observador:    objeto opcional com hash_concluido(operacao, segundos).
+    """
+
+    def __init__(self, workers=2, max_pendentes=32, rounds=12, timeout=10):
+        self.workers = workers
+        self.max_pendentes = max_pendentes
+        self.rounds = rounds
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(max_pendentes)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.rejeitadas = 0
+        self.observador = None
+
+    def _obter_executor(self):
+        with self._lock:
+            # Recria o pool se o processo foi "forkado" (ex.: workers do gunicorn).
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _executar(self, funcao, *args):
+        if self.observador is None:
+            return self._executar_no_pool(funcao, *args)
+        inicio = time.perf_counter()
+        try:
+            return self._executar_no_pool(funcao, *args)
+        finally:
+            self.observador.hash_concluido(funcao.__name__.lstrip('_'), time.perf_counter() - inicio)
+
+    def _executar_no_pool(self, funcao, *args):
+        if not self.workers:
+            return funcao(*args)
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self.rejeitadas += 1
+            raise FilaHashCheiaError("Servidor ocupado processando senhas. Tente novamente em instantes.")
+        futuro = self._submeter(self._obter_executor(), funcao, *args)
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturoTimeoutError:
+            # Tira a tarefa da fila se ela ainda não começou; se já está rodando,
+            # a vaga só volta quando ela terminar.
+            futuro.cancel()
+            raise
+
+    def _submeter(self, executor, funcao, *args):
+        """
+        Envia a tarefa ao pool com uma vaga já reservada. A vaga é devolvida
+        quando a tarefa termina (ou é cancelada), não quando quem a pediu
+        desiste de esperar: assim o limite de 429 vale para o trabalho que o
+        pool realmente tem.
+        """
+        try:
+            futuro = executor.submit(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _futuro: self._vagas.release())
+        return futuro
+
+    def gerar_hash(self, senha):
+        return self._executar(_gerar_hash, senha, self.rounds)
+
+    def gerar_hashes(self, senhas):
+        """
+        Gera os hashes de uma lista de senhas em paralelo (importação em massa).
+
+        Mantém no máximo `workers` tarefas no pool ao mesmo tempo e cada uma ocupa
+        uma vaga da fila, então logins concorrentes continuam sendo atendidos
+        entre os hashes do lote. Espera até `timeout` segundos por uma vaga antes
+        de levantar FilaHashCheiaError.
+        """
+        if not self.workers:
+            return [_gerar_hash(senha, self.rounds) for senha in senhas]
+        inicio = time.perf_counter()
+        executor = self._obter_executor()
+        resultados = [None] * len(senhas)
+        em_andamento = {}
+        try:
+            for indice, senha in enumerate(senhas):
+                while len(em_andamento) >= self.workers:
+                    self._coletar_um(em_andamento, resultados)
+                if not self._vagas.acquire(timeout=self.timeout):
+                    with self._lock:
+                        self.rejeitadas += 1
+                    raise FilaHashCheiaError("Servidor ocupado processando senhas. Tente novamente em instantes.")
+                em_andamento[self._submeter(executor, _gerar_hash, senha, self.rounds)] = indice
+            while em_andamento:
+                self._coletar_um(em_andamento, resultados)
+        finally:
+            for futuro in em_andamento:
+                futuro.cancel()
+            if self.observador is not None:
+                self.observador.hash_concluido('gerar_hashes', time.perf_counter() - inicio)
+        return resultados
+
+    def _coletar_um(self, em_andamento, resultados):
+        futuro = next(iter(wait(em_andamento, timeout=self.timeout, return_when=FIRST_COMPLETED)[0]), None)
+        if futuro is None:
+            raise TimeoutError("Tempo esgotado aguardando o pool de hashing.")
+        indice = em_andamento.pop(futuro)
+        resultados[indice] = futuro.result()
+
+    def verificar(self, senha_hash, senha):
+        return self._executar(_verificar, senha_hash, senha)
+
+    def precisa_rehash(self, senha_hash):
+        """True se o hash foi gerado com um custo diferente do configurado atualmente."""
+        custo = custo_do_hash(senha_hash)
+        return custo is not None and custo != self.rounds
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pendentes': self.max_pendentes,
+            'rounds': self.rounds,
+            'rejeitadas': self.rejeitadas,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def criar_hashing_pool_do_ambiente():
+    return HashingPool(
+        workers=int(os.getenv('BCRYPT_WORKERS', max(1, (os.cpu_count() or 2) - 1))),
+        max_pendentes=int(os.getenv('BCRYPT_MAX_PENDING', 32)),
+        rounds=int(os.getenv('BCRYPT_LOG_ROUNDS', 12)),
+        timeout=int(os.getenv('BCRYPT_TIMEOUT', 10)),
+    )
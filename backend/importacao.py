@@ -0,0 +1,366 @@
+import io
+import os
+import csv
+import json
+import logging
+import mysql.connector
+from dotenv import load_dotenv
+
+# Importação em massa de unidades e moradores (CSV ou NDJSON).
+#
+# Cada linha descreve uma unidade, um morador ou os dois:
+#   - tipo_unidade, bloco, numero, andar: a unidade (criada se ainda não existir);
+#   - nome_completo, email, password, cpf, rg, profissao, whatsapp, tipo_morador:
+#     o morador, ligado à unidade da mesma linha ou a unidade_id.
+#
+# Em vez de três SELECTs, um hash e um INSERT por morador, a importação:
+#   1. valida os campos de todas as linhas e as duplicatas dentro do arquivo;
+#   2. confere e-mails, CPFs e unidades já cadastrados com consultas IN em lotes;
+#   3. gera os hashes das senhas em paralelo no HashingPool (sem conexão aberta);
+#   4. insere unidades e moradores com executemany em lotes, numa única transação.
+# Linhas inválidas entram no relatório com o número da linha e o motivo, sem
+# interromper as demais. Se um lote esbarrar numa UNIQUE (cadastro concorrente),
+# só aquele lote é refeito linha a linha.
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ('csv', 'ndjson')
+TAMANHO_LOTE = 500
+TAMANHO_CONSULTA_IN = 1000
+
+TIPOS_UNIDADE = ('casa', 'apartamento')
+TIPOS_MORADOR = ('proprietario', 'inquilino', 'outro')
+TAMANHOS = {
+    'bloco': 10, 'numero': 10, 'nome_completo': 100, 'email': 100,
+    'cpf': 14, 'rg': 20, 'profissao': 100, 'whatsapp': 20,
+}
+
+
+class ArquivoInvalidoError(Exception):
+    """Arquivo de importação ilegível (formato desconhecido, cabeçalho ausente, etc.)."""
+    pass
+
+
+def ler_registros(texto, formato):
+    """Devolve [(numero_da_linha, dicionário ou mensagem de erro)]."""
+    if formato not in FORMATOS:
+        raise ArquivoInvalidoError("Formato inválido. Use 'csv' ou 'ndjson'.")
+    registros = []
+    if formato == 'csv':
+        leitor = csv.DictReader(io.StringIO(texto))
+        if not leitor.fieldnames:
+            raise ArquivoInvalidoError("CSV sem cabeçalho.")
+        for linha in leitor:
+            # Linha 1 é o cabeçalho.
+            registros.append((leitor.line_num, {k.strip(): v for k, v in linha.items() if k}))
+    else:
+        for numero, linha in enumerate(texto.splitlines(), start=1):
+            if not linha.strip():
+                continue
+            try:
+                dados = json.loads(linha)
+            except ValueError as e:
+                registros.append((numero, f"JSON inválido: {e}"))
+                continue
+            registros.append((numero, dados if isinstance(dados, dict) else "Cada linha deve ser um objeto JSON."))
+    return registros
+
+
+def _limpar(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = valor.strip()
+        return valor or None
+    return valor
+
+
+def _validar(dados):
+    """Normaliza uma linha. Devolve (unidade, morador) ou levanta ValueError."""
+    dados = {k: _limpar(v) for k, v in dados.items()}
+    for campo, tamanho in TAMANHOS.items():
+        if dados.get(campo) is not None and len(str(dados[campo])) > tamanho:
+            raise ValueError(f"'{campo}' excede {tamanho} caracteres.")
+
+    unidade = None
+    if dados.get('numero') is not None:
+        tipo = str(dados.get('tipo_unidade') or '').lower()
+        if tipo not in TIPOS_UNIDADE:
+            raise ValueError("'tipo_unidade' deve ser 'casa' ou 'apartamento'.")
+        andar = dados.get('andar')
+        if andar is not None:
+            try:
+                andar = int(andar)
+            except (TypeError, ValueError):
+                raise ValueError("'andar' deve ser um número inteiro.")
+        bloco = str(dados['bloco']) if dados.get('bloco') is not None else None
+        unidade = (tipo, bloco, str(dados['numero']), andar)
+
+    morador = None
+    if dados.get('email') is not None:
+        faltando = [c for c in ('nome_completo', 'password') if dados.get(c) is None]
+        if faltando:
+            raise ValueError(f"Campos obrigatórios do morador ausentes: {', '.join(faltando)}.")
+        if '@' not in dados['email']:
+            raise ValueError("E-mail inválido.")
+        tipo_morador = (dados.get('tipo_morador') or 'outro').lower()
+        if tipo_morador not in TIPOS_MORADOR:
+            raise ValueError(f"'tipo_morador' deve ser um de: {', '.join(TIPOS_MORADOR)}.")
+        unidade_id = dados.get('unidade_id')
+        if unidade is None:
+            if unidade_id is None:
+                raise ValueError("Informe a unidade do morador (unidade_id ou tipo_unidade/bloco/numero).")
+            try:
+                unidade_id = int(unidade_id)
+            except (TypeError, ValueError):
+                raise ValueError("'unidade_id' deve ser um número inteiro.")
+        morador = {
+            'nome_completo': str(dados['nome_completo']),
+            'email': str(dados['email']),
+            'password': str(dados['password']),
+            'cpf': str(dados['cpf']) if dados.get('cpf') is not None else None,
+            'rg': dados.get('rg'),
+            'profissao': dados.get('profissao'),
+            'whatsapp': dados.get('whatsapp'),
+            'tipo_morador': tipo_morador,
+            'unidade_id': unidade_id if unidade is None else None,
+        }
+
+    if unidade is None and morador is None:
+        raise ValueError("Linha sem unidade (numero) nem morador (email).")
+    return unidade, morador
+
+
+def _chave_unidade(tipo, bloco, numero):
+    # Mesma comparação da collation (_ci) da tabela: sem diferenciar maiúsculas.
+    return (tipo, bloco.casefold() if bloco else None, numero.casefold())
+
+
+def _em_lotes(valores, tamanho=TAMANHO_CONSULTA_IN):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _existentes(cursor, sql, valores):
+    """Executa sql (com um {} para os placeholders do IN) em lotes e junta as linhas."""
+    linhas = []
+    for lote in _em_lotes(valores):
+        cursor.execute(sql.format(", ".join(["%s"] * len(lote))), tuple(lote))
+        linhas.extend(cursor.fetchall())
+    return linhas
+
+
+def _ids_das_unidades(cursor, chaves):
+    """Mapeia (tipo, bloco, numero) -> id para as chaves já cadastradas."""
+    encontradas = {}
+    numeros = {numero for _tipo, _bloco, numero in chaves}
+    for id_unidade, tipo, bloco, numero in _existentes(
+            cursor, "SELECT id, tipo_unidade, bloco, numero FROM unidades WHERE numero IN ({})", numeros):
+        chave = _chave_unidade(tipo, bloco, numero)
+        if chave in chaves:
+            encontradas.setdefault(chave, id_unidade)
+    return encontradas
+
+
+def _conectar(obter_conexao):
+    conn = obter_conexao()
+    if not conn:
+        raise mysql.connector.Error("Erro de conexão com o banco de dados.")
+    return conn
+
+
+def _inserir_moradores(cursor, sql, linhas, lote, erros):
+    """executemany por lote; se um lote falhar numa UNIQUE, refaz só ele linha a linha."""
+    inseridos = 0
+    for parte in _em_lotes(linhas, lote):
+        try:
+            cursor.executemany(sql, [valores for _numero, valores in parte])
+            inseridos += len(parte)
+        except mysql.connector.IntegrityError:
+            # O InnoDB desfaz só o comando que falhou; a transação continua.
+            for numero, valores in parte:
+                try:
+                    cursor.execute(sql, valores)
+                    inseridos += 1
+                except mysql.connector.IntegrityError as e:
+                    erros.append({'linha': numero, 'erro': f"Conflito ao inserir: {e.msg}"})
+    return inseridos
+
+
+SQL_INSERIR_UNIDADE = """
+    INSERT INTO unidades (tipo_unidade, bloco, numero, andar, ocupada) VALUES (%s, %s, %s, %s, TRUE)
+"""
+SQL_INSERIR_MORADOR = """
+    INSERT INTO moradores
+        (nome_completo, email, senha_hash, unidade_id, cpf, rg, profissao, whatsapp, tipo_morador, ativo)
+    VALUES
+        (%s, %s, %s, %s, %s, %s, %s, %s, %s, TRUE)
+"""
+
+
+def importar(obter_conexao, registros, hashing_pool, lote=TAMANHO_LOTE, dry_run=False, diretorio=None):
+    """
+    Importa os registros de ler_registros(). obter_conexao() é chamada duas
+    vezes: para as verificações e, depois dos hashes, para a gravação, de modo
+    que nenhuma conexão fica presa durante o bcrypt. Com dry_run=True tudo é
+    validado e inserido, mas a transação é desfeita no fim. diretorio (um
+    diretorio_unidades.DiretorioUnidades) é usado para conferir os unidade_id
+    informados e invalidado quando unidades novas são gravadas.
+    """
+    erros = []
+    validas = []
+    emails_vistos = {}
+    cpfs_vistos = {}
+    for numero, dados in registros:
+        if isinstance(dados, str):
+            erros.append({'linha': numero, 'erro': dados})
+            continue
+        try:
+            unidade, morador = _validar(dados)
+        except ValueError as e:
+            erros.append({'linha': numero, 'erro': str(e)})
+            continue
+        if morador:
+            email = morador['email'].casefold()
+            if email in emails_vistos:
+                erros.append({'linha': numero, 'erro': f"E-mail repetido no arquivo (linha {emails_vistos[email]})."})
+                continue
+            if morador['cpf'] and morador['cpf'] in cpfs_vistos:
+                erros.append({'linha': numero, 'erro': f"CPF repetido no arquivo (linha {cpfs_vistos[morador['cpf']]})."})
+                continue
+            emails_vistos[email] = numero
+            if morador['cpf']:
+                cpfs_vistos[morador['cpf']] = numero
+        validas.append((numero, unidade, morador))
+
+    # --- Verificações no banco (consultas IN em lotes) ---
+    conn = _conectar(obter_conexao)
+    cursor = conn.cursor()
+    try:
+        moradores = [(n, m) for n, _u, m in validas if m]
+        emails_existentes = {e.casefold() for (e,) in _existentes(
+            cursor, "SELECT email FROM moradores WHERE email IN ({})", [m['email'] for _n, m in moradores])}
+        cpfs_existentes = {c for (c,) in _existentes(
+            cursor, "SELECT cpf FROM moradores WHERE cpf IN ({})", [m['cpf'] for _n, m in moradores if m['cpf']])}
+        ids_informados = {m['unidade_id'] for _n, m in moradores if m['unidade_id'] is not None}
+        if diretorio is not None:
+            ids_existentes = {i for i in ids_informados if diretorio.existe(lambda: cursor, i)}
+        else:
+            ids_existentes = {i for (i,) in _existentes(cursor, "SELECT id FROM unidades WHERE id IN ({})", ids_informados)}
+        chaves = {_chave_unidade(*u[:3]) for _n, u, _m in validas if u}
+        unidades_existentes = _ids_das_unidades(cursor, chaves) if chaves else {}
+    finally:
+        cursor.close()
+        conn.close()
+
+    aprovadas = []
+    for numero, unidade, morador in validas:
+        if morador:
+            if morador['email'].casefold() in emails_existentes:
+                erros.append({'linha': numero, 'erro': "Este e-mail já está cadastrado como morador."})
+                continue
+            if morador['cpf'] and morador['cpf'] in cpfs_existentes:
+                erros.append({'linha': numero, 'erro': "Este CPF já está cadastrado como morador."})
+                continue
+            if morador['unidade_id'] is not None and morador['unidade_id'] not in ids_existentes:
+                erros.append({'linha': numero, 'erro': "ID da unidade não encontrado ou inválido."})
+                continue
+        aprovadas.append((numero, unidade, morador))
+
+    # --- Hashes em paralelo, fora de qualquer conexão ---
+    com_morador = [(numero, morador) for numero, _u, morador in aprovadas if morador]
+    hashes = hashing_pool.gerar_hashes([m['password'] for _n, m in com_morador])
+    hash_por_linha = {numero: h for (numero, _m), h in zip(com_morador, hashes)}
+
+    # --- Gravação: uma transação, executemany em lotes ---
+    novas = {}
+    for _numero, unidade, _m in aprovadas:
+        if unidade:
+            chave = _chave_unidade(*unidade[:3])
+            if chave not in unidades_existentes and chave not in novas:
+                novas[chave] = unidade
+
+    conn = _conectar(obter_conexao)
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        for parte in _em_lotes(novas.values(), lote):
+            cursor.executemany(SQL_INSERIR_UNIDADE, parte)
+        ids_unidades = dict(unidades_existentes)
+        if novas:
+            ids_unidades.update(_ids_das_unidades(cursor, set(novas)))
+
+        linhas_moradores = []
+        for numero, unidade, morador in aprovadas:
+            if not morador:
+                continue
+            unidade_id = morador['unidade_id'] if unidade is None else ids_unidades[_chave_unidade(*unidade[:3])]
+            linhas_moradores.append((numero, (
+                morador['nome_completo'], morador['email'], hash_por_linha[numero], unidade_id,
+                morador['cpf'], morador['rg'], morador['profissao'], morador['whatsapp'], morador['tipo_morador'],
+            )))
+        inseridos = _inserir_moradores(cursor, SQL_INSERIR_MORADOR, linhas_moradores, lote, erros)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+            if diretorio is not None and novas:
+                diretorio.invalidar()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    erros.sort(key=lambda e: e['linha'])
+    logger.info("Importação%s: %s unidade(s) nova(s), %s morador(es), %s erro(s).",
+                " (simulação)" if dry_run else "", len(novas), inseridos, len(erros))
+    return {
+        'linhas': len(registros),
+        'unidades_criadas': len(novas),
+        'unidades_existentes': len(unidades_existentes),
+        'moradores_criados': inseridos,
+        'erros': erros,
+        'dry_run': dry_run,
+    }
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    from hashing import criar_hashing_pool_do_ambiente
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Importa unidades e moradores de um arquivo CSV ou NDJSON.")
+    parser.add_argument('arquivo')
+    parser.add_argument('--formato', choices=FORMATOS, help="Padrão: pela extensão do arquivo.")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE)
+    parser.add_argument('--dry-run', action='store_true', help="Valida e simula sem gravar.")
+    args = parser.parse_args()
+
+    formato = args.formato or ('csv' if args.arquivo.lower().endswith('.csv') else 'ndjson')
+    with open(args.arquivo, encoding='utf-8-sig') as arquivo:
+        registros = ler_registros(arquivo.read(), formato)
+
+    def conectar():
+        return mysql.connector.connect(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            database=os.getenv('DB_NAME'),
+            charset='utf8mb4'
+        )
+
+    pool = criar_hashing_pool_do_ambiente()
+    try:
+        resultado = importar(conectar, registros, pool, lote=args.lote, dry_run=args.dry_run)
+    finally:
+        pool.shutdown()
+    for erro in resultado['erros']:
+        print(f"Linha {erro['linha']}: {erro['erro']}")
+    print(f"-> {resultado['unidades_criadas']} unidade(s) criada(s), {resultado['moradores_criados']} morador(es) "
+          f"importado(s), {len(resultado['erros'])} linha(s) com erro{' (simulação, nada gravado)' if args.dry_run else ''}.")
+    sys.exit(1 if resultado['erros'] else 0)
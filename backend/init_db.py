@@ -1,6 +1,7 @@
 import os # Importar o módulo 'os'
 import mysql.connector
 from dotenv import load_dotenv # Importar load_dotenv para carregar variáveis de ambiente
+from migrations import aplicar_migracoes # Índices e alterações de schema versionadas
 
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -30,6 +31,7 @@ def configurar_banco_de_dados():
     Também insere o morador placeholder "Ainda Não Cadastrado".
     Adiciona a configuração utf8mb4 para a tabela 'avisos' e suas colunas.
     Cria o banco de dados 'totalville1' se ele não existir.
+    Ao final, aplica as migrações pendentes (ver migrations.py).
     """
     # Para criar o banco de dados, precisamos nos conectar ao servidor MySQL sem especificar um DB inicialmente.
     try:
@@ -121,7 +123,8 @@ def configurar_banco_de_dados():
             tipo_morador ENUM('proprietario', 'inquilino', 'outro') DEFAULT 'outro',
             ativo BOOLEAN NOT NULL DEFAULT TRUE,
             criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (unidade_id) REFERENCES unidades(id) ON DELETE SET NULL ON UPDATE CASCADE
+            FOREIGN KEY (unidade_id) REFERENCES unidades(id) ON DELETE SET NULL ON UPDATE CASCADE,
+            FULLTEXT KEY ft_moradores_nome (nome_completo)
         ) ENGINE=InnoDB;
         """)
         print("-> Tabela 'moradores' OK.")
@@ -175,8 +178,10 @@ def configurar_banco_de_dados():
             status VARCHAR(50) DEFAULT 'Pendente',
             morador_id INT,
             criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expira_em DATETIME NULL,
             FOREIGN KEY (morador_id) REFERENCES moradores(id) ON DELETE SET NULL,
-            UNIQUE KEY uk_reserva_espaco_data (nome_espaco, data_reserva)
+            UNIQUE KEY uk_reserva_espaco_data (nome_espaco, data_reserva),
+            INDEX idx_reservas_status_expira (status, expira_em)
         ) ENGINE=InnoDB;
         """)
         print("-> Tabela 'reservas' OK.")
@@ -189,8 +194,8 @@ def configurar_banco_de_dados():
             titulo VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
             conteudo TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
             imagem_url VARCHAR(2048),
-            prioridade INT DEFAULT 0,
-            data_publicacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            prioridade INT NOT NULL DEFAULT 0,
+            data_publicacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
             data_expiracao DATETIME,
             registrado_por_user_id INT,
             registrado_por_user_role VARCHAR(50),
@@ -217,7 +222,8 @@ def configurar_banco_de_dados():
             criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (morador_id) REFERENCES moradores(id) ON DELETE SET NULL,
             FOREIGN KEY (unidade_destino_id) REFERENCES unidades(id) ON DELETE CASCADE,
-            FOREIGN KEY (registrado_por_admin_id) REFERENCES administradores(id) ON DELETE SET NULL
+            FOREIGN KEY (registrado_por_admin_id) REFERENCES administradores(id) ON DELETE SET NULL,
+            FULLTEXT KEY ft_encomendas_busca (remetente, descricao)
         ) ENGINE=InnoDB;
         """)
         print("-> Tabela 'encomendas' OK.")
@@ -256,9 +262,15 @@ def configurar_banco_de_dados():
         """)
         
         conn.commit()
+
+        # Migrações versionadas: aplicam índices e alterações de schema também
+        # em bancos que já existiam antes delas.
+        print("Verificando/Aplicando migrações...")
+        aplicar_migracoes(conn)
+
         print("\n✅ Configuração do banco de dados concluída com sucesso!")
 
-    except mysql.connector.Error as e:
+    except (mysql.connector.Error, RuntimeError) as e:
         print(f"❌ Erro durante a configuração das tabelas: {e}")
         conn.rollback()
     finally:
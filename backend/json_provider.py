@@ -0,0 +1,102 @@
+import logging
+import os
+import decimal
+import datetime
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependência opcional: pip install orjson
+    orjson = None
+
+# Provedores de JSON da aplicação (app.json).
+#
+# Datas e horas saem em ISO 8601 (date -> "2025-06-30", datetime ->
+# "2025-06-30T14:05:00Z"), Decimal como string e bytes como texto UTF-8, então as
+# rotas podem passar as linhas do banco direto para o jsonify, sem laços de
+# conversão. Datetimes sem fuso (os que o MySQL devolve) são tratados como UTC,
+# como o provedor padrão do Flask já fazia ao gerar "... GMT"; sem o "Z" o
+# new Date(...) do frontend os leria no horário local do navegador. Com o orjson instalado a serialização é feita em C; sem ele, o
+# provedor da biblioteca padrão gera o mesmo JSON.
+#
+# JSON_PROVIDER=orjson|stdlib força a escolha (padrão: orjson se disponível).
+
+
+logger = logging.getLogger(__name__)
+
+
+def _converter(valor):
+    if isinstance(valor, datetime.datetime):
+        # Mesma saída do orjson com OPT_NAIVE_UTC | OPT_UTC_Z.
+        deslocamento = valor.utcoffset()
+        if deslocamento is None or not deslocamento:
+            return valor.replace(tzinfo=None).isoformat() + 'Z'
+        return valor.isoformat()
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, datetime.timedelta):
+        return str(valor)
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    if isinstance(valor, (bytes, bytearray)):
+        return valor.decode('utf-8', errors='replace')
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    raise TypeError(f"Objeto do tipo {type(valor).__name__} não é serializável em JSON")
+
+
+def registros(colunas, linhas):
+    """
+    Converte linhas de um cursor comum (tuplas) em dicionários. Mais barato que
+    um cursor dictionary=True para listas grandes. Linhas que já são dicionários
+    (cursor dictionary=True) são devolvidas como estão.
+    """
+    if linhas and isinstance(linhas[0], dict):
+        return list(linhas)
+    return [dict(zip(colunas, linha)) for linha in linhas]
+
+
+def registros_do_cursor(cursor):
+    """fetchall() do cursor já convertido por registros()."""
+    linhas = cursor.fetchall()
+    return registros(cursor.column_names, linhas)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Provedor padrão do Flask com datas em ISO 8601 (o padrão do Flask é RFC 822)."""
+
+    @staticmethod
+    def default(o):
+        try:
+            return _converter(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(JSONProvider):
+    """Provedor baseado no orjson. Saída compacta; chaves não-string são aceitas."""
+
+    opcoes = (orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=_converter, option=self.opcoes)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype='application/json')
+
+
+def escolher_provider():
+    nome = os.getenv('JSON_PROVIDER', 'orjson' if orjson else 'stdlib').lower()
+    if nome == 'orjson':
+        if orjson is None:
+            logger.warning("JSON_PROVIDER=orjson, mas o orjson não está instalado. Usando a biblioteca padrão.")
+            return StdlibJSONProvider
+        return OrjsonProvider
+    return StdlibJSONProvider
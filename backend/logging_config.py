@@ -0,0 +1,149 @@
+import os
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import datetime
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+# Logging estruturado e não bloqueante.
+#
+# As threads das requisições só colocam o registro numa fila em memória
+# (put_nowait); uma thread do QueueListener formata e escreve no stdout. Se a
+# fila encher (stdout travado por back-pressure do container), os registros
+# excedentes são descartados e contados, em vez de bloquear a requisição.
+#
+# Variáveis de ambiente:
+#   LOG_LEVEL           nível raiz (padrão INFO)
+#   LOG_LEVELS          níveis por módulo, ex.: "webhook_queue=DEBUG,pagamentos=WARNING"
+#   LOG_FORMAT          json (padrão) ou texto
+#   LOG_DEBUG_SAMPLE    fração das linhas DEBUG mantidas (0.0 a 1.0, padrão 1.0)
+#   LOG_QUEUE_SIZE      tamanho máximo da fila (padrão 10000)
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Atributos padrão do LogRecord; o resto veio de extra={...} e vai para o JSON.
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'request_id'}
+
+_listener = None
+
+
+def novo_request_id():
+    return uuid.uuid4().hex
+
+
+class RequestIdFilter(logging.Filter):
+    """Anexa o ID da requisição atual (ou None fora de requisições) a cada registro."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Mantém só uma fração das linhas DEBUG; níveis acima passam sempre."""
+
+    def __init__(self, taxa):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.taxa >= 1:
+            return True
+        return random.random() < self.taxa
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        dados = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            dados['request_id'] = record.request_id
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith('_'):
+                dados[chave] = valor
+        if record.exc_info:
+            dados['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados['exc'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class TextoFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = None
+        return super().format(record)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def prepare(self, record):
+        # Resolve a mensagem e a exceção aqui (na thread da requisição) para que o
+        # registro possa cruzar a fila, mas deixa a formatação para o listener.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _niveis_por_modulo(texto):
+    niveis = {}
+    for par in (texto or '').split(','):
+        if '=' in par:
+            nome, nivel = par.split('=', 1)
+            niveis[nome.strip()] = nivel.strip().upper()
+    return niveis
+
+
+def configurar_logging():
+    """Configura o logging do processo (idempotente). Retorna o handler da fila."""
+    global _listener
+    raiz = logging.getLogger()
+    for handler in raiz.handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            return handler
+
+    formatter = TextoFormatter() if os.getenv('LOG_FORMAT', 'json').lower() == 'texto' else JsonFormatter()
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(formatter)
+
+    fila = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    handler = NonBlockingQueueHandler(fila)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(DebugSamplingFilter(float(os.getenv('LOG_DEBUG_SAMPLE', 1.0))))
+
+    raiz.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    raiz.addHandler(handler)
+    for nome, nivel in _niveis_por_modulo(os.getenv('LOG_LEVELS')).items():
+        logging.getLogger(nome).setLevel(nivel)
+
+    _listener = QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return handler
@@ -0,0 +1,254 @@
+import os
+import time
+import logging
+import ipaddress
+import bisect
+import threading
+import contextvars
+from flask import request, g
+
+# Métricas no formato de texto do Prometheus (exposto em /metrics).
+#
+# Implementação mínima (contadores e histogramas com rótulos), sem dependência
+# externa. Com METRICS_ENABLED=0 nada é registrado: os hooks do Flask, o cursor
+# instrumentado do pool e a medição do bcrypt simplesmente não são instalados.
+#
+# Acesso a /metrics: com METRICS_TOKEN definido, exige
+# "Authorization: Bearer <METRICS_TOKEN>" de qualquer origem; sem ele, só
+# aceita loopback e as redes listadas em METRICS_REDES_PERMITIDAS (CIDRs
+# separados por vírgula, ex.: "10.0.5.0/24,fd00::/8"), já que a saída expõe
+# rotas, estado do pool e impressões digitais das consultas. Redes privadas não
+# são confiáveis por padrão: com a porta publicada pelo Docker, todo cliente
+# externo chega ao Flask pelo gateway da bridge (172.17.0.1, por exemplo).
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+BUCKETS_QUANTIDADE = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Rota da requisição atual (ou 'background' nas threads de trabalho) e os
+# totais da requisição, para rotular as métricas do banco.
+endpoint_atual = contextvars.ContextVar('endpoint_atual', default='background')
+totais_requisicao = contextvars.ContextVar('totais_requisicao', default=None)
+
+logger = logging.getLogger(__name__)
+
+
+def metricas_habilitadas():
+    return os.getenv('METRICS_ENABLED', '1').strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+
+def redes_permitidas(valor=None):
+    """Redes de METRICS_REDES_PERMITIDAS (ou de `valor`); entradas inválidas são ignoradas."""
+    if valor is None:
+        valor = os.getenv('METRICS_REDES_PERMITIDAS', '')
+    redes = []
+    for item in valor.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            redes.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("METRICS_REDES_PERMITIDAS: rede inválida ignorada: %r", item)
+    return redes
+
+
+def endereco_permitido(endereco, redes=()):
+    """True se o endereço é de loopback ou está em uma das redes (IPv4, IPv6 ou IPv4 mapeado)."""
+    try:
+        ip = ipaddress.ip_address((endereco or '').split('%', 1)[0])
+    except ValueError:
+        return False
+    if getattr(ip, 'ipv4_mapped', None):
+        ip = ip.ipv4_mapped
+    return ip.is_loopback or any(ip in rede for rede in redes)
+
+
+def instalar_contexto_endpoint(app):
+    """
+    Preenche endpoint_atual com a regra da rota durante cada requisição. Usado
+    pelas métricas e pelo observador de consultas (consultas_lentas.py).
+    """
+
+    @app.before_request
+    def _definir_endpoint():
+        g.endpoint_token = endpoint_atual.set(request.url_rule.rule if request.url_rule else 'nao_encontrado')
+
+    @app.teardown_request
+    def _limpar_endpoint(exc):
+        token = g.pop('endpoint_token', None)
+        if token is not None:
+            endpoint_atual.reset(token)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _rotulos(nomes, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Counter:
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores_rotulos, valor=1):
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + valor
+
+    def render(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            itens = sorted(self._valores.items())
+        for valores, total in itens:
+            linhas.append(f"{self.nome}{_rotulos(self.rotulos, valores)} {_numero(total)}")
+        return linhas
+
+
+class Histogram:
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # rótulos -> [contagens por bucket (+Inf no fim), soma]
+        self._lock = threading.Lock()
+
+    def observe(self, valor, *valores_rotulos):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def render(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            itens = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        for valores, (contagens, soma) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                acumulado += contagem
+                le = f'le="{_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, valores, le)} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, valores)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, valores)} {acumulado}")
+        return linhas
+
+
+class Registry:
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def counter(self, *args, **kwargs):
+        metrica = Counter(*args, **kwargs)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histogram(self, *args, **kwargs):
+        metrica = Histogram(*args, **kwargs)
+        self._metricas.append(metrica)
+        return metrica
+
+    def adicionar_coletor(self, funcao):
+        """funcao() devolve [(nome, ajuda, valor)] lidos na hora do scrape (gauges)."""
+        self._coletores.append(funcao)
+
+    def render(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.render())
+        for coletor in self._coletores:
+            for nome, ajuda, valor in coletor():
+                linhas.extend([f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge", f"{nome} {_numero(valor)}"])
+        return "\n".join(linhas) + "\n"
+
+
+class MetricasApp:
+    """Métricas da aplicação. Serve de observador do pool de conexões e do pool de bcrypt."""
+
+    def __init__(self):
+        self.registry = Registry()
+        r = self.registry
+        self.http_latencia = r.histogram(
+            'http_request_duration_seconds', 'Latência das requisições HTTP.',
+            ('endpoint', 'method', 'status'))
+        self.db_tempo = r.histogram(
+            'db_query_duration_seconds', 'Tempo dentro de cursor.execute/executemany.',
+            ('endpoint',), BUCKETS_CONSULTA)
+        self.db_consultas = r.counter(
+            'db_queries_total', 'Consultas SQL executadas.', ('endpoint',))
+        self.db_linhas = r.counter(
+            'db_rows_fetched_total', 'Linhas lidas dos cursores.', ('endpoint',))
+        self.db_consultas_por_requisicao = r.histogram(
+            'db_queries_per_request', 'Consultas SQL por requisição.', ('endpoint',), BUCKETS_QUANTIDADE)
+        self.db_tempo_por_requisicao = r.histogram(
+            'db_time_per_request_seconds', 'Tempo total no banco por requisição.', ('endpoint',))
+        self.pool_espera = r.histogram(
+            'db_pool_acquire_seconds', 'Espera para obter uma conexão do pool.', (), BUCKETS_CONSULTA)
+        self.bcrypt_tempo = r.histogram(
+            'bcrypt_duration_seconds', 'Duração das operações de bcrypt (incluindo fila).', ('operacao',))
+
+    # --- observador do pool de conexões (db_pool.ConnectionPool) ---
+    def conexao_adquirida(self, segundos):
+        self.pool_espera.observe(segundos)
+
+    def consulta_executada(self, sql, params, segundos):
+        endpoint = endpoint_atual.get()
+        self.db_tempo.observe(segundos, endpoint)
+        self.db_consultas.inc(endpoint)
+        totais = totais_requisicao.get()
+        if totais is not None:
+            totais[0] += 1
+            totais[1] += segundos
+
+    def linhas_lidas(self, quantidade):
+        self.db_linhas.inc(endpoint_atual.get(), valor=quantidade)
+
+    # --- observador do HashingPool ---
+    def hash_concluido(self, operacao, segundos):
+        self.bcrypt_tempo.observe(segundos, operacao)
+
+    def instalar(self, app):
+        """Registra os hooks de requisição no Flask."""
+        instalar_contexto_endpoint(app)
+
+        @app.before_request
+        def _metricas_inicio():
+            g.metricas_inicio = time.perf_counter()
+            g.metricas_token = totais_requisicao.set([0, 0.0])
+
+        @app.after_request
+        def _metricas_fim(response):
+            inicio = g.pop('metricas_inicio', None)
+            if inicio is not None:
+                endpoint = endpoint_atual.get()
+                self.http_latencia.observe(time.perf_counter() - inicio, endpoint, request.method, response.status_code)
+                totais = totais_requisicao.get()
+                if totais is not None:
+                    self.db_consultas_por_requisicao.observe(totais[0], endpoint)
+                    self.db_tempo_por_requisicao.observe(totais[1], endpoint)
+            return response
+
+        @app.teardown_request
+        def _metricas_limpar(exc):
+            token = g.pop('metricas_token', None)
+            if token is not None:
+                totais_requisicao.reset(token)
@@ -0,0 +1,230 @@
+import os
+import mysql.connector
+from dotenv import load_dotenv
+
+# Executor de migrações versionadas do banco.
+#
+# O init_db.py só usa CREATE TABLE IF NOT EXISTS, então bancos já existentes
+# nunca recebiam índices ou colunas novas. Cada migração abaixo tem um número de
+# versão; as aplicadas ficam registradas na tabela schema_migrations e as demais
+# são executadas em ordem. Os passos também verificam o information_schema antes
+# de alterar algo, então rodar de novo (ou após uma falha no meio) é seguro.
+
+load_dotenv()
+
+NOME_LOCK = 'totalville_migracoes'
+
+
+def indice_existe(cursor, tabela, nome_indice):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (tabela, nome_indice))
+    return cursor.fetchone()[0] > 0
+
+
+def coluna_existe(cursor, tabela, coluna):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (tabela, coluna))
+    return cursor.fetchone()[0] > 0
+
+
+def garantir_indice(cursor, tabela, nome_indice, definicao):
+    """
+    Cria o índice apenas se ele ainda não existir (o MySQL não tem CREATE INDEX IF NOT EXISTS).
+    """
+    if not indice_existe(cursor, tabela, nome_indice):
+        cursor.execute(f"ALTER TABLE {tabela} ADD {definicao}")
+        print(f"   Índice '{nome_indice}' criado em '{tabela}'.")
+
+
+def garantir_coluna(cursor, tabela, coluna, definicao):
+    if not coluna_existe(cursor, tabela, coluna):
+        cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+        print(f"   Coluna '{coluna}' criada em '{tabela}'.")
+
+
+# --- MIGRAÇÕES ---
+
+def _m001_indices_fulltext_busca(cursor):
+    garantir_indice(cursor, 'moradores', 'ft_moradores_nome',
+                    "FULLTEXT INDEX ft_moradores_nome (nome_completo)")
+    garantir_indice(cursor, 'encomendas', 'ft_encomendas_busca',
+                    "FULLTEXT INDEX ft_encomendas_busca (remetente, descricao)")
+
+
+def _m002_indices_consultas_frequentes(cursor):
+    # get_my_visitors: WHERE morador_id = ? ORDER BY data_liberacao DESC
+    garantir_indice(cursor, 'visitantes', 'idx_visitantes_morador_data',
+                    "INDEX idx_visitantes_morador_data (morador_id, data_liberacao)")
+    # get_booked_dates: WHERE nome_espaco = ? AND status = 'Aprovada' (cobre data_reserva)
+    garantir_indice(cursor, 'reservas', 'idx_reservas_espaco_status_data',
+                    "INDEX idx_reservas_espaco_status_data (nome_espaco, status, data_reserva)")
+    # get_my_reservations: WHERE morador_id = ? ORDER BY data_reserva DESC
+    garantir_indice(cursor, 'reservas', 'idx_reservas_morador_data',
+                    "INDEX idx_reservas_morador_data (morador_id, data_reserva)")
+    # get_my_encomendas: WHERE morador_id = ? ORDER BY data_chegada DESC
+    garantir_indice(cursor, 'encomendas', 'idx_encomendas_morador_chegada',
+                    "INDEX idx_encomendas_morador_chegada (morador_id, data_chegada)")
+    # get_encomendas: ORDER BY data_chegada DESC, status ASC, id DESC (paginação por cursor)
+    garantir_indice(cursor, 'encomendas', 'idx_encomendas_chegada_status',
+                    "INDEX idx_encomendas_chegada_status (data_chegada, status, id)")
+    # get_occurrences_summary: WHERE status = 'Aberto' GROUP BY tipo_ocorrencia
+    garantir_indice(cursor, 'ocorrencias', 'idx_ocorrencias_status_tipo',
+                    "INDEX idx_ocorrencias_status_tipo (status, tipo_ocorrencia)")
+    # get_all_avisos: WHERE ativo = TRUE ORDER BY prioridade DESC, data_publicacao DESC
+    garantir_indice(cursor, 'avisos', 'idx_avisos_ativo_prioridade_publicacao',
+                    "INDEX idx_avisos_ativo_prioridade_publicacao (ativo, prioridade, data_publicacao)")
+    # get_moradores: ORDER BY nome_completo ASC, id ASC (paginação por cursor)
+    garantir_indice(cursor, 'moradores', 'idx_moradores_nome',
+                    "INDEX idx_moradores_nome (nome_completo, id)")
+
+
+def _m003_fila_webhooks(cursor):
+    # Fila durável das notificações do Mercado Pago (ver webhook_queue.py).
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS webhook_jobs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        payment_id VARCHAR(64) NOT NULL,
+        status ENUM('pendente', 'processando', 'concluido', 'falhou') NOT NULL DEFAULT 'pendente',
+        tentativas INT NOT NULL DEFAULT 0,
+        reprocessar BOOLEAN NOT NULL DEFAULT FALSE,
+        proxima_tentativa DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        ultimo_erro TEXT,
+        criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY uk_webhook_jobs_payment (payment_id),
+        INDEX idx_webhook_jobs_fila (status, proxima_tentativa)
+    ) ENGINE=InnoDB;
+    """)
+
+
+def _m004_trava_de_reservas(cursor):
+    # Reservas 'Pendente' passam a ter validade (ver reservas_pendentes.py).
+    garantir_coluna(cursor, 'reservas', 'expira_em', "DATETIME NULL")
+    garantir_indice(cursor, 'reservas', 'idx_reservas_status_expira',
+                    "INDEX idx_reservas_status_expira (status, expira_em)")
+
+
+def _m005_resumo_ocorrencias(cursor):
+    # Contadores por (tipo, status) mantidos pelas rotas (ver ocorrencias_resumo.py).
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ocorrencias_resumo (
+        tipo_ocorrencia VARCHAR(255) NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        total INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (tipo_ocorrencia, status)
+    ) ENGINE=InnoDB;
+    """)
+    # O CREATE TABLE encerra a transação anterior; daqui até o commit do executor
+    # tudo roda em uma só. add_occurrence grava em ocorrencias e depois nos
+    # contadores; travando as duas tabelas nessa mesma ordem, uma
+    # escrita concorrente ou já terminou (e entra na contagem) ou espera o fim da
+    # carga (e soma o seu delta por cima), sem contar em dobro nem se perder.
+    cursor.execute("SELECT id FROM ocorrencias FOR UPDATE")
+    cursor.fetchall()
+    cursor.execute("SELECT tipo_ocorrencia FROM ocorrencias_resumo FOR UPDATE")
+    cursor.fetchall()
+    cursor.execute("DELETE FROM ocorrencias_resumo")
+    cursor.execute("""
+        INSERT INTO ocorrencias_resumo (tipo_ocorrencia, status, total)
+        SELECT tipo_ocorrencia, COALESCE(status, 'Aberto'), COUNT(*)
+        FROM ocorrencias
+        GROUP BY tipo_ocorrencia, COALESCE(status, 'Aberto')
+    """)
+
+
+def _m006_avisos_ordenacao_not_null(cursor):
+    # prioridade e data_publicacao são chaves do cursor de GET /api/avisos; com
+    # NULL, "col < %s" e "col = %s" nunca são verdadeiros e a linha sumia da
+    # paginação. Preenche os nulos e passa as colunas a NOT NULL.
+    cursor.execute("UPDATE avisos SET prioridade = 0 WHERE prioridade IS NULL")
+    cursor.execute("""
+        UPDATE avisos SET data_publicacao = COALESCE(criado_em, NOW())
+        WHERE data_publicacao IS NULL
+    """)
+    cursor.execute("""
+        ALTER TABLE avisos
+            MODIFY prioridade INT NOT NULL DEFAULT 0,
+            MODIFY data_publicacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    """)
+
+
+# (versão, descrição, função). Nunca altere ou reordene migrações já publicadas;
+# acrescente sempre uma nova versão no final.
+MIGRACOES = [
+    (1, 'Índices FULLTEXT da busca de encomendas', _m001_indices_fulltext_busca),
+    (2, 'Índices das consultas frequentes (WHERE/ORDER BY)', _m002_indices_consultas_frequentes),
+    (3, 'Fila durável de webhooks do Mercado Pago', _m003_fila_webhooks),
+    (4, 'Validade das reservas pendentes (expira_em)', _m004_trava_de_reservas),
+    (5, 'Contadores pré-agregados de ocorrências', _m005_resumo_ocorrencias),
+    (6, 'Colunas de ordenação dos avisos NOT NULL', _m006_avisos_ordenacao_not_null),
+]
+
+
+def _garantir_tabela_migracoes(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        versao INT PRIMARY KEY,
+        descricao VARCHAR(255) NOT NULL,
+        aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB;
+    """)
+
+
+def versoes_aplicadas(cursor):
+    _garantir_tabela_migracoes(cursor)
+    cursor.execute("SELECT versao FROM schema_migrations")
+    return {linha[0] for linha in cursor.fetchall()}
+
+
+def aplicar_migracoes(conn):
+    """
+    Aplica, em ordem, as migrações ainda não registradas em schema_migrations.
+    Usa GET_LOCK para que dois processos não migrem o mesmo banco ao mesmo tempo.
+    Retorna a lista de versões aplicadas nesta execução.
+    """
+    cursor = conn.cursor()
+    aplicadas_agora = []
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (NOME_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Não foi possível obter o lock de migrações (outro processo migrando?).")
+        try:
+            ja_aplicadas = versoes_aplicadas(cursor)
+            for versao, descricao, funcao in MIGRACOES:
+                if versao in ja_aplicadas:
+                    continue
+                print(f"Aplicando migração {versao:03d}: {descricao}...")
+                funcao(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (versao, descricao) VALUES (%s, %s)",
+                    (versao, descricao)
+                )
+                conn.commit()
+                aplicadas_agora.append(versao)
+                print(f"-> Migração {versao:03d} OK.")
+            if not aplicadas_agora:
+                print("-> Nenhuma migração pendente.")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (NOME_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+    return aplicadas_agora
+
+
+if __name__ == '__main__':
+    conn = mysql.connector.connect(
+        host=os.getenv('DB_HOST'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        database=os.getenv('DB_NAME'),
+        charset='utf8mb4'
+    )
+    try:
+        aplicar_migracoes(conn)
+    finally:
+        conn.close()
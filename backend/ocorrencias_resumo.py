@@ -0,0 +1,87 @@
+import os
+import mysql.connector
+from dotenv import load_dotenv
+
+# Contadores pré-agregados de ocorrências por (tipo, status).
+#
+# O resumo do dashboard lia todas as ocorrências abertas com GROUP BY a cada
+# carregamento. Agora a tabela ocorrencias_resumo é mantida na mesma transação
+# que altera a tabela ocorrencias, e o resumo lê uma linha por tipo.
+# reconciliar() confere os contadores com a tabela base e corrige divergências
+# (rodar periodicamente: python ocorrencias_resumo.py).
+
+SQL_AJUSTAR = """
+    INSERT INTO ocorrencias_resumo (tipo_ocorrencia, status, total)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+"""
+
+
+def registrar_nova(cursor, tipo_ocorrencia, status='Aberto'):
+    """Chamar na mesma transação do INSERT em ocorrencias."""
+    cursor.execute(SQL_AJUSTAR, (tipo_ocorrencia, status, 1))
+
+
+def registrar_mudanca_status(cursor, tipo_ocorrencia, status_antigo, status_novo):
+    """Chamar na mesma transação do UPDATE de status em ocorrencias."""
+    if status_antigo == status_novo:
+        return
+    cursor.execute(SQL_AJUSTAR, (tipo_ocorrencia, status_antigo, -1))
+    cursor.execute(SQL_AJUSTAR, (tipo_ocorrencia, status_novo, 1))
+
+
+def reconciliar(conn, corrigir=True):
+    """
+    Compara os contadores com um GROUP BY na tabela ocorrencias e devolve a lista
+    de divergências. Os contadores são travados (FOR UPDATE) antes da contagem,
+    então inserções concorrentes esperam e não se perdem na correção.
+    """
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute("SELECT tipo_ocorrencia, status, total FROM ocorrencias_resumo FOR UPDATE")
+        contadores = {(tipo, status): total for tipo, status, total in cursor.fetchall()}
+        cursor.execute("""
+            SELECT tipo_ocorrencia, COALESCE(status, 'Aberto') AS st, COUNT(*)
+            FROM ocorrencias
+            GROUP BY tipo_ocorrencia, st
+        """)
+        reais = {(tipo, status): total for tipo, status, total in cursor.fetchall()}
+
+        divergencias = []
+        for chave in set(contadores) | set(reais):
+            esperado = reais.get(chave, 0)
+            atual = contadores.get(chave, 0)
+            if esperado != atual:
+                divergencias.append({
+                    'tipo_ocorrencia': chave[0], 'status': chave[1],
+                    'contador': atual, 'real': esperado,
+                })
+                if corrigir:
+                    cursor.execute(SQL_AJUSTAR, (chave[0], chave[1], esperado - atual))
+        conn.commit()
+        return divergencias
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    conn = mysql.connector.connect(
+        host=os.getenv('DB_HOST'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        database=os.getenv('DB_NAME'),
+        charset='utf8mb4'
+    )
+    try:
+        divergencias = reconciliar(conn)
+        for d in divergencias:
+            print(f"Corrigido: {d['tipo_ocorrencia']} / {d['status']}: {d['contador']} -> {d['real']}")
+        if not divergencias:
+            print("-> Contadores de ocorrências conferem com a tabela base.")
+    finally:
+        conn.close()
@@ -0,0 +1,464 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import mercadopago
+from mercadopago.config import RequestOptions
+from mercadopago.http import HttpClient
+
+try:
+    import httpx
+except ImportError:  # dependência opcional do modo ASGI: pip install httpx
+    httpx = None
+
+# Cliente de saída para o Mercado Pago.
+#
+# O SDK oficial abre uma requests.Session nova a cada chamada (sem keep-alive),
+# usa timeout de 60 s e faz até 3 retentativas sem jitter. Aqui o SDK recebe um
+# HttpClient com sessões persistentes por thread, e o MercadoPagoGateway controla
+# timeout por chamada, retentativas com jitter, circuit breaker e métricas.
+# FakeMercadoPagoGateway tem a mesma interface e não acessa a rede.
+#
+# No modo ASGI (asgi.py) as chamadas saem por AsyncMercadoPagoGateway, que fala
+# direto com a API REST via httpx.AsyncClient: a espera pelo Mercado Pago não
+# prende uma thread, e circuito e métricas são os mesmos do gateway síncrono.
+
+
+class GatewayIndisponivelError(Exception):
+    """O Mercado Pago não respondeu a tempo, falhou repetidamente ou o circuito está aberto."""
+    pass
+
+
+class PooledHttpClient(HttpClient):
+    """HttpClient do SDK com sessões HTTP keep-alive reutilizadas (uma por thread)."""
+
+    def __init__(self, pool_maxsize=10):
+        self.pool_maxsize = pool_maxsize
+        self._local = threading.local()
+
+    def _sessao(self):
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = requests.Session()
+            # Retentativas ficam a cargo do gateway (com jitter e circuit breaker).
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+            sessao.mount("https://", adaptador)
+            sessao.mount("http://", adaptador)
+            self._local.sessao = sessao
+        return sessao
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        api_result = self._sessao().request(method, url, **kwargs)
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError:
+                response["response"] = None
+        return response
+
+
+class CircuitBreaker:
+    """
+    Depois de `limite_falhas` falhas seguidas o circuito abre e as chamadas são
+    recusadas na hora por `tempo_aberto` segundos. Passado esse tempo, uma chamada
+    de teste é liberada (meio-aberto): sucesso fecha o circuito, falha reabre.
+    """
+
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio_aberto'
+
+    def __init__(self, limite_falhas=5, tempo_aberto=30):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self._lock = threading.Lock()
+        self._estado = self.FECHADO
+        self._falhas = 0
+        self._aberto_em = 0
+        self._teste_em_andamento = False
+
+    @property
+    def estado(self):
+        with self._lock:
+            return self._estado
+
+    def permitir(self):
+        with self._lock:
+            if self._estado == self.FECHADO:
+                return True
+            if self._estado == self.ABERTO and time.monotonic() - self._aberto_em >= self.tempo_aberto:
+                self._estado = self.MEIO_ABERTO
+                self._teste_em_andamento = False
+            if self._estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._estado = self.FECHADO
+            self._falhas = 0
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            if self._estado == self.MEIO_ABERTO or self._falhas >= self.limite_falhas:
+                self._estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+            self._teste_em_andamento = False
+
+
+class MetricasGateway:
+    LIMITES_LATENCIA = (0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operacoes = {}
+
+    def registrar(self, operacao, duracao, resultado):
+        with self._lock:
+            dados = self._operacoes.setdefault(operacao, {
+                'chamadas': 0, 'sucessos': 0, 'falhas': 0, 'retentativas': 0,
+                'recusadas_circuito': 0, 'latencia_total': 0.0, 'latencia_max': 0.0,
+                'buckets': {str(l): 0 for l in self.LIMITES_LATENCIA + ('+Inf',)},
+            })
+            if resultado == 'recusada_circuito':
+                dados['recusadas_circuito'] += 1
+                return
+            if resultado == 'retentativa':
+                dados['retentativas'] += 1
+            dados['chamadas'] += 1
+            dados['sucessos' if resultado == 'sucesso' else 'falhas'] += 1
+            dados['latencia_total'] += duracao
+            dados['latencia_max'] = max(dados['latencia_max'], duracao)
+            for limite in self.LIMITES_LATENCIA:
+                if duracao <= limite:
+                    dados['buckets'][str(limite)] += 1
+            dados['buckets']['+Inf'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {op: {k: (dict(v) if isinstance(v, dict) else v) for k, v in dados.items()}
+                    for op, dados in self._operacoes.items()}
+
+
+def _falha_transitoria(resposta):
+    return resposta.get("status") in (429, 500, 502, 503, 504)
+
+
+class MercadoPagoGateway:
+    """
+    Envolve o SDK do Mercado Pago. Os métodos devolvem o mesmo dicionário do SDK
+    ({"status": ..., "response": ...}) ou levantam GatewayIndisponivelError.
+    """
+
+    def __init__(self, access_token, timeout=8.0, max_tentativas=3, backoff_base=0.3,
+                 pool_maxsize=10, limite_falhas=5, tempo_aberto=30):
+        self.access_token = access_token
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.sdk = mercadopago.SDK(access_token, http_client=PooledHttpClient(pool_maxsize))
+        self.circuito = CircuitBreaker(limite_falhas, tempo_aberto)
+        self.metricas = MetricasGateway()
+
+    def _opcoes(self, timeout, idempotency_key=None):
+        opcoes = RequestOptions(
+            access_token=self.access_token,
+            connection_timeout=float(timeout or self.timeout),
+            max_retries=0,
+        )
+        if idempotency_key:
+            opcoes.custom_headers = {'x-idempotency-key': idempotency_key}
+        return opcoes
+
+    def _chamar(self, operacao, funcao, timeout, prazo_total):
+        """
+        Executa funcao(timeout_da_tentativa) com retentativas, respeitando o
+        circuito e o prazo total (segundos): nenhuma tentativa espera mais que o
+        que resta do prazo, e não há nova tentativa depois que ele acaba.
+        """
+        inicio_total = time.monotonic()
+        ultimo_erro = None
+        for tentativa in range(1, self.max_tentativas + 1):
+            restante = prazo_total - (time.monotonic() - inicio_total)
+            if restante <= 0:
+                break
+            if not self.circuito.permitir():
+                self.metricas.registrar(operacao, 0, 'recusada_circuito')
+                raise GatewayIndisponivelError("Mercado Pago temporariamente indisponível (circuito aberto).")
+
+            inicio = time.monotonic()
+            try:
+                resposta = funcao(min(timeout, restante))
+                if not _falha_transitoria(resposta):
+                    self.circuito.registrar_sucesso()
+                    self.metricas.registrar(operacao, time.monotonic() - inicio, 'sucesso')
+                    return resposta
+                ultimo_erro = f"HTTP {resposta.get('status')}"
+            except requests.RequestException as e:
+                ultimo_erro = str(e)
+            except BaseException:
+                # Erro inesperado (resposta ilegível, bug no SDK...): conta como
+                # falha para não deixar presa a chamada de teste do meio-aberto.
+                self.circuito.registrar_falha()
+                self.metricas.registrar(operacao, time.monotonic() - inicio, 'falha')
+                raise
+
+            self.circuito.registrar_falha()
+            ultima = tentativa == self.max_tentativas
+            self.metricas.registrar(operacao, time.monotonic() - inicio, 'falha' if ultima else 'retentativa')
+            if ultima:
+                break
+            # Backoff exponencial com "full jitter", sem estourar o prazo total.
+            espera = random.uniform(0, self.backoff_base * (2 ** (tentativa - 1)))
+            if time.monotonic() - inicio_total + espera >= prazo_total:
+                break
+            time.sleep(espera)
+
+        raise GatewayIndisponivelError(f"Falha ao chamar o Mercado Pago ({operacao}): {ultimo_erro}")
+
+    def _prazos(self, timeout, prazo_total):
+        """(timeout por tentativa, prazo total). Sem prazo_total, cabem todas as tentativas."""
+        timeout = timeout or self.timeout
+        return timeout, prazo_total or timeout * self.max_tentativas
+
+    def criar_pagamento(self, payment_data, idempotency_key=None, timeout=None, prazo_total=None):
+        # A chave de idempotência torna seguro repetir a criação: o Mercado Pago
+        # devolve o mesmo pagamento em vez de gerar outra cobrança.
+        chave = idempotency_key or str(uuid.uuid4())
+        timeout, prazo = self._prazos(timeout, prazo_total)
+        return self._chamar(
+            'criar_pagamento',
+            lambda t: self.sdk.payment().create(payment_data, self._opcoes(t, chave)),
+            timeout, prazo)
+
+    def obter_pagamento(self, payment_id, timeout=None, prazo_total=None):
+        timeout, prazo = self._prazos(timeout, prazo_total)
+        return self._chamar(
+            'obter_pagamento', lambda t: self.sdk.payment().get(payment_id, self._opcoes(t)), timeout, prazo)
+
+    def stats(self):
+        return {'tipo': 'mercadopago', 'circuito': self.circuito.estado, 'operacoes': self.metricas.snapshot()}
+
+
+class FakeMercadoPagoGateway:
+    """
+    Gateway local para testes e desenvolvimento: guarda os pagamentos em memória.
+    Pagamentos nascem 'pending'; use aprovar(payment_id) para simular a aprovação,
+    ou status_inicial='approved' para aprovar tudo automaticamente.
+    """
+
+    def __init__(self, status_inicial='pending', latencia=0.0):
+        self.status_inicial = status_inicial
+        self.latencia = latencia
+        self._lock = threading.Lock()
+        self._pagamentos = {}
+        self._proximo_id = 1000
+        self._chaves = {}
+        self.metricas = MetricasGateway()
+
+    def criar_pagamento(self, payment_data, idempotency_key=None, timeout=None, prazo_total=None):
+        inicio = time.monotonic()
+        if self.latencia:
+            time.sleep(self.latencia)
+        return self._registrar(payment_data, idempotency_key, inicio)
+
+    def _registrar(self, payment_data, idempotency_key, inicio):
+        with self._lock:
+            if idempotency_key and idempotency_key in self._chaves:
+                pagamento = self._pagamentos[self._chaves[idempotency_key]]
+            else:
+                self._proximo_id += 1
+                pagamento = {
+                    "id": self._proximo_id,
+                    "status": self.status_inicial,
+                    "transaction_amount": payment_data.get("transaction_amount"),
+                    "description": payment_data.get("description"),
+                    "external_reference": payment_data.get("external_reference"),
+                    "point_of_interaction": {
+                        "transaction_data": {
+                            "qr_code_base64": "RkFLRS1RUi1DT0RF",
+                            "qr_code": f"00020126FAKEPIX{self._proximo_id}",
+                        }
+                    },
+                }
+                self._pagamentos[pagamento["id"]] = pagamento
+                if idempotency_key:
+                    self._chaves[idempotency_key] = pagamento["id"]
+        self.metricas.registrar('criar_pagamento', time.monotonic() - inicio, 'sucesso')
+        return {"status": 201, "response": dict(pagamento)}
+
+    def obter_pagamento(self, payment_id, timeout=None, prazo_total=None):
+        inicio = time.monotonic()
+        with self._lock:
+            pagamento = self._pagamentos.get(int(payment_id))
+        self.metricas.registrar('obter_pagamento', time.monotonic() - inicio, 'sucesso')
+        if not pagamento:
+            return {"status": 404, "response": {"message": "Payment not found"}}
+        return {"status": 200, "response": dict(pagamento)}
+
+    def aprovar(self, payment_id):
+        with self._lock:
+            self._pagamentos[int(payment_id)]["status"] = "approved"
+
+    def stats(self):
+        return {'tipo': 'fake', 'circuito': CircuitBreaker.FECHADO, 'operacoes': self.metricas.snapshot()}
+
+
+class AsyncMercadoPagoGateway:
+    """
+    Versão assíncrona do MercadoPagoGateway, sem o SDK: mesmas rotas REST, mesmo
+    formato de retorno ({"status": ..., "response": ...}), mesmas retentativas
+    com jitter e o mesmo GatewayIndisponivelError. circuito e metricas podem ser
+    compartilhados com o gateway síncrono do mesmo processo.
+    """
+
+    URL_BASE = "https://api.mercadopago.com"
+
+    def __init__(self, access_token, timeout=8.0, max_tentativas=3, backoff_base=0.3,
+                 pool_maxsize=10, circuito=None, metricas=None, limite_falhas=5, tempo_aberto=30):
+        if httpx is None:
+            raise RuntimeError("O modo assíncrono do gateway precisa do httpx (pip install httpx).")
+        self.access_token = access_token
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.circuito = circuito or CircuitBreaker(limite_falhas, tempo_aberto)
+        self.metricas = metricas or MetricasGateway()
+        self._cliente = httpx.AsyncClient(
+            base_url=self.URL_BASE,
+            headers={'Authorization': f"Bearer {access_token}"},
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+
+    async def _requisitar(self, metodo, caminho, timeout, **kwargs):
+        resposta = await self._cliente.request(metodo, caminho, timeout=float(timeout), **kwargs)
+        resultado = {"status": resposta.status_code, "response": None}
+        if resposta.status_code != 204 and resposta.content:
+            try:
+                resultado["response"] = resposta.json()
+            except ValueError:
+                resultado["response"] = None
+        return resultado
+
+    _prazos = MercadoPagoGateway._prazos
+
+    async def _chamar(self, operacao, funcao, timeout, prazo_total):
+        """Mesmo laço de MercadoPagoGateway._chamar, com await no lugar de sleep."""
+        inicio_total = time.monotonic()
+        ultimo_erro = None
+        for tentativa in range(1, self.max_tentativas + 1):
+            restante = prazo_total - (time.monotonic() - inicio_total)
+            if restante <= 0:
+                break
+            if not self.circuito.permitir():
+                self.metricas.registrar(operacao, 0, 'recusada_circuito')
+                raise GatewayIndisponivelError("Mercado Pago temporariamente indisponível (circuito aberto).")
+
+            inicio = time.monotonic()
+            try:
+                resposta = await funcao(min(timeout, restante))
+                if not _falha_transitoria(resposta):
+                    self.circuito.registrar_sucesso()
+                    self.metricas.registrar(operacao, time.monotonic() - inicio, 'sucesso')
+                    return resposta
+                ultimo_erro = f"HTTP {resposta.get('status')}"
+            except httpx.HTTPError as e:
+                ultimo_erro = str(e) or type(e).__name__
+            except BaseException:
+                self.circuito.registrar_falha()
+                self.metricas.registrar(operacao, time.monotonic() - inicio, 'falha')
+                raise
+
+            self.circuito.registrar_falha()
+            ultima = tentativa == self.max_tentativas
+            self.metricas.registrar(operacao, time.monotonic() - inicio, 'falha' if ultima else 'retentativa')
+            if ultima:
+                break
+            espera = random.uniform(0, self.backoff_base * (2 ** (tentativa - 1)))
+            if time.monotonic() - inicio_total + espera >= prazo_total:
+                break
+            await asyncio.sleep(espera)
+
+        raise GatewayIndisponivelError(f"Falha ao chamar o Mercado Pago ({operacao}): {ultimo_erro}")
+
+    async def criar_pagamento(self, payment_data, idempotency_key=None, timeout=None, prazo_total=None):
+        headers = {'X-Idempotency-Key': idempotency_key or str(uuid.uuid4())}
+        timeout, prazo = self._prazos(timeout, prazo_total)
+        return await self._chamar(
+            'criar_pagamento',
+            lambda t: self._requisitar('POST', '/v1/payments', t, json=payment_data, headers=headers),
+            timeout, prazo)
+
+    async def obter_pagamento(self, payment_id, timeout=None, prazo_total=None):
+        timeout, prazo = self._prazos(timeout, prazo_total)
+        return await self._chamar(
+            'obter_pagamento', lambda t: self._requisitar('GET', f'/v1/payments/{payment_id}', t), timeout, prazo)
+
+    def stats(self):
+        return {'tipo': 'mercadopago', 'circuito': self.circuito.estado, 'operacoes': self.metricas.snapshot()}
+
+    async def fechar(self):
+        await self._cliente.aclose()
+
+
+class AsyncFakeGateway:
+    """Expõe um FakeMercadoPagoGateway com métodos async (latência simulada com asyncio.sleep)."""
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def criar_pagamento(self, payment_data, idempotency_key=None, timeout=None, prazo_total=None):
+        inicio = time.monotonic()
+        if self.fake.latencia:
+            await asyncio.sleep(self.fake.latencia)
+        return self.fake._registrar(payment_data, idempotency_key, inicio)
+
+    async def obter_pagamento(self, payment_id, timeout=None, prazo_total=None):
+        return self.fake.obter_pagamento(payment_id, timeout)
+
+    def stats(self):
+        return self.fake.stats()
+
+    async def fechar(self):
+        pass
+
+
+def criar_gateway_async_do_ambiente(gateway_sync):
+    """
+    Gateway assíncrono equivalente a gateway_sync (o criado por
+    criar_gateway_do_ambiente), compartilhando os pagamentos do fake ou o
+    circuito e as métricas do gateway real.
+    """
+    if isinstance(gateway_sync, FakeMercadoPagoGateway):
+        return AsyncFakeGateway(gateway_sync)
+    return AsyncMercadoPagoGateway(
+        gateway_sync.access_token,
+        timeout=gateway_sync.timeout,
+        max_tentativas=gateway_sync.max_tentativas,
+        backoff_base=gateway_sync.backoff_base,
+        pool_maxsize=int(os.getenv('MERCADOPAGO_POOL_SIZE', 10)),
+        circuito=gateway_sync.circuito,
+        metricas=gateway_sync.metricas,
+    )
+
+
+def criar_gateway_do_ambiente():
+    if os.getenv('MERCADOPAGO_FAKE', '').lower() in ('1', 'true', 'sim', 'yes'):
+        return FakeMercadoPagoGateway(status_inicial=os.getenv('MERCADOPAGO_FAKE_STATUS', 'pending'),
+                                      latencia=float(os.getenv('MERCADOPAGO_FAKE_LATENCIA', 0)))
+    return MercadoPagoGateway(
+        os.getenv("MERCADOPAGO_ACCESS_TOKEN"),
+        timeout=float(os.getenv('MERCADOPAGO_TIMEOUT', 8)),
+        max_tentativas=int(os.getenv('MERCADOPAGO_MAX_TENTATIVAS', 3)),
+        pool_maxsize=int(os.getenv('MERCADOPAGO_POOL_SIZE', 10)),
+        limite_falhas=int(os.getenv('MERCADOPAGO_CIRCUIT_FAILURES', 5)),
+        tempo_aberto=int(os.getenv('MERCADOPAGO_CIRCUIT_RESET_SECONDS', 30)),
+    )
@@ -0,0 +1,168 @@
+import json
+import base64
+import datetime
+from json_provider import registros_do_cursor
+
+# Paginação por cursor (keyset) e projeção de campos para as rotas de listagem.
+#
+# Em vez de OFFSET, o cliente envia de volta o cursor da última linha recebida
+# (parâmetro `after`) e a próxima página começa estritamente depois dela na
+# mesma ordenação do ORDER BY. Como a ordenação sempre termina em uma coluna
+# única (id), o cursor é estável mesmo com inserções entre uma página e outra.
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+
+class ParametroInvalidoError(ValueError):
+    """Parâmetro de paginação/projeção inválido enviado pelo cliente (HTTP 400)."""
+    pass
+
+
+def _serializar_valor(valor):
+    if isinstance(valor, datetime.datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, datetime.date):
+        return {'d': valor.isoformat()}
+    return valor
+
+
+def _desserializar_valor(valor):
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.datetime.fromisoformat(valor['dt'])
+        if 'd' in valor:
+            return datetime.date.fromisoformat(valor['d'])
+    return valor
+
+
+def codificar_cursor(escopo, valores):
+    dados = {'s': escopo, 'v': [_serializar_valor(v) for v in valores]}
+    bruto = json.dumps(dados, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(escopo, token, quantidade):
+    try:
+        preenchimento = '=' * (-len(token) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(token + preenchimento))
+        valores = [_desserializar_valor(v) for v in dados['v']]
+    except Exception:
+        raise ParametroInvalidoError("Cursor de paginação inválido.")
+    if dados.get('s') != escopo or len(valores) != quantidade:
+        raise ParametroInvalidoError("Cursor de paginação não pertence a esta listagem.")
+    return valores
+
+
+def ler_limite(args, padrao=LIMITE_PADRAO, maximo=LIMITE_MAXIMO):
+    """
+    Retorna o limite pedido em `limit`, ou None se o cliente não pediu paginação
+    (nem `limit` nem `after`), preservando o comportamento antigo da rota.
+    """
+    limite = args.get('limit')
+    if limite is None:
+        return padrao if args.get('after') else None
+    try:
+        limite = int(limite)
+    except ValueError:
+        raise ParametroInvalidoError("O parâmetro 'limit' deve ser um número inteiro.")
+    if limite < 1:
+        raise ParametroInvalidoError("O parâmetro 'limit' deve ser maior que zero.")
+    return min(limite, maximo)
+
+
+def ler_campos(args, campos_disponiveis):
+    """
+    Interpreta `fields=a,b,c`. Retorna a lista de campos pedidos (na ordem de
+    campos_disponiveis) ou None quando o parâmetro não foi enviado.
+    """
+    fields = args.get('fields')
+    if not fields:
+        return None
+    pedidos = {f.strip() for f in fields.split(',') if f.strip()}
+    desconhecidos = pedidos - set(campos_disponiveis)
+    if desconhecidos:
+        raise ParametroInvalidoError(f"Campos desconhecidos em 'fields': {', '.join(sorted(desconhecidos))}")
+    return [c for c in campos_disponiveis if c in pedidos]
+
+
+def montar_select(campos_disponiveis, campos_pedidos, campos_ordem):
+    """
+    Monta a lista de colunas do SELECT. campos_disponiveis mapeia o nome do campo
+    na resposta para a expressão SQL. As colunas da ordenação são sempre
+    selecionadas (o cursor depende delas) e removidas depois por filtrar_campos.
+    """
+    nomes = list(campos_disponiveis) if campos_pedidos is None else list(campos_pedidos)
+    for campo in campos_ordem:
+        if campo not in nomes:
+            nomes.append(campo)
+    return ",\n                ".join(f"{campos_disponiveis[n]} AS {n}" for n in nomes)
+
+
+def filtrar_campos(linhas, campos_pedidos):
+    if campos_pedidos is None:
+        return linhas
+    return [{c: linha[c] for c in campos_pedidos} for linha in linhas]
+
+
+def montar_condicao_keyset(ordem, valores):
+    """
+    Gera o predicado "linha vem depois do cursor" para uma ordenação com
+    direções possivelmente mistas, ex.: data DESC, status ASC, id DESC vira
+      (data < %s) OR (data = %s AND status > %s) OR (data = %s AND status = %s AND id < %s)
+    ordem: lista de (expressao_sql, 'ASC' | 'DESC').
+    As expressões não podem ser NULL (comparações com NULL nunca são
+    verdadeiras e a linha some da paginação) e precisam de igualdade exata:
+    use colunas NOT NULL, COALESCE ou chaves inteiras, nunca floats.
+    """
+    disjuncoes = []
+    params = []
+    for i, (expressao, direcao) in enumerate(ordem):
+        partes = []
+        for j in range(i):
+            partes.append(f"{ordem[j][0]} = %s")
+            params.append(valores[j])
+        operador = '>' if direcao.upper() == 'ASC' else '<'
+        partes.append(f"{expressao} {operador} %s")
+        params.append(valores[i])
+        disjuncoes.append("(" + " AND ".join(partes) + ")")
+    return "(" + " OR ".join(disjuncoes) + ")", params
+
+
+def paginar(cursor, escopo, sql_base, ordem, campos_ordem, where_clauses=None, params=None,
+            limite=None, after=None, params_base=None):
+    """
+    Executa sql_base (SELECT ... FROM ... sem WHERE/ORDER BY) aplicando os filtros,
+    o cursor `after` e o limite. Retorna (linhas, proximo_cursor).
+
+    ordem:        [(expressao_sql, direcao), ...] terminando em uma coluna única.
+    campos_ordem: nomes, na linha retornada pelo cursor, de cada item de `ordem`.
+    params_base:  parâmetros dos placeholders que já existem dentro de sql_base.
+    """
+    where_clauses = list(where_clauses or [])
+    params = list(params_base or []) + list(params or [])
+
+    if after:
+        valores = decodificar_cursor(escopo, after, len(ordem))
+        condicao, params_cursor = montar_condicao_keyset(ordem, valores)
+        where_clauses.append(condicao)
+        params.extend(params_cursor)
+
+    sql = sql_base
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+    sql += " ORDER BY " + ", ".join(f"{expr} {direcao}" for expr, direcao in ordem)
+    if limite is not None:
+        # Busca uma linha a mais só para saber se existe próxima página.
+        sql += " LIMIT %s"
+        params.append(limite + 1)
+
+    cursor.execute(sql, tuple(params))
+    linhas = registros_do_cursor(cursor)
+
+    proximo_cursor = None
+    if limite is not None and len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo_cursor = codificar_cursor(escopo, [ultima[c] for c in campos_ordem])
+    return linhas, proximo_cursor
@@ -0,0 +1,147 @@
+import logging
+import threading
+import mysql.connector
+
+# Reservas em duas fases.
+#
+# 1. add_reservation grava a reserva como 'Pendente' com expira_em (a "trava" da
+#    data) e faz commit na hora; a UNIQUE (nome_espaco, data_reserva) garante que
+#    só um morador segura cada data, sem SELECT prévio.
+# 2. O PIX é gerado fora da transação, com prazo curto. Se o pagamento for
+#    aprovado, o webhook muda a reserva para 'Aprovada' e zera expira_em.
+#
+# Travas vencidas deixam de bloquear a data: o próprio INSERT de uma nova reserva
+# apaga a trava vencida daquela data, e o VarredorDeReservas remove as demais em
+# segundo plano.
+
+logger = logging.getLogger(__name__)
+
+SQL_LIBERAR_TRAVA_VENCIDA = """
+    DELETE FROM reservas
+    WHERE nome_espaco = %s AND data_reserva = %s
+      AND status = 'Pendente' AND expira_em IS NOT NULL AND expira_em < NOW()
+"""
+
+SQL_CRIAR_TRAVA = """
+    INSERT INTO reservas
+        (nome_espaco, data_reserva, status, morador_id, expira_em)
+    VALUES
+        (%s, %s, 'Pendente', %s, NOW() + INTERVAL %s SECOND)
+"""
+
+ER_DUP_ENTRY = 1062
+
+
+class DataIndisponivelError(Exception):
+    """A data já está reservada (status em .status_atual)."""
+
+    def __init__(self, status_atual):
+        super().__init__(f"Data indisponível (reserva com status '{status_atual}').")
+        self.status_atual = status_atual
+
+
+def criar_trava(conn, nome_espaco, data_reserva, morador_id, duracao_segundos):
+    """
+    Reserva a data como 'Pendente' por duracao_segundos e faz commit.
+    Retorna o id da reserva ou levanta DataIndisponivelError.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SQL_LIBERAR_TRAVA_VENCIDA, (nome_espaco, data_reserva))
+        try:
+            cursor.execute(SQL_CRIAR_TRAVA, (nome_espaco, data_reserva, morador_id, int(duracao_segundos)))
+        except mysql.connector.IntegrityError as err:
+            if err.errno != ER_DUP_ENTRY:
+                raise
+            conn.rollback()
+            cursor.execute(
+                "SELECT status FROM reservas WHERE nome_espaco = %s AND data_reserva = %s",
+                (nome_espaco, data_reserva)
+            )
+            linha = cursor.fetchone()
+            raise DataIndisponivelError(linha[0] if linha else 'Pendente')
+        reserva_id = cursor.lastrowid
+        conn.commit()
+        return reserva_id
+    finally:
+        cursor.close()
+
+
+def liberar_trava(conn, reserva_id):
+    """Apaga a reserva se ela ainda estiver 'Pendente' (ex.: o Mercado Pago recusou a cobrança)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM reservas WHERE id = %s AND status = 'Pendente'", (reserva_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+    finally:
+        cursor.close()
+
+
+def liberar_travas_vencidas(conn, limite=500):
+    """Apaga até `limite` travas vencidas. Retorna os nomes dos espaços afetados."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, nome_espaco FROM reservas
+            WHERE status = 'Pendente' AND expira_em IS NOT NULL AND expira_em < NOW()
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (limite,))
+        linhas = cursor.fetchall()
+        if linhas:
+            marcadores = ', '.join(['%s'] * len(linhas))
+            cursor.execute(
+                f"DELETE FROM reservas WHERE id IN ({marcadores}) AND status = 'Pendente'",
+                [linha[0] for linha in linhas]
+            )
+        conn.commit()
+        return {linha[1] for linha in linhas}
+    finally:
+        cursor.close()
+
+
+class VarredorDeReservas:
+    """
+    Thread que periodicamente remove travas vencidas.
+    ao_liberar: função(espacos) chamada quando algo foi removido (invalidação de caches).
+    """
+
+    def __init__(self, obter_conexao, intervalo=60, ao_liberar=None):
+        self.obter_conexao = obter_conexao
+        self.intervalo = intervalo
+        self.ao_liberar = ao_liberar
+        self._thread = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+    def garantir_iniciado(self):
+        if self._thread or not self.intervalo:
+            return
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._loop, name="varredor-reservas", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def executar_uma_vez(self):
+        conn = self.obter_conexao()
+        try:
+            espacos = liberar_travas_vencidas(conn)
+        finally:
+            conn.close()
+        if espacos:
+            logger.info("VARREDOR DE RESERVAS: travas vencidas liberadas em %s.", sorted(espacos))
+            if self.ao_liberar:
+                self.ao_liberar(espacos)
+        return espacos
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.executar_uma_vez()
+            except Exception as e:
+                logger.exception("VARREDOR DE RESERVAS: erro ao liberar travas vencidas: %s", e)
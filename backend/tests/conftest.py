@@ -0,0 +1,18 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+# Os módulos do backend são importados pelo nome (import pagination, import
+# cache...), como quando o app roda a partir de backend/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """O módulo app, importado sem threads de fundo (workers, varredor, bcrypt)."""
+    for nome, valor in {'JWT_SECRET_KEY': 'teste', 'WEBHOOK_WORKERS': '0',
+                        'RESERVA_VARREDOR_INTERVALO': '0', 'BCRYPT_WORKERS': '0'}.items():
+        monkeypatch.setitem(os.environ, nome, valor)
+    return importlib.import_module('app')
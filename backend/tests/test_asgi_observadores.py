@@ -0,0 +1,103 @@
+import asyncio
+import importlib
+import os
+
+import pytest
+
+pytest.importorskip('aiomysql')
+pytest.importorskip('asgiref')
+
+
+class Observador:
+    def __init__(self):
+        self.eventos = []
+
+    def conexao_adquirida(self, segundos):
+        self.eventos.append('conexao')
+
+    def consulta_executada(self, sql, params, segundos):
+        self.eventos.append(('consulta', sql, params))
+
+    def linhas_lidas(self, quantidade):
+        self.eventos.append(('linhas', quantidade))
+
+
+class CursorAssincronoFalso:
+    async def execute(self, sql, params=None):
+        self.sql = sql
+
+    async def fetchall(self):
+        return ({'id': 1}, {'id': 2})
+
+    async def fetchone(self):
+        return {'id': 1}
+
+    async def close(self):
+        pass
+
+
+class ConexaoAssincronaFalsa:
+    async def cursor(self):
+        return CursorAssincronoFalso()
+
+
+class PoolAssincronoFalso:
+    def __init__(self):
+        self.devolvidas = 0
+
+    async def acquire(self):
+        return ConexaoAssincronaFalsa()
+
+    def release(self, conn):
+        self.devolvidas += 1
+
+
+@pytest.fixture
+def asgi(monkeypatch):
+    for nome, valor in {'JWT_SECRET_KEY': 'teste', 'WEBHOOK_WORKERS': '0',
+                        'RESERVA_VARREDOR_INTERVALO': '0', 'BCRYPT_WORKERS': '0'}.items():
+        monkeypatch.setitem(os.environ, nome, valor)
+    return importlib.import_module('asgi')
+
+
+def test_cursor_assincrono_avisa_os_observadores(asgi):
+    observador = Observador()
+    pool = PoolAssincronoFalso()
+    abrir_cursor = asgi.CursorSobDemanda(pool, 1, [observador])
+
+    async def consultar():
+        cursor = await abrir_cursor()
+        linhas = await asgi._consultar(cursor, "SELECT id FROM avisos WHERE ativo = %s", (True,))
+        await cursor.execute("SELECT 1")
+        await cursor.fetchone()
+        await abrir_cursor.fechar()
+        return linhas
+
+    assert asyncio.run(consultar()) == [{'id': 1}, {'id': 2}]
+    assert observador.eventos == [
+        'conexao',
+        ('consulta', "SELECT id FROM avisos WHERE ativo = %s", (True,)),
+        ('linhas', 2),
+        ('consulta', "SELECT 1", None),
+        ('linhas', 1),
+    ]
+    assert pool.devolvidas == 1
+
+
+def test_sem_observadores_o_cursor_e_o_original(asgi):
+    abrir_cursor = asgi.CursorSobDemanda(PoolAssincronoFalso(), 1)
+    cursor = asyncio.run(abrir_cursor())
+    assert isinstance(cursor, CursorAssincronoFalso)
+
+
+def test_rotas_assincronas_usam_o_rotulo_das_rotas_do_flask(asgi):
+    regras = {regra.rule for regra in asgi.backend.app.url_map.iter_rules()}
+
+    class Requisicao:
+        def __init__(self, metodo, caminho):
+            self.metodo, self.caminho, self.args = metodo, caminho, {}
+
+    for metodo, caminho in [('GET', '/api/dashboard'), ('GET', '/api/avisos'), ('GET', '/api/unidades'),
+                            ('POST', '/api/reservas/7/create-payment')]:
+        _handler, _argumentos, endpoint = asgi.rota_assincrona(Requisicao(metodo, caminho))
+        assert endpoint in regras
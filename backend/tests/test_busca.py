@@ -0,0 +1,100 @@
+import pytest
+
+import busca
+
+
+def test_tokens_viram_prefixos_obrigatorios():
+    tokens = busca.tokenizar('João +Silva* "ap" 10')
+    assert tokens == ['joão', 'silva', 'ap', '10']
+    assert busca.consulta_booleana(tokens) == '+joão* +silva*'
+    assert busca.consulta_booleana(['ap', '10']) is None
+
+
+def test_busca_junta_os_candidatos_por_tabela_derivada(backend):
+    sql, params = backend.montar_busca_encomendas('e.id AS id', 'Maria Souza')
+    compacto = " ".join(sql.split())
+
+    # IN (... UNION ...) vira subconsulta dependente; os candidatos precisam vir do FROM.
+    assert 'IN (' not in compacto
+    assert ") AS candidatos JOIN encomendas e ON e.id = candidatos.id" in compacto
+    assert compacto.count(' UNION ') == 2
+    assert sql.count('%s') == len(params)
+    assert params == ['+maria* +souza*'] * 4 + ['%Maria Souza%'] * 3
+
+
+def test_termo_curto_so_busca_nos_campos_da_unidade(backend):
+    sql, params = backend.montar_busca_encomendas('e.id AS id', 'B 12')
+    compacto = " ".join(sql.split())
+
+    assert 'MATCH' not in compacto and ' UNION ' not in compacto
+    assert '0 AS relevancia' in compacto
+    assert 'ub.numero LIKE %s OR ub.bloco LIKE %s OR ub.tipo_unidade LIKE %s' in compacto
+    assert params == ['%B 12%'] * 3
+
+
+class CursorFalso:
+    column_names = ('id', 'relevancia', 'relevancia_chave', 'data_chegada', 'status')
+
+    def __init__(self, executadas):
+        self.executadas = executadas
+
+    def execute(self, sql, params=()):
+        self.executadas.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    unread_result = False
+    in_transaction = False
+
+    def __init__(self, executadas):
+        self.executadas = executadas
+
+    def cursor(self, *args, **kwargs):
+        return CursorFalso(self.executadas)
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('after', [False, True])
+def test_rota_casa_placeholders_e_parametros(backend, monkeypatch, after):
+    executadas = []
+    monkeypatch.setattr(backend.db_pool, '_nova_conexao', lambda: ConexaoFalsa(executadas))
+    monkeypatch.setattr(backend, 'verificar_token', lambda token: {'user_id': 1, 'role': 'ADMIN'})
+    backend.db_pool.dispose()
+    args = {'search_term': 'joao silva', 'limit': '10'}
+    if after:
+        args['after'] = backend.pagination.codificar_cursor('encomendas-busca', [1500000, '2025-06-30', 7])
+
+    resposta = backend.app.test_client().get('/api/encomendas', query_string=args,
+                                              headers={'Authorization': 'Bearer x'})
+
+    assert resposta.status_code == 200
+    sql, params = executadas[-1]
+    assert sql.count('%s') == len(params)
+    assert params[:7] == ('+joao* +silva*',) * 4 + ('%joao silva%',) * 3
+    assert params[-1] == 11
+    if after:
+        assert 'relevancia_chave < %s' in sql and 1500000 in params
+
+
+def test_termo_sem_palavras_devolve_lista_vazia(backend, monkeypatch):
+    executadas = []
+    monkeypatch.setattr(backend.db_pool, '_nova_conexao', lambda: ConexaoFalsa(executadas))
+    monkeypatch.setattr(backend, 'verificar_token', lambda token: {'user_id': 1, 'role': 'ADMIN'})
+    resposta = backend.app.test_client().get('/api/encomendas', query_string={'search_term': '*** ---'},
+                                              headers={'Authorization': 'Bearer x'})
+    assert resposta.status_code == 200 and resposta.get_json() == []
+    assert executadas == []
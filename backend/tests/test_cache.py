@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+import cache
+from cache import TTLCache
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Controla o time.monotonic() visto pelo cache."""
+    agora = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: agora[0])
+    return agora
+
+
+def test_get_devolve_o_valor_ate_expirar(relogio):
+    c = TTLCache(ttl=10)
+    c.set('a', 1)
+    relogio[0] += 9.9
+    assert c.get('a') == 1
+    relogio[0] += 0.1
+    assert c.get('a') is None
+    assert c.stats()['itens'] == 0
+    assert (c.hits, c.misses) == (1, 1)
+
+
+def test_ttl_por_entrada_sobrepoe_o_padrao(relogio):
+    c = TTLCache(ttl=300)
+    c.set('curta', 1, ttl=5)
+    c.set('longa', 2)
+    relogio[0] += 6
+    assert c.get('curta') is None
+    assert c.get('longa') == 2
+
+
+def test_descarta_a_menos_usada_quando_cheio():
+    c = TTLCache(maxsize=2)
+    c.set('a', 1)
+    c.set('b', 2)
+    c.get('a')
+    c.set('c', 3)
+
+    assert c.get('b') is None
+    assert c.get('a') == 1 and c.get('c') == 3
+    assert c.evictions == 1
+
+
+def test_invalidate_remove_a_chave_e_avanca_a_geracao():
+    c = TTLCache()
+    c.set('a', 1)
+    c.set('b', 2)
+    geracao = c.geracao()
+    c.invalidate('a')
+
+    assert c.get('a') is None and c.get('b') == 2
+    assert c.geracao() == geracao + 1
+    assert c.invalidations == 1
+
+
+def test_set_com_geracao_antiga_e_descartado():
+    c = TTLCache()
+    geracao = c.geracao()
+    # Uma escrita invalida o cache enquanto o valor ainda era calculado.
+    c.invalidate('a')
+
+    assert c.set('a', 'valor antigo', geracao=geracao) is False
+    assert c.get('a') is None
+    assert c.set('a', 'valor novo', geracao=c.geracao()) is True
+    assert c.get('a') == 'valor novo'
+
+
+def test_clear_esvazia_e_invalida_calculos_em_andamento():
+    c = TTLCache()
+    c.set('a', 1)
+    geracao = c.geracao()
+    c.clear()
+
+    assert c.stats()['itens'] == 0
+    assert c.set('a', 1, geracao=geracao) is False
+
+
+def test_acesso_concorrente_respeita_o_limite():
+    c = TTLCache(maxsize=50)
+
+    def trabalhar(base):
+        for i in range(500):
+            c.set((base, i % 80), i)
+            c.get((base, (i * 7) % 80))
+
+    threads = [threading.Thread(target=trabalhar, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = c.stats()
+    assert stats['itens'] == 50
+    assert stats['hits'] + stats['misses'] == 8 * 500
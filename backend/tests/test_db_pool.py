@@ -0,0 +1,231 @@
+import threading
+
+import mysql.connector
+import pytest
+
+from db_pool import ConnectionPool, PoolEsgotadoError
+
+
+class ConexaoFalsa:
+    def __init__(self, numero):
+        self.numero = numero
+        self.conectada = True
+        self.unread_result = False
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.pings = 0
+        self.falhar_ping = False
+        self.falhar_rollback = False
+        self.verificacoes = 0
+
+    def is_connected(self):
+        # No mysql.connector, is_connected() faz um ping no servidor.
+        self.verificacoes += 1
+        return self.conectada
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.falhar_rollback:
+            raise mysql.connector.OperationalError("Lost connection to MySQL server")
+        self.in_transaction = False
+
+    def consume_results(self):
+        self.unread_result = False
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.falhar_ping:
+            raise mysql.connector.InterfaceError("conexão perdida")
+
+    def cursor(self, *args, **kwargs):
+        return CursorFalso()
+
+    def close(self):
+        self.conectada = False
+
+
+class CursorFalso:
+    def __init__(self):
+        self.linhas = [(1,), (2,)]
+
+    def execute(self, sql, params=None):
+        self.sql = sql
+
+    def fetchall(self):
+        return self.linhas
+
+
+def criar_pool(**kwargs):
+    pool = ConnectionPool({}, **kwargs)
+    criadas = []
+
+    def nova_conexao():
+        conn = ConexaoFalsa(len(criadas))
+        criadas.append(conn)
+        pool._incrementar('criadas')
+        return conn
+
+    pool._nova_conexao = nova_conexao
+    return pool, criadas
+
+
+def test_reutiliza_a_conexao_devolvida():
+    pool, criadas = criar_pool(pool_size=2, max_overflow=0)
+    conn = pool.get_connection()
+    conn.close()
+    outra = pool.get_connection()
+
+    assert len(criadas) == 1
+    assert outra._conn is criadas[0]
+    assert pool.stats()['reusos'] == 1
+    outra.close()
+
+
+def test_devolucao_sem_transacao_nao_vai_ao_servidor():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=0)
+    conn = pool.get_connection()
+    assert conn.is_connected()
+    conn.close()
+
+    assert (criadas[0].verificacoes, criadas[0].pings, criadas[0].rollbacks) == (0, 0, 0)
+    assert pool.stats()['ociosas'] == 1
+
+
+def test_transacao_aberta_e_desfeita_na_devolucao():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=0)
+    conn = pool.get_connection()
+    criadas[0].in_transaction = True
+    conn.close()
+
+    assert criadas[0].rollbacks == 1
+    assert pool.stats()['ociosas'] == 1
+
+
+def test_rollback_com_erro_na_devolucao_descarta_a_conexao():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=0)
+    conn = pool.get_connection()
+    criadas[0].in_transaction = True
+    criadas[0].falhar_rollback = True
+    conn.close()
+
+    assert pool.stats()['ociosas'] == 0
+    assert pool.stats()['fechadas'] == 1
+    assert pool.get_connection()._conn is criadas[1]
+
+
+def test_rollback_da_rota_em_conexao_perdida_marca_para_descarte():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=0)
+    conn = pool.get_connection()
+    criadas[0].in_transaction = True
+    criadas[0].falhar_rollback = True
+
+    # Como nos except das rotas: "if conn and conn.is_connected(): conn.rollback()".
+    conn.rollback()
+    assert not conn.is_connected()
+    conn.close()
+
+    assert criadas[0].rollbacks == 1
+    assert pool.stats()['ociosas'] == 0 and pool.stats()['fechadas'] == 1
+
+
+def test_close_duas_vezes_devolve_uma_vez_so():
+    pool, _ = criar_pool(pool_size=1, max_overflow=0)
+    conn = pool.get_connection()
+    conn.close()
+    conn.close()
+
+    assert pool.stats()['em_uso'] == 0
+    assert pool.stats()['ociosas'] == 1
+    assert not conn.is_connected()
+
+
+def test_overflow_e_fechado_ao_ser_devolvido():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=1)
+    primeira = pool.get_connection()
+    segunda = pool.get_connection()
+    primeira.close()
+    segunda.close()
+
+    assert len(criadas) == 2
+    assert pool.stats()['ociosas'] == 1
+    assert pool.stats()['fechadas'] == 1
+    assert not criadas[1].conectada
+
+
+def test_pool_esgotado_apos_o_timeout():
+    pool, _ = criar_pool(pool_size=1, max_overflow=0, timeout=0.05)
+    conn = pool.get_connection()
+    with pytest.raises(PoolEsgotadoError):
+        pool.get_connection()
+    assert pool.stats()['esgotado'] == 1
+
+    conn.close()
+    pool.get_connection().close()
+
+
+def test_espera_por_conexao_liberada_por_outra_thread():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=0, timeout=2)
+    conn = pool.get_connection()
+    threading.Timer(0.05, conn.close).start()
+
+    outra = pool.get_connection()
+    assert outra._conn is criadas[0]
+    outra.close()
+
+
+def test_conexao_antiga_e_reciclada():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=0, recycle=10)
+    conn = pool.get_connection()
+    conn.close()
+    conn_ociosa, criada_em, devolvida_em = pool._ociosas.get_nowait()
+    pool._ociosas.put_nowait((conn_ociosa, criada_em - 60, devolvida_em))
+
+    nova = pool.get_connection()
+    assert nova._conn is criadas[1]
+    assert pool.stats()['recicladas'] == 1
+    nova.close()
+
+
+def test_ping_falho_descarta_a_conexao_ociosa():
+    pool, criadas = criar_pool(pool_size=1, max_overflow=0, ping_idle_seconds=5)
+    conn = pool.get_connection()
+    conn.close()
+    conn_ociosa, criada_em, devolvida_em = pool._ociosas.get_nowait()
+    conn_ociosa.falhar_ping = True
+    pool._ociosas.put_nowait((conn_ociosa, criada_em, devolvida_em - 60))
+
+    nova = pool.get_connection()
+    assert nova._conn is criadas[1]
+    assert pool.stats()['ping_falhou'] == 1
+    nova.close()
+
+
+def test_observadores_recebem_espera_consultas_e_linhas():
+    class Observador:
+        def __init__(self):
+            self.eventos = []
+
+        def conexao_adquirida(self, segundos):
+            self.eventos.append('conexao')
+
+        def consulta_executada(self, sql, params, segundos):
+            self.eventos.append(('consulta', sql, params))
+
+        def linhas_lidas(self, quantidade):
+            self.eventos.append(('linhas', quantidade))
+
+    pool, _ = criar_pool()
+    observador = Observador()
+    pool.adicionar_observador(observador)
+
+    conn = pool.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM moradores WHERE id > %s", (0,))
+    cursor.fetchall()
+    conn.close()
+
+    assert observador.eventos == [
+        'conexao',
+        ('consulta', "SELECT id FROM moradores WHERE id > %s", (0,)),
+        ('linhas', 2),
+    ]
@@ -0,0 +1,136 @@
+import importlib
+import os
+
+import pytest
+
+MORADORES = {1, 2}
+UNIDADES = [(10, 'casa', None, '1', None)]
+
+
+class BancoFalso:
+    def __init__(self):
+        self.inserts = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.proximo_id = 500
+
+
+class CursorFalso:
+    column_names = ('id', 'tipo_unidade', 'bloco', 'numero', 'andar')
+
+    def __init__(self, banco):
+        self.banco = banco
+        self.lastrowid = None
+        self.sql = ''
+        self.params = ()
+
+    def execute(self, sql, params=()):
+        self.sql, self.params = sql, params
+        if 'INSERT INTO encomendas' in sql:
+            # Ids não consecutivos, como com auto_increment_increment > 1.
+            self.banco.proximo_id += 7
+            self.lastrowid = self.banco.proximo_id
+            self.banco.inserts.append(params)
+
+    def fetchall(self):
+        if 'FROM moradores' in self.sql:
+            return [(i,) for i in self.params if i in MORADORES]
+        if 'FROM unidades' in self.sql:
+            return list(UNIDADES)
+        return []
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    unread_result = False
+    in_transaction = False
+
+    def __init__(self, banco):
+        self.banco = banco
+
+    def cursor(self, *args, **kwargs):
+        return CursorFalso(self.banco)
+
+    def commit(self):
+        self.banco.commits += 1
+
+    def rollback(self):
+        self.banco.rollbacks += 1
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    for nome, valor in {'JWT_SECRET_KEY': 'teste', 'WEBHOOK_WORKERS': '0',
+                        'RESERVA_VARREDOR_INTERVALO': '0', 'BCRYPT_WORKERS': '0'}.items():
+        monkeypatch.setitem(os.environ, nome, valor)
+    backend = importlib.import_module('app')
+    banco = BancoFalso()
+    monkeypatch.setattr(backend.db_pool, '_nova_conexao', lambda: ConexaoFalsa(banco))
+    monkeypatch.setattr(backend, 'verificar_token', lambda token: {'user_id': 1, 'role': 'ADMIN'})
+    backend.db_pool.dispose()
+    backend.unidades_diretorio.invalidar()
+    cliente = backend.app.test_client()
+    cliente.banco = banco
+    return cliente
+
+
+def enviar(cliente, itens):
+    return cliente.post('/api/encomendas/lote', headers={'Authorization': 'Bearer x'}, json={'encomendas': itens})
+
+
+def item(remetente, **extra):
+    return dict({'remetente': remetente, 'data_chegada': '2025-01-02', 'morador_id': 1,
+                 'unidade_destino_id': 10}, **extra)
+
+
+def test_itens_invalidos_nao_impedem_os_demais(cliente):
+    resposta = enviar(cliente, [
+        item('A'),
+        item('B', data_chegada='02/01/2025'),
+        item('C', morador_id=3),
+        item('D', unidade_destino_id=11),
+        item('E', morador_id=2, descricao='caixa'),
+        'lixo',
+    ])
+
+    assert resposta.status_code == 201
+    corpo = resposta.get_json()
+    assert (corpo['criadas'], corpo['erros']) == (2, 4)
+    assert [r['status'] for r in corpo['resultados']] == ['criada', 'erro', 'erro', 'erro', 'criada', 'erro']
+    assert [r['indice'] for r in corpo['resultados']] == list(range(6))
+    assert 'data' in corpo['resultados'][1]['error']
+    assert corpo['resultados'][2]['error'] == "Morador destinatário não encontrado."
+    assert corpo['resultados'][3]['error'] == "Unidade de destino não encontrada ou inválida."
+    assert cliente.banco.commits == 1
+
+
+def test_cada_item_recebe_o_id_do_proprio_insert(cliente):
+    corpo = enviar(cliente, [item('A'), item('B'), item('C')]).get_json()
+
+    assert [r['id'] for r in corpo['resultados']] == [507, 514, 521]
+    assert [params[0] for params in cliente.banco.inserts] == ['A', 'B', 'C']
+
+
+def test_lote_sem_nenhum_valido_responde_400_sem_gravar(cliente):
+    resposta = enviar(cliente, [item('A', morador_id=3), {'remetente': 'B'}])
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()['criadas'] == 0
+    assert cliente.banco.inserts == [] and cliente.banco.commits == 0
+
+
+@pytest.mark.parametrize('corpo', [{'encomendas': []}, {'encomendas': 'x'}, {}])
+def test_corpo_sem_lista_e_recusado(cliente, corpo):
+    resposta = cliente.post('/api/encomendas/lote', headers={'Authorization': 'Bearer x'}, json=corpo)
+    assert resposta.status_code == 400
@@ -0,0 +1,79 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hashing import FilaHashCheiaError, HashingPool
+
+liberar = threading.Event()
+
+
+def _bloquear(valor):
+    liberar.wait(5)
+    return valor
+
+
+def esperar_vagas(hashing, quantidade):
+    limite = time.monotonic() + 5
+    while hashing._vagas._value < quantidade and time.monotonic() < limite:
+        time.sleep(0.01)
+    return hashing._vagas._value
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """HashingPool com um executor de threads (controlável) no lugar dos processos."""
+    liberar.clear()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def criar(max_pendentes):
+        hashing = HashingPool(workers=1, max_pendentes=max_pendentes, timeout=0.05)
+        monkeypatch.setattr(hashing, '_obter_executor', lambda: executor)
+        return hashing
+
+    yield criar
+    liberar.set()
+    executor.shutdown(wait=True)
+
+
+def test_vaga_so_volta_quando_a_tarefa_termina(pool):
+    hashing = pool(max_pendentes=1)
+
+    with pytest.raises(TimeoutError):
+        hashing._executar_no_pool(_bloquear, 'a')
+    # A tarefa que estourou o tempo ainda ocupa o pool: a próxima é recusada.
+    with pytest.raises(FilaHashCheiaError):
+        hashing._executar_no_pool(_bloquear, 'b')
+    assert hashing.rejeitadas == 1
+
+    liberar.set()
+    assert esperar_vagas(hashing, 1) == 1
+    assert hashing._executar_no_pool(_bloquear, 'c') == 'c'
+
+
+def test_tarefa_na_fila_e_cancelada_no_timeout(pool):
+    hashing = pool(max_pendentes=2)
+
+    with pytest.raises(TimeoutError):
+        hashing._executar_no_pool(_bloquear, 'rodando')
+    # Esta fica na fila atrás da primeira; ao estourar o tempo, é cancelada e
+    # devolve a vaga na hora.
+    with pytest.raises(TimeoutError):
+        hashing._executar_no_pool(_bloquear, 'na fila')
+    with pytest.raises(TimeoutError):
+        hashing._executar_no_pool(_bloquear, 'de novo')
+    assert hashing.rejeitadas == 0
+
+    liberar.set()
+    assert esperar_vagas(hashing, 2) == 2
+    assert hashing._executar_no_pool(_bloquear, 'ok') == 'ok'
+
+
+def test_lote_devolve_todas_as_vagas(pool, monkeypatch):
+    import hashing as modulo
+    monkeypatch.setattr(modulo, '_gerar_hash', lambda senha, rounds: f"hash:{senha}")
+    hashing = pool(max_pendentes=2)
+
+    assert hashing.gerar_hashes(['a', 'b', 'c']) == ['hash:a', 'hash:b', 'hash:c']
+    assert esperar_vagas(hashing, 2) == 2
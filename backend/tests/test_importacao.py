@@ -0,0 +1,204 @@
+import mysql.connector
+import pytest
+
+import importacao
+from importacao import ArquivoInvalidoError
+
+
+# --- ler_registros ---
+
+def test_csv_numera_as_linhas_do_arquivo():
+    texto = (
+        "email,nome_completo,password,unidade_id\n"
+        "ana@x.com,Ana,s1,1\n"
+        "\"bia@x.com\",\"Bia\nde Souza\",s2,2\n"
+        "caio@x.com,Caio,s3,3\n"
+    )
+    registros = importacao.ler_registros(texto, 'csv')
+
+    assert [numero for numero, _ in registros] == [2, 4, 5]
+    assert registros[1][1]['nome_completo'] == 'Bia\nde Souza'
+
+
+def test_csv_ignora_espacos_no_cabecalho_e_colunas_extras_sem_nome():
+    registros = importacao.ler_registros(" email , numero\nana@x.com,101,sobra\n", 'csv')
+    assert registros == [(2, {'email': 'ana@x.com', 'numero': '101'})]
+
+
+def test_csv_sem_cabecalho_e_recusado():
+    with pytest.raises(ArquivoInvalidoError):
+        importacao.ler_registros("", 'csv')
+
+
+def test_ndjson_aponta_linhas_invalidas_e_pula_as_vazias():
+    texto = '{"email": "ana@x.com"}\n\n{quebrado\n[1, 2]\n{"numero": "101"}\n'
+    registros = importacao.ler_registros(texto, 'ndjson')
+
+    assert [numero for numero, _ in registros] == [1, 3, 4, 5]
+    assert registros[0][1] == {'email': 'ana@x.com'}
+    assert registros[1][1].startswith('JSON inválido')
+    assert registros[2][1] == 'Cada linha deve ser um objeto JSON.'
+    assert registros[3][1] == {'numero': '101'}
+
+
+def test_formato_desconhecido_e_recusado():
+    with pytest.raises(ArquivoInvalidoError):
+        importacao.ler_registros("a;b", 'xlsx')
+
+
+# --- _validar ---
+
+def test_validar_unidade_e_morador_na_mesma_linha():
+    unidade, morador = importacao._validar({
+        'tipo_unidade': 'Apartamento', 'bloco': 'B', 'numero': 101, 'andar': '1',
+        'email': ' ana@x.com ', 'nome_completo': 'Ana', 'password': 's', 'cpf': '',
+    })
+    assert unidade == ('apartamento', 'B', '101', 1)
+    assert morador['email'] == 'ana@x.com'
+    assert morador['cpf'] is None and morador['tipo_morador'] == 'outro' and morador['unidade_id'] is None
+
+
+@pytest.mark.parametrize('dados, mensagem', [
+    ({}, 'sem unidade'),
+    ({'numero': '1', 'tipo_unidade': 'sala'}, 'tipo_unidade'),
+    ({'numero': '1', 'tipo_unidade': 'casa', 'andar': 'térreo'}, 'andar'),
+    ({'email': 'ana@x.com', 'password': 's', 'unidade_id': 1}, 'nome_completo'),
+    ({'email': 'ana', 'nome_completo': 'Ana', 'password': 's', 'unidade_id': 1}, 'E-mail'),
+    ({'email': 'ana@x.com', 'nome_completo': 'Ana', 'password': 's'}, 'unidade'),
+    ({'email': 'ana@x.com', 'nome_completo': 'Ana', 'password': 's', 'unidade_id': 'um'}, 'unidade_id'),
+    ({'numero': '1' * 11, 'tipo_unidade': 'casa'}, 'excede'),
+])
+def test_validar_recusa_linhas_invalidas(dados, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        importacao._validar(dados)
+
+
+# --- importar ---
+
+class HashingFalso:
+    def gerar_hashes(self, senhas):
+        return [f"hash:{s}" for s in senhas]
+
+
+class BancoFalso:
+    """Unidades e e-mails já cadastrados; e-mails em `conflitos` violam a UNIQUE ao inserir."""
+
+    def __init__(self, emails=(), unidades=(), conflitos=()):
+        self.emails = set(emails)
+        self.unidades = list(unidades)
+        self.conflitos = set(conflitos)
+        self.moradores = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def conexao(self):
+        return ConexaoFalsa(self)
+
+
+class ConexaoFalsa:
+    def __init__(self, banco):
+        self.banco = banco
+        self.pendentes = []
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def start_transaction(self):
+        self.pendentes = []
+
+    def commit(self):
+        self.banco.commits += 1
+        self.banco.moradores.extend(self.pendentes)
+
+    def rollback(self):
+        self.banco.rollbacks += 1
+        self.pendentes = []
+
+    def close(self):
+        pass
+
+
+class CursorFalso:
+    def __init__(self, conn):
+        self.conn = conn
+        self.banco = conn.banco
+        self._linhas = []
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SELECT email"):
+            self._linhas = [(e,) for e in params if e in self.banco.emails]
+        elif sql.startswith("SELECT cpf"):
+            self._linhas = []
+        elif sql.startswith("SELECT id FROM unidades"):
+            self._linhas = [(i,) for i in params if any(u[0] == i for u in self.banco.unidades)]
+        elif sql.startswith("SELECT id, tipo_unidade"):
+            self._linhas = [u for u in self.banco.unidades if u[3] in params]
+        else:
+            self._inserir(sql, params)
+
+    def executemany(self, sql, lista):
+        if 'INSERT INTO moradores' in sql and any(p[1] in self.banco.conflitos for p in lista):
+            raise mysql.connector.IntegrityError(msg="Duplicate entry", errno=1062)
+        for params in lista:
+            self._inserir(sql, params)
+
+    def _inserir(self, sql, params):
+        if 'INSERT INTO unidades' in sql:
+            tipo, bloco, numero, _andar = params
+            self.banco.unidades.append((100 + len(self.banco.unidades), tipo, bloco, numero))
+        else:
+            if params[1] in self.banco.conflitos:
+                raise mysql.connector.IntegrityError(msg=f"Duplicate entry '{params[1]}'", errno=1062)
+            self.conn.pendentes.append(params)
+
+    def fetchall(self):
+        return self._linhas
+
+    def close(self):
+        pass
+
+
+def morador(email, **extra):
+    return dict({'email': email, 'nome_completo': email.split('@')[0], 'password': 'senha'}, **extra)
+
+
+def test_importar_relata_erros_por_linha_e_grava_o_resto():
+    banco = BancoFalso(emails={'velho@x.com'}, unidades=[(1, 'casa', None, '10')])
+    registros = [
+        (1, morador('ana@x.com', unidade_id=1)),
+        (2, morador('ANA@x.com', unidade_id=1)),
+        (3, morador('velho@x.com', unidade_id=1)),
+        (4, morador('bia@x.com', unidade_id=99)),
+        (5, "JSON inválido: ..."),
+        (6, morador('caio@x.com', tipo_unidade='casa', numero='20')),
+    ]
+    resultado = importacao.importar(banco.conexao, registros, HashingFalso())
+
+    assert resultado['moradores_criados'] == 2 and resultado['unidades_criadas'] == 1
+    assert [(e['linha'], e['erro'][:12]) for e in resultado['erros']] == [
+        (2, 'E-mail repet'), (3, 'Este e-mail '), (4, 'ID da unidad'), (5, 'JSON inválid')]
+    gravados = {linha[1]: linha for linha in banco.moradores}
+    assert set(gravados) == {'ana@x.com', 'caio@x.com'}
+    assert gravados['ana@x.com'][2] == 'hash:senha'
+    assert gravados['caio@x.com'][3] == 101
+
+
+def test_conflito_no_lote_refaz_so_aquele_lote_linha_a_linha():
+    banco = BancoFalso(unidades=[(1, 'casa', None, '10')], conflitos={'c@x.com'})
+    registros = [(n, morador(f"{letra}@x.com", unidade_id=1)) for n, letra in enumerate('abcde', start=1)]
+
+    resultado = importacao.importar(banco.conexao, registros, HashingFalso(), lote=2)
+
+    assert resultado['moradores_criados'] == 4
+    assert [e['linha'] for e in resultado['erros']] == [3]
+    assert 'Conflito ao inserir' in resultado['erros'][0]['erro']
+    assert sorted(linha[1] for linha in banco.moradores) == ['a@x.com', 'b@x.com', 'd@x.com', 'e@x.com']
+
+
+def test_dry_run_desfaz_a_gravacao():
+    banco = BancoFalso(unidades=[(1, 'casa', None, '10')])
+    resultado = importacao.importar(banco.conexao, [(1, morador('ana@x.com', unidade_id=1))], HashingFalso(),
+                                    dry_run=True)
+
+    assert resultado['moradores_criados'] == 1 and resultado['dry_run'] is True
+    assert banco.moradores == [] and banco.commits == 0 and banco.rollbacks == 1
@@ -0,0 +1,102 @@
+import datetime
+import decimal
+import json
+
+import pytest
+from flask import Flask
+
+import json_provider
+from json_provider import OrjsonProvider, StdlibJSONProvider
+
+LINHA = {
+    'id': 1,
+    'data_chegada': datetime.datetime(2025, 6, 30, 14, 5),
+    'data_reserva': datetime.date(2025, 6, 30),
+    'horario': datetime.time(8, 30),
+    'duracao': datetime.timedelta(hours=1, minutes=15),
+    'valor': decimal.Decimal('150.50'),
+    'foto': b'abc',
+    'observacao': None,
+}
+
+ESPERADO = {
+    'id': 1,
+    'data_chegada': '2025-06-30T14:05:00Z',
+    'data_reserva': '2025-06-30',
+    'horario': '08:30:00',
+    'duracao': '1:15:00',
+    'valor': '150.50',
+    'foto': 'abc',
+    'observacao': None,
+}
+
+PROVIDERS = [StdlibJSONProvider]
+if json_provider.orjson is not None:
+    PROVIDERS.append(OrjsonProvider)
+
+
+@pytest.mark.parametrize('provider', PROVIDERS)
+def test_tipos_do_banco_saem_no_mesmo_formato(provider):
+    app = Flask(__name__)
+    app.json = provider(app)
+    assert json.loads(app.json.dumps([LINHA])) == [ESPERADO]
+
+
+@pytest.mark.parametrize('provider', PROVIDERS)
+def test_jsonify_usa_o_provider(provider):
+    app = Flask(__name__)
+    app.json = provider(app)
+    with app.app_context():
+        resposta = app.json.response([LINHA])
+    assert resposta.mimetype == 'application/json'
+    assert json.loads(resposta.get_data()) == [ESPERADO]
+
+
+@pytest.mark.parametrize('provider', PROVIDERS)
+def test_datetime_sai_com_fuso_explicito(provider):
+    # O frontend faz new Date(...): sem fuso, o valor seria lido no horário local.
+    app = Flask(__name__)
+    app.json = provider(app)
+    brasilia = datetime.timezone(datetime.timedelta(hours=-3))
+    valores = [
+        datetime.datetime(2025, 6, 30, 14, 5, 0, 123456),
+        datetime.datetime(2025, 6, 30, 14, 5, tzinfo=datetime.timezone.utc),
+        datetime.datetime(2025, 6, 30, 11, 5, tzinfo=brasilia),
+    ]
+    assert json.loads(app.json.dumps(valores)) == [
+        '2025-06-30T14:05:00.123456Z',
+        '2025-06-30T14:05:00Z',
+        '2025-06-30T11:05:00-03:00',
+    ]
+
+
+def test_tipo_desconhecido_continua_falhando():
+    with pytest.raises(TypeError):
+        json_provider._converter(object())
+
+
+def test_registros_converte_tuplas_e_preserva_dicionarios():
+    assert json_provider.registros(('id', 'nome'), [(1, 'Ana'), (2, 'Bia')]) == [
+        {'id': 1, 'nome': 'Ana'}, {'id': 2, 'nome': 'Bia'}]
+    dicionarios = [{'id': 1}]
+    assert json_provider.registros(('id',), dicionarios) == dicionarios
+    assert json_provider.registros(('id',), []) == []
+
+
+def test_registros_do_cursor_usa_column_names():
+    class Cursor:
+        column_names = ('id', 'titulo')
+
+        def fetchall(self):
+            return [(3, 'Aviso')]
+
+    assert json_provider.registros_do_cursor(Cursor()) == [{'id': 3, 'titulo': 'Aviso'}]
+
+
+def test_escolher_provider(monkeypatch):
+    monkeypatch.setenv('JSON_PROVIDER', 'stdlib')
+    assert json_provider.escolher_provider() is StdlibJSONProvider
+
+    monkeypatch.setenv('JSON_PROVIDER', 'orjson')
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    assert json_provider.escolher_provider() is StdlibJSONProvider
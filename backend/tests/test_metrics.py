@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from metrics import endereco_permitido, redes_permitidas
+
+
+@pytest.mark.parametrize('endereco, permitido', [
+    ('127.0.0.1', True),
+    ('::1', True),
+    ('::ffff:127.0.0.1', True),
+    ('10.0.0.5', False),
+    ('172.17.0.1', False),
+    ('192.168.1.10', False),
+    ('8.8.8.8', False),
+    ('', False),
+    (None, False),
+    ('não é ip', False),
+])
+def test_por_padrao_so_loopback(endereco, permitido):
+    assert endereco_permitido(endereco) is permitido
+
+
+def test_redes_configuradas():
+    redes = redes_permitidas(' 10.0.5.0/24, fd00::/8 ,, invalida, 192.168.1.7 ')
+
+    assert [str(r) for r in redes] == ['10.0.5.0/24', 'fd00::/8', '192.168.1.7/32']
+    assert endereco_permitido('10.0.5.20', redes)
+    assert endereco_permitido('::ffff:10.0.5.20', redes)
+    assert endereco_permitido('fd00::1', redes)
+    assert endereco_permitido('192.168.1.7', redes)
+    assert not endereco_permitido('10.0.6.1', redes)
+    assert not endereco_permitido('172.17.0.1', redes)
+
+
+@pytest.fixture
+def cliente(backend, monkeypatch):
+    if not backend.metricas:
+        pytest.skip("Métricas desabilitadas (METRICS_ENABLED=0).")
+    monkeypatch.delitem(os.environ, 'METRICS_TOKEN', raising=False)
+    monkeypatch.delitem(os.environ, 'METRICS_REDES_PERMITIDAS', raising=False)
+    return backend.app.test_client()
+
+
+def test_sem_token_o_gateway_do_docker_e_recusado(cliente):
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 200
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '172.17.0.1'}).status_code == 403
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '8.8.8.8'}).status_code == 403
+
+
+def test_redes_permitidas_liberam_o_scraper(cliente, monkeypatch):
+    monkeypatch.setitem(os.environ, 'METRICS_REDES_PERMITIDAS', '10.0.5.0/24')
+
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.5.9'}).status_code == 200
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '172.17.0.1'}).status_code == 403
+
+
+def test_com_token_a_origem_nao_importa(cliente, monkeypatch):
+    monkeypatch.setitem(os.environ, 'METRICS_TOKEN', 'segredo')
+    externo = {'REMOTE_ADDR': '8.8.8.8'}
+
+    assert cliente.get('/metrics', environ_base=externo, headers={'Authorization': 'Bearer segredo'}).status_code == 200
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 401
@@ -0,0 +1,255 @@
+import pytest
+import requests
+
+import pagamentos
+from pagamentos import CircuitBreaker, FakeMercadoPagoGateway, GatewayIndisponivelError, MercadoPagoGateway
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """time.monotonic() controlado; time.sleep() só avança o relógio."""
+    agora = [1000.0]
+    monkeypatch.setattr(pagamentos.time, 'monotonic', lambda: agora[0])
+    monkeypatch.setattr(pagamentos.time, 'sleep', lambda segundos: agora.__setitem__(0, agora[0] + segundos))
+    monkeypatch.setattr(pagamentos.random, 'uniform', lambda a, b: b)
+    return agora
+
+
+def respostas(*itens):
+    """funcao(timeout) que devolve (ou levanta) os itens em sequência e anota os timeouts."""
+    fila = list(itens)
+
+    def funcao(timeout):
+        funcao.timeouts.append(timeout)
+        item = fila.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    funcao.timeouts = []
+    return funcao
+
+
+def criar_gateway(**kwargs):
+    kwargs.setdefault('backoff_base', 0.1)
+    return MercadoPagoGateway('TEST-token', **kwargs)
+
+
+# --- CircuitBreaker ---
+
+def test_circuito_abre_apos_falhas_seguidas(relogio):
+    circuito = CircuitBreaker(limite_falhas=3, tempo_aberto=30)
+    for _ in range(2):
+        circuito.registrar_falha()
+    assert circuito.estado == CircuitBreaker.FECHADO and circuito.permitir()
+
+    circuito.registrar_falha()
+    assert circuito.estado == CircuitBreaker.ABERTO
+    assert not circuito.permitir()
+
+
+def test_sucesso_zera_as_falhas(relogio):
+    circuito = CircuitBreaker(limite_falhas=2)
+    circuito.registrar_falha()
+    circuito.registrar_sucesso()
+    circuito.registrar_falha()
+    assert circuito.estado == CircuitBreaker.FECHADO
+
+
+def test_meio_aberto_libera_uma_chamada_de_teste(relogio):
+    circuito = CircuitBreaker(limite_falhas=1, tempo_aberto=30)
+    circuito.registrar_falha()
+    relogio[0] += 30
+
+    assert circuito.permitir()
+    assert circuito.estado == CircuitBreaker.MEIO_ABERTO
+    assert not circuito.permitir()
+
+    circuito.registrar_sucesso()
+    assert circuito.estado == CircuitBreaker.FECHADO and circuito.permitir()
+
+
+def test_falha_no_meio_aberto_reabre(relogio):
+    circuito = CircuitBreaker(limite_falhas=5, tempo_aberto=30)
+    for _ in range(5):
+        circuito.registrar_falha()
+    relogio[0] += 31
+    assert circuito.permitir()
+
+    circuito.registrar_falha()
+    assert circuito.estado == CircuitBreaker.ABERTO
+    relogio[0] += 29
+    assert not circuito.permitir()
+
+
+# --- MercadoPagoGateway._chamar ---
+
+def test_repete_falhas_transitorias_ate_o_sucesso(relogio):
+    gateway = criar_gateway(max_tentativas=3)
+    funcao = respostas({'status': 503}, requests.ConnectionError("reset"), {'status': 201, 'response': {'id': 1}})
+
+    assert gateway._chamar('criar_pagamento', funcao, 5, 15) == {'status': 201, 'response': {'id': 1}}
+    assert len(funcao.timeouts) == 3
+    operacao = gateway.metricas.snapshot()['criar_pagamento']
+    assert (operacao['sucessos'], operacao['retentativas']) == (1, 2)
+    assert gateway.circuito.estado == CircuitBreaker.FECHADO
+
+
+def test_erro_do_cliente_nao_e_repetido(relogio):
+    gateway = criar_gateway(max_tentativas=3)
+    funcao = respostas({'status': 400, 'response': {'message': 'invalid'}})
+
+    assert gateway._chamar('criar_pagamento', funcao, 5, 15)['status'] == 400
+    assert len(funcao.timeouts) == 1
+
+
+def test_esgota_as_tentativas_e_levanta(relogio):
+    gateway = criar_gateway(max_tentativas=2, limite_falhas=10)
+    funcao = respostas(requests.Timeout("lento"), {'status': 502})
+
+    with pytest.raises(GatewayIndisponivelError, match='HTTP 502'):
+        gateway._chamar('obter_pagamento', funcao, 5, 15)
+    operacao = gateway.metricas.snapshot()['obter_pagamento']
+    assert (operacao['falhas'], operacao['retentativas']) == (2, 1)
+
+
+def test_circuito_aberto_recusa_sem_chamar(relogio):
+    gateway = criar_gateway(max_tentativas=1, limite_falhas=1)
+    with pytest.raises(GatewayIndisponivelError):
+        gateway._chamar('criar_pagamento', respostas({'status': 500}), 5, 5)
+
+    funcao = respostas()
+    with pytest.raises(GatewayIndisponivelError, match='circuito aberto'):
+        gateway._chamar('criar_pagamento', funcao, 5, 5)
+    assert funcao.timeouts == []
+    assert gateway.metricas.snapshot()['criar_pagamento']['recusadas_circuito'] == 1
+
+
+def test_criar_pagamento_envia_a_chave_de_idempotencia(relogio, monkeypatch):
+    gateway = criar_gateway()
+    enviados = []
+
+    class Pagamento:
+        def create(self, dados, opcoes):
+            enviados.append(opcoes)
+            return {'status': 201, 'response': {'id': 9}}
+
+    monkeypatch.setattr(gateway.sdk, 'payment', Pagamento)
+    gateway.criar_pagamento({'transaction_amount': 10}, idempotency_key='reserva-1', timeout=3)
+
+    assert enviados[0].custom_headers == {'x-idempotency-key': 'reserva-1'}
+    assert enviados[0].connection_timeout == 3.0
+    assert enviados[0].max_retries == 0
+
+
+def test_erro_inesperado_na_chamada_de_teste_nao_trava_o_circuito(relogio):
+    gateway = criar_gateway(max_tentativas=1, limite_falhas=1, tempo_aberto=30)
+    with pytest.raises(GatewayIndisponivelError):
+        gateway._chamar('criar_pagamento', respostas({'status': 502}), 5, 5)
+    relogio[0] += 30
+
+    # A chamada de teste do meio-aberto falha com um erro fora da lista de transitórios.
+    with pytest.raises(ValueError):
+        gateway._chamar('criar_pagamento', respostas(ValueError("502 em HTML")), 5, 5)
+    assert gateway.circuito.estado == CircuitBreaker.ABERTO
+
+    relogio[0] += 30
+    funcao = respostas({'status': 201, 'response': {'id': 1}})
+    assert gateway._chamar('criar_pagamento', funcao, 5, 5)['status'] == 201
+    assert gateway.circuito.estado == CircuitBreaker.FECHADO
+
+
+def test_qualquer_requestexception_e_transitoria(relogio):
+    gateway = criar_gateway(max_tentativas=2)
+    funcao = respostas(requests.exceptions.ChunkedEncodingError("corpo cortado"), {'status': 200})
+    assert gateway._chamar('obter_pagamento', funcao, 5, 15)['status'] == 200
+    assert len(funcao.timeouts) == 2
+
+
+def test_gateway_assincrono_libera_a_chamada_de_teste(relogio):
+    pytest.importorskip('httpx')
+
+    gateway = pagamentos.AsyncMercadoPagoGateway('TEST-token', max_tentativas=1, limite_falhas=1, tempo_aberto=30)
+
+    def assincrona(item):
+        async def funcao(timeout):
+            if isinstance(item, BaseException):
+                raise item
+            return item
+        return funcao
+
+    async def cenario():
+        with pytest.raises(GatewayIndisponivelError):
+            await gateway._chamar('criar_pagamento', assincrona({'status': 503}), 5, 5)
+        relogio[0] += 30
+        with pytest.raises(KeyError):
+            await gateway._chamar('criar_pagamento', assincrona(KeyError('id')), 5, 5)
+        relogio[0] += 30
+        resposta = await gateway._chamar('criar_pagamento', assincrona({'status': 201}), 5, 5)
+        await gateway.fechar()
+        return resposta
+
+    assert pagamentos.asyncio.run(cenario())['status'] == 201
+    assert gateway.circuito.estado == CircuitBreaker.FECHADO
+
+
+# --- FakeMercadoPagoGateway ---
+
+def test_gateway_falso_respeita_a_idempotencia():
+    gateway = FakeMercadoPagoGateway()
+    primeiro = gateway.criar_pagamento({'transaction_amount': 10}, idempotency_key='k')
+    repetido = gateway.criar_pagamento({'transaction_amount': 10}, idempotency_key='k')
+    outro = gateway.criar_pagamento({'transaction_amount': 10})
+
+    assert primeiro['response']['id'] == repetido['response']['id'] != outro['response']['id']
+    gateway.aprovar(primeiro['response']['id'])
+    assert gateway.obter_pagamento(primeiro['response']['id'])['response']['status'] == 'approved'
+    assert gateway.obter_pagamento(1)['status'] == 404
+
+
+# --- Prazo total (reservas em duas fases) ---
+
+def expira_apos_o_timeout(relogio):
+    """funcao(timeout) que consome o timeout inteiro e falha, como um gateway travado."""
+    def funcao(timeout):
+        funcao.timeouts.append(timeout)
+        relogio[0] += timeout
+        raise requests.Timeout("sem resposta")
+
+    funcao.timeouts = []
+    return funcao
+
+
+def test_prazo_total_limita_a_soma_das_tentativas(relogio):
+    gateway = criar_gateway(max_tentativas=3)
+    funcao = expira_apos_o_timeout(relogio)
+    inicio = relogio[0]
+
+    with pytest.raises(GatewayIndisponivelError):
+        gateway._chamar('criar_pagamento', funcao, 4, 6)
+
+    assert funcao.timeouts == pytest.approx([4, 1.9])
+    assert relogio[0] - inicio <= 6
+
+
+def test_sem_prazo_total_cabem_todas_as_tentativas():
+    gateway = criar_gateway(timeout=8, max_tentativas=3)
+    assert gateway._prazos(None, None) == (8, 24)
+    assert gateway._prazos(2, None) == (2, 6)
+    assert gateway._prazos(2, 3) == (2, 3)
+
+
+def test_criar_pagamento_repassa_o_prazo(relogio, monkeypatch):
+    gateway = criar_gateway(max_tentativas=3)
+    timeouts = []
+
+    class Pagamento:
+        def create(self, dados, opcoes):
+            timeouts.append(opcoes.connection_timeout)
+            relogio[0] += opcoes.connection_timeout
+            raise requests.Timeout("sem resposta")
+
+    monkeypatch.setattr(gateway.sdk, 'payment', Pagamento)
+    with pytest.raises(GatewayIndisponivelError):
+        gateway.criar_pagamento({}, timeout=3, prazo_total=3)
+    assert timeouts == [3.0]
@@ -0,0 +1,157 @@
+import datetime
+import sqlite3
+
+import pytest
+
+import pagination
+from pagination import ParametroInvalidoError
+
+
+class CursorSqlite:
+    """Cursor com a interface do mysql.connector (%s, column_names) sobre o sqlite."""
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+        self.executadas = []
+
+    def execute(self, sql, params=()):
+        self.executadas.append((sql, params))
+        self._cursor.execute(sql.replace('%s', '?'), params)
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self._cursor.description)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE encomendas (id INTEGER PRIMARY KEY, data_chegada TEXT, status TEXT)")
+    linhas = []
+    for i in range(1, 24):
+        # Poucas datas e status repetidos, para que o desempate por id importe.
+        linhas.append((i, f"2025-06-{1 + i % 3:02d}", ('Entregue', 'Pendente')[i % 2]))
+    conn.executemany("INSERT INTO encomendas VALUES (?, ?, ?)", linhas)
+    yield CursorSqlite(conn)
+    conn.close()
+
+
+ORDEM = [('data_chegada', 'DESC'), ('status', 'ASC'), ('id', 'DESC')]
+SQL_BASE = "SELECT id, data_chegada, status FROM encomendas"
+
+
+def percorrer(cursor, limite, **kwargs):
+    paginas = []
+    after = None
+    while True:
+        linhas, after = pagination.paginar(cursor, 'encomendas', SQL_BASE, ORDEM,
+                                           ['data_chegada', 'status', 'id'],
+                                           limite=limite, after=after, **kwargs)
+        paginas.append(linhas)
+        if not after:
+            return paginas
+
+
+def test_cursor_ida_e_volta_preserva_datas():
+    valores = [datetime.datetime(2025, 6, 30, 14, 5), datetime.date(2025, 6, 30), 'Pendente', 7]
+    token = pagination.codificar_cursor('encomendas', valores)
+
+    assert '=' not in token
+    assert pagination.decodificar_cursor('encomendas', token, 4) == valores
+
+
+def test_cursor_de_outra_listagem_e_recusado():
+    token = pagination.codificar_cursor('avisos', [1, 2])
+    with pytest.raises(ParametroInvalidoError):
+        pagination.decodificar_cursor('encomendas', token, 2)
+    with pytest.raises(ParametroInvalidoError):
+        pagination.decodificar_cursor('avisos', token, 3)
+
+
+@pytest.mark.parametrize('token', ['', 'nao-e-base64!', 'eyJ4IjoxfQ'])
+def test_cursor_corrompido_e_recusado(token):
+    with pytest.raises(ParametroInvalidoError):
+        pagination.decodificar_cursor('encomendas', token, 1)
+
+
+def test_ler_limite():
+    assert pagination.ler_limite({}) is None
+    assert pagination.ler_limite({'after': 'x'}) == pagination.LIMITE_PADRAO
+    assert pagination.ler_limite({'limit': '10'}) == 10
+    assert pagination.ler_limite({'limit': '100000'}) == pagination.LIMITE_MAXIMO
+    for invalido in ('0', '-1', 'dez'):
+        with pytest.raises(ParametroInvalidoError):
+            pagination.ler_limite({'limit': invalido})
+
+
+def test_ler_campos_mantem_a_ordem_e_recusa_desconhecidos():
+    disponiveis = ['id', 'nome', 'email']
+    assert pagination.ler_campos({}, disponiveis) is None
+    assert pagination.ler_campos({'fields': 'email, id'}, disponiveis) == ['id', 'email']
+    with pytest.raises(ParametroInvalidoError, match='senha'):
+        pagination.ler_campos({'fields': 'id,senha'}, disponiveis)
+
+
+def test_montar_select_inclui_as_colunas_da_ordenacao():
+    disponiveis = {'id': 'e.id', 'nome': 'e.nome', 'data': 'e.data'}
+    sql = pagination.montar_select(disponiveis, ['nome'], ['data', 'id'])
+    assert [parte.strip() for parte in sql.split(',')] == ['e.nome AS nome', 'e.data AS data', 'e.id AS id']
+
+
+def test_condicao_keyset_com_direcoes_mistas():
+    condicao, params = pagination.montar_condicao_keyset(ORDEM, ['2025-06-02', 'Pendente', 9])
+    assert condicao == ("((data_chegada < %s) OR (data_chegada = %s AND status > %s)"
+                        " OR (data_chegada = %s AND status = %s AND id < %s))")
+    assert params == ['2025-06-02', '2025-06-02', 'Pendente', '2025-06-02', 'Pendente', 9]
+
+
+def test_paginas_cobrem_todas_as_linhas_na_ordem_sem_repetir(cursor):
+    cursor.execute(SQL_BASE + " ORDER BY data_chegada DESC, status ASC, id DESC")
+    esperado = [linha[0] for linha in cursor.fetchall()]
+
+    paginas = percorrer(cursor, limite=5)
+
+    assert [len(p) for p in paginas] == [5, 5, 5, 5, 3]
+    assert [linha['id'] for pagina in paginas for linha in pagina] == esperado
+
+
+def test_pagina_exata_nao_gera_cursor_vazio(cursor):
+    paginas = percorrer(cursor, limite=23)
+    assert len(paginas) == 1 and len(paginas[0]) == 23
+
+
+def test_sem_limite_devolve_tudo_sem_cursor(cursor):
+    linhas, proximo = pagination.paginar(cursor, 'encomendas', SQL_BASE, ORDEM, ['data_chegada', 'status', 'id'])
+    assert len(linhas) == 23 and proximo is None
+    assert 'LIMIT' not in cursor.executadas[-1][0]
+
+
+def test_filtros_e_params_base_combinam_com_o_cursor(cursor):
+    # Placeholders dentro do sql_base (tabela derivada, como na busca de encomendas).
+    sql_base = ("SELECT * FROM (SELECT id, data_chegada, status FROM encomendas"
+                " WHERE id <> %s AND status = %s) AS e")
+    linhas, after = pagination.paginar(cursor, 'encomendas', sql_base, ORDEM,
+                                       ['data_chegada', 'status', 'id'], limite=4,
+                                       params_base=[5, 'Pendente'])
+    ids = [linha['id'] for linha in linhas]
+    while after:
+        linhas, after = pagination.paginar(cursor, 'encomendas', sql_base, ORDEM,
+                                           ['data_chegada', 'status', 'id'], limite=4, after=after,
+                                           params_base=[5, 'Pendente'])
+        ids += [linha['id'] for linha in linhas]
+
+    pendentes = [i for i in range(1, 24) if i % 2 == 1 and i != 5]
+    assert sorted(ids) == pendentes and len(ids) == len(set(ids))
+    # Parâmetros do sql_base primeiro, depois os do cursor e o do LIMIT.
+    assert cursor.executadas[-1][1][:2] == (5, 'Pendente')
+    assert cursor.executadas[-1][1][-1] == 5
+
+
+def test_where_clauses_viram_where(cursor):
+    linhas, _ = pagination.paginar(cursor, 'encomendas', SQL_BASE, ORDEM, ['data_chegada', 'status', 'id'],
+                                   where_clauses=['status = %s'], params=['Entregue'], limite=50)
+    assert linhas and all(linha['status'] == 'Entregue' for linha in linhas)
+    assert ' WHERE status = %s ORDER BY ' in cursor.executadas[-1][0]
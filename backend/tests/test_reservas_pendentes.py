@@ -0,0 +1,124 @@
+import mysql.connector
+import pytest
+
+import reservas_pendentes
+from reservas_pendentes import DataIndisponivelError, VarredorDeReservas
+
+
+class ConexaoFalsa:
+    """Registra os comandos; `resultados` dá o que cada SELECT devolve, em ordem."""
+
+    def __init__(self, resultados=(), erro_no_insert=None):
+        self.resultados = list(resultados)
+        self.erro_no_insert = erro_no_insert
+        self.comandos = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fechada = False
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.fechada = True
+
+
+class CursorFalso:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+        self.rowcount = 0
+        self._linhas = []
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.conn.comandos.append((sql, params))
+        if sql.startswith('INSERT'):
+            if self.conn.erro_no_insert:
+                raise self.conn.erro_no_insert
+            self.lastrowid = 42
+        elif sql.startswith('SELECT'):
+            self._linhas = self.conn.resultados.pop(0)
+        elif sql.startswith('DELETE'):
+            self.rowcount = 1
+
+    def fetchone(self):
+        return self._linhas[0] if self._linhas else None
+
+    def fetchall(self):
+        return self._linhas
+
+    def close(self):
+        pass
+
+
+def duplicada():
+    return mysql.connector.IntegrityError(msg="Duplicate entry", errno=reservas_pendentes.ER_DUP_ENTRY)
+
+
+def test_criar_trava_libera_a_vencida_e_insere_com_validade():
+    conn = ConexaoFalsa()
+    reserva_id = reservas_pendentes.criar_trava(conn, 'Salão', '2025-07-01', 5, 300.7)
+
+    assert reserva_id == 42 and conn.commits == 1
+    (liberar, params_liberar), (inserir, params_inserir) = conn.comandos
+    assert liberar.startswith('DELETE') and 'expira_em < NOW()' in liberar
+    assert params_liberar == ('Salão', '2025-07-01')
+    assert params_inserir == ('Salão', '2025-07-01', 5, 300)
+
+
+def test_data_ocupada_informa_o_status_atual():
+    conn = ConexaoFalsa(resultados=[[('Aprovada',)]], erro_no_insert=duplicada())
+
+    with pytest.raises(DataIndisponivelError) as erro:
+        reservas_pendentes.criar_trava(conn, 'Salão', '2025-07-01', 5, 300)
+    assert erro.value.status_atual == 'Aprovada'
+    assert conn.rollbacks == 1 and conn.commits == 0
+
+
+def test_outro_erro_de_integridade_e_repassado():
+    conn = ConexaoFalsa(erro_no_insert=mysql.connector.IntegrityError(msg="FK", errno=1452))
+    with pytest.raises(mysql.connector.IntegrityError):
+        reservas_pendentes.criar_trava(conn, 'Salão', '2025-07-01', 999, 300)
+
+
+def test_liberar_trava_so_apaga_pendente():
+    conn = ConexaoFalsa()
+    assert reservas_pendentes.liberar_trava(conn, 42) is True
+    sql, params = conn.comandos[0]
+    assert "status = 'Pendente'" in sql and params == (42,)
+
+
+def test_varredor_apaga_as_travas_vencidas_e_avisa_os_espacos():
+    conn = ConexaoFalsa(resultados=[[(1, 'Salão'), (2, 'Churrasqueira'), (3, 'Salão')]])
+    avisados = []
+    varredor = VarredorDeReservas(lambda: conn, intervalo=0, ao_liberar=avisados.append)
+
+    assert varredor.executar_uma_vez() == {'Salão', 'Churrasqueira'}
+
+    (selecionar, _), (apagar, params) = conn.comandos
+    assert 'FOR UPDATE SKIP LOCKED' in selecionar
+    assert apagar == "DELETE FROM reservas WHERE id IN (%s, %s, %s) AND status = 'Pendente'"
+    assert params == [1, 2, 3]
+    assert avisados == [{'Salão', 'Churrasqueira'}]
+    assert conn.commits == 1 and conn.fechada
+
+
+def test_varredor_sem_travas_vencidas_nao_apaga_nem_avisa():
+    conn = ConexaoFalsa(resultados=[[]])
+    varredor = VarredorDeReservas(lambda: conn, intervalo=0, ao_liberar=lambda espacos: pytest.fail("sem avisos"))
+
+    assert varredor.executar_uma_vez() == set()
+    assert len(conn.comandos) == 1 and conn.fechada
+
+
+def test_varredor_com_intervalo_zero_nao_inicia_thread():
+    varredor = VarredorDeReservas(lambda: None, intervalo=0)
+    varredor.garantir_iniciado()
+    assert varredor._thread is None
@@ -0,0 +1,148 @@
+import random
+
+import mysql.connector
+import pytest
+
+import webhook_queue
+from webhook_queue import WebhookWorkers
+
+
+class BancoFalso:
+    """Registra os comandos e entrega os jobs da lista `pendentes` no SELECT da fila."""
+
+    def __init__(self, pendentes=()):
+        self.pendentes = list(pendentes)
+        self.comandos = []
+        self.commits = 0
+        self.conexoes_abertas = 0
+
+    def conexao(self):
+        self.conexoes_abertas += 1
+        return ConexaoFalsa(self)
+
+
+class ConexaoFalsa:
+    def __init__(self, banco):
+        self.banco = banco
+
+    def cursor(self, dictionary=False):
+        return CursorFalso(self.banco)
+
+    def commit(self):
+        self.banco.commits += 1
+
+    def close(self):
+        self.banco.conexoes_abertas -= 1
+
+
+class CursorFalso:
+    def __init__(self, banco):
+        self.banco = banco
+        self.resultado = None
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.banco.comandos.append((sql, params))
+        if 'SKIP LOCKED' in sql:
+            self.resultado = dict(self.banco.pendentes.pop(0)) if self.banco.pendentes else None
+
+    def fetchone(self):
+        return self.resultado
+
+    def close(self):
+        pass
+
+
+def criar_workers(banco, processar, **kwargs):
+    return WebhookWorkers(processar, banco.conexao, workers=0, **kwargs)
+
+
+def ultimo_update(banco):
+    return [c for c in banco.comandos if c[0].startswith('UPDATE')][-1]
+
+
+def test_reserva_com_skip_locked_e_marca_processando():
+    banco = BancoFalso([{'id': 7, 'payment_id': '123', 'tentativas': 0}])
+    processados = []
+    workers = criar_workers(banco, processados.append)
+
+    assert workers._executar_um() is True
+
+    select = banco.comandos[0][0]
+    assert 'FOR UPDATE SKIP LOCKED' in select and "status = 'pendente'" in select
+    marcar = banco.comandos[1]
+    assert "status = 'processando'" in marcar[0] and 'tentativas = tentativas + 1' in marcar[0]
+    assert marcar[1] == (7,)
+    assert processados == ['123']
+    assert banco.conexoes_abertas == 0
+
+
+def test_sucesso_conclui_ou_reprocessa_o_job():
+    banco = BancoFalso([{'id': 7, 'payment_id': '123', 'tentativas': 0}])
+    criar_workers(banco, lambda payment_id: None)._executar_um()
+
+    sql, params = ultimo_update(banco)
+    assert "IF(reprocessar, 'pendente', 'concluido')" in sql
+    assert params == (7,)
+
+
+def test_falha_reagenda_com_backoff(monkeypatch):
+    monkeypatch.setattr(webhook_queue.random, 'uniform', lambda a, b: 0)
+    banco = BancoFalso([{'id': 7, 'payment_id': '123', 'tentativas': 2}])
+
+    def processar(payment_id):
+        raise RuntimeError("gateway fora do ar")
+
+    criar_workers(banco, processar, backoff_base=5)._executar_um()
+
+    sql, params = ultimo_update(banco)
+    assert "proxima_tentativa = NOW() + INTERVAL %s SECOND" in sql
+    # Terceira tentativa: 5 * 2 ** 2.
+    assert params == ('gateway fora do ar', 20, 7)
+
+
+def test_ultima_tentativa_marca_falhou():
+    banco = BancoFalso([{'id': 7, 'payment_id': '123', 'tentativas': 2}])
+
+    def processar(payment_id):
+        raise RuntimeError("recusado")
+
+    criar_workers(banco, processar, max_tentativas=3)._executar_um()
+
+    sql, params = ultimo_update(banco)
+    assert "status = 'falhou'" in sql
+    assert params == ('recusado', 7)
+
+
+def test_fila_vazia_nao_chama_o_processador():
+    banco = BancoFalso()
+    workers = criar_workers(banco, lambda payment_id: pytest.fail("não deveria processar"))
+
+    assert workers._executar_um() is False
+    assert banco.commits == 1 and banco.conexoes_abertas == 0
+
+
+def test_erro_do_banco_ao_reservar_nao_derruba_o_worker():
+    def sem_conexao():
+        raise mysql.connector.InterfaceError("sem conexão")
+
+    workers = WebhookWorkers(lambda payment_id: None, sem_conexao, workers=0)
+    assert workers._executar_um() is False
+
+
+def test_backoff_exponencial_com_teto_e_jitter():
+    workers = WebhookWorkers(None, None, workers=0, backoff_base=5, backoff_max=60)
+    random.seed(1)
+    for tentativas, atraso in [(1, 5), (2, 10), (3, 20), (4, 40), (5, 60), (10, 60)]:
+        valor = workers._backoff(tentativas)
+        assert atraso <= valor <= atraso * 1.5
+
+
+def test_enfileirar_repetido_e_tratado_no_upsert():
+    banco = BancoFalso()
+    webhook_queue.enfileirar(banco.conexao(), 123)
+
+    sql, params = banco.comandos[0]
+    assert 'ON DUPLICATE KEY UPDATE' in sql
+    assert params == ('123',)
+    assert banco.commits == 1
@@ -0,0 +1,194 @@
+import logging
+import random
+import threading
+import time
+import mysql.connector
+
+# Fila durável (tabela webhook_jobs no MySQL) para as notificações do Mercado Pago.
+#
+# O webhook só grava o payment_id na fila e responde 200 na hora. Threads
+# trabalhadoras retiram os jobs com SELECT ... FOR UPDATE SKIP LOCKED (vários
+# processos podem consumir a mesma fila sem pegar o mesmo job), chamam o
+# processador e, em caso de erro, reagendam com backoff exponencial + jitter.
+#
+# Deduplicação: payment_id é UNIQUE. Uma notificação repetida de um job
+# pendente só o antecipa; se o job estiver em processamento, ele é marcado para
+# rodar de novo ao terminar (o status do pagamento pode ter mudado).
+
+logger = logging.getLogger(__name__)
+
+SQL_ENFILEIRAR = """
+    INSERT INTO webhook_jobs (payment_id) VALUES (%s)
+    ON DUPLICATE KEY UPDATE
+        reprocessar = (status = 'processando'),
+        tentativas = IF(status = 'processando', tentativas, 0),
+        proxima_tentativa = IF(status = 'processando', proxima_tentativa, NOW()),
+        status = IF(status = 'processando', status, 'pendente')
+"""
+
+
+def enfileirar(conn, payment_id):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SQL_ENFILEIRAR, (str(payment_id),))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+class WebhookWorkers:
+    """
+    processar:       função(payment_id) que aplica o pagamento; deve ser idempotente.
+    obter_conexao:   função que devolve uma conexão (ex.: db_pool.get_connection).
+    workers:         número de threads consumidoras.
+    max_tentativas:  após isso o job fica como 'falhou'.
+    """
+
+    def __init__(self, processar, obter_conexao, workers=2, max_tentativas=8,
+                 backoff_base=5, backoff_max=3600, intervalo_ocioso=2, timeout_processando=600):
+        self.processar = processar
+        self.obter_conexao = obter_conexao
+        self.workers = workers
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.intervalo_ocioso = intervalo_ocioso
+        self.timeout_processando = timeout_processando
+        self._threads = []
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+
+    def garantir_iniciado(self):
+        if self._threads or not self.workers:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._loop, name=f"webhook-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def notificar(self):
+        """Acorda os workers ociosos após um novo enfileiramento."""
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def _backoff(self, tentativas):
+        atraso = min(self.backoff_max, self.backoff_base * (2 ** max(0, tentativas - 1)))
+        return atraso + random.uniform(0, atraso / 2)
+
+    def _loop(self):
+        ultima_recuperacao = 0
+        while not self._parar.is_set():
+            try:
+                if time.monotonic() - ultima_recuperacao > 60:
+                    self._recuperar_travados()
+                    ultima_recuperacao = time.monotonic()
+                if not self._executar_um():
+                    self._acordar.wait(self.intervalo_ocioso)
+                    self._acordar.clear()
+            except Exception as e:
+                logger.exception("WEBHOOK WORKER: erro inesperado no loop: %s", e)
+                self._parar.wait(self.intervalo_ocioso)
+
+    def _recuperar_travados(self):
+        # Jobs presos em 'processando' (ex.: processo morreu no meio) voltam para a fila.
+        conn = self.obter_conexao()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE webhook_jobs
+                SET status = 'pendente', proxima_tentativa = NOW()
+                WHERE status = 'processando'
+                  AND atualizado_em < NOW() - INTERVAL %s SECOND
+            """, (self.timeout_processando,))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _reservar_job(self):
+        conn = self.obter_conexao()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT id, payment_id, tentativas
+                FROM webhook_jobs
+                WHERE status = 'pendente' AND proxima_tentativa <= NOW()
+                ORDER BY proxima_tentativa
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """)
+            job = cursor.fetchone()
+            if job:
+                cursor.execute("""
+                    UPDATE webhook_jobs
+                    SET status = 'processando', tentativas = tentativas + 1, reprocessar = FALSE
+                    WHERE id = %s
+                """, (job['id'],))
+                job['tentativas'] += 1
+            conn.commit()
+            return job
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _finalizar_job(self, job, erro=None):
+        conn = self.obter_conexao()
+        cursor = conn.cursor()
+        try:
+            if erro is None:
+                cursor.execute("""
+                    UPDATE webhook_jobs
+                    SET status = IF(reprocessar, 'pendente', 'concluido'),
+                        proxima_tentativa = NOW(), reprocessar = FALSE, ultimo_erro = NULL
+                    WHERE id = %s
+                """, (job['id'],))
+            elif job['tentativas'] >= self.max_tentativas:
+                cursor.execute("""
+                    UPDATE webhook_jobs SET status = 'falhou', ultimo_erro = %s WHERE id = %s
+                """, (str(erro)[:2000], job['id']))
+            else:
+                cursor.execute("""
+                    UPDATE webhook_jobs
+                    SET status = 'pendente', ultimo_erro = %s,
+                        proxima_tentativa = NOW() + INTERVAL %s SECOND
+                    WHERE id = %s
+                """, (str(erro)[:2000], int(self._backoff(job['tentativas'])), job['id']))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _executar_um(self):
+        try:
+            job = self._reservar_job()
+        except mysql.connector.Error as e:
+            logger.error("WEBHOOK WORKER: erro ao reservar job: %s", e)
+            return False
+        if not job:
+            return False
+
+        erro = None
+        try:
+            self.processar(job['payment_id'])
+        except Exception as e:
+            erro = e
+            logger.warning("WEBHOOK WORKER: falha no pagamento %s (tentativa %s): %s", job['payment_id'], job['tentativas'], e,
+                           extra={'payment_id': job['payment_id'], 'tentativa': job['tentativas']})
+        self._finalizar_job(job, erro)
+        return True
+
+    def stats(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT status, COUNT(*) FROM webhook_jobs GROUP BY status")
+            contagem = {status: total for status, total in cursor.fetchall()}
+        finally:
+            cursor.close()
+        return {'workers': self.workers, 'ativos': len(self._threads), 'jobs': contagem}
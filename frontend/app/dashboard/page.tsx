@@ -103,53 +103,23 @@ export default function DashboardHomePage() {
         return; 
       } 
       try { 
-        const [resReservations, resVisitors, resOccurrences, resEncomendas, resAvisos, resAllReservations] = await Promise.all([ 
-          fetch('http://127.0.0.1:5000/api/minhas-reservas', {  
-            headers: { 'Authorization': `Bearer ${token}` }  
-          }), 
-          fetch('http://127.0.0.1:5000/api/meus-visitantes', {  
-            headers: { 'Authorization': `Bearer ${token}` }  
-          }), 
-          fetch('http://127.0.0.1:5000/api/ocorrencias/resumo', {  
-            headers: { 'Authorization': `Bearer ${token}` }  
-          }),
-          fetch('http://127.0.0.1:5000/api/minhas-encomendas', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('http://127.0.0.1:5000/api/avisos', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('http://127.0.0.1:5000/api/reservas/resumo-geral', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          })
-        ]); 
-        
-        // Verificação de sucesso de TODAS as respostas
-        if (!resReservations.ok || !resVisitors.ok || !resOccurrences.ok || !resEncomendas.ok || !resAvisos.ok || !resAllReservations.ok) { 
-          const errorTextReservations = await resReservations.text(); 
-          const errorTextVisitors = await resVisitors.text(); 
-          const errorTextOccurrences = await resOccurrences.text(); 
-          const errorTextEncomendas = await resEncomendas.text(); 
-          const errorTextAvisos = await resAvisos.text(); 
-          const errorTextAllReservations = await resAllReservations.text(); 
-          
-          let errorMessage = 'Falha ao buscar dados do dashboard.'; 
-          if (!resReservations.ok) errorMessage += ` Reservas: ${errorTextReservations}`; 
-          if (!resVisitors.ok) errorMessage += ` Visitantes: ${errorTextVisitors}`; 
-          if (!resOccurrences.ok) errorMessage += ` Ocorrências: ${errorTextOccurrences}`; 
-          if (!resEncomendas.ok) errorMessage += ` Encomendas: ${errorTextEncomendas}`; 
-          if (!resAvisos.ok) errorMessage += ` Avisos: ${errorTextAvisos}`; 
-          if (!resAllReservations.ok) errorMessage += ` Todas as Reservas: ${errorTextAllReservations}`; 
-          
-          throw new Error(errorMessage); 
-        } 
-        
-        const reservationsData = await resReservations.json(); 
-        const visitorsData = await resVisitors.json(); 
-        const occurrencesData = await resOccurrences.json(); 
-        const encomendasData = await resEncomendas.json(); 
-        const avisosData = await resAvisos.json(); 
-        const allReservationsRaw = await resAllReservations.json(); 
+        // Uma única requisição traz todas as seções do dashboard
+        const resDashboard = await fetch('http://127.0.0.1:5000/api/dashboard', {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+
+        if (!resDashboard.ok) {
+          const errorTextDashboard = await resDashboard.text();
+          throw new Error(`Falha ao buscar dados do dashboard. ${errorTextDashboard}`);
+        }
+
+        const dashboardData = await resDashboard.json();
+        const reservationsData = dashboardData.minhas_reservas;
+        const visitorsData = dashboardData.meus_visitantes;
+        const occurrencesData = dashboardData.resumo_ocorrencias;
+        const encomendasData = dashboardData.minhas_encomendas;
+        const avisosData = dashboardData.avisos;
+        const allReservationsRaw = dashboardData.resumo_reservas;
         
         setReservations(reservationsData); 
         setVisitors(visitorsData); 